@@ -0,0 +1,59 @@
+import argparse
+import io
+import json
+import pstats
+from pathlib import Path
+from typing import Optional
+
+from src.constants import PROFILE_DIR
+from src.profiling import META_SUFFIX, STATS_SUFFIX
+
+
+def select_dumps(
+    directory: Path, tool: Optional[str] = None, reason: Optional[str] = None, input_hash: Optional[str] = None
+) -> list[Path]:
+    """Return the stats files of the dumps in `directory` matching the filters, oldest first."""
+    dumps = []
+    for stats_path in sorted(directory.glob(f"*{STATS_SUFFIX}")):
+        meta_path = stats_path.with_suffix(META_SUFFIX)
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        if tool is not None and meta.get("tool") != tool:
+            continue
+        if reason is not None and meta.get("reason") != reason:
+            continue
+        if input_hash is not None and meta.get("input_hash") != input_hash:
+            continue
+        dumps.append(stats_path)
+    return dumps
+
+
+def aggregate(dumps: list[Path], sort: str = "cumulative", limit: int = 30) -> str:
+    """Merge the stats of the dumps and return the report of the `limit` hottest functions."""
+    out = io.StringIO()
+    stats = pstats.Stats(str(dumps[0]), stream=out)
+    for path in dumps[1:]:
+        stats.add(str(path))
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregate the hot functions across the profiles of tool calls.")
+    parser.add_argument("directory", nargs="?", type=Path, default=PROFILE_DIR)
+    parser.add_argument("--tool", help="only the profiles of this tool, ex: validate")
+    parser.add_argument("--reason", choices=["sampled", "slow"], help="only the sampled or the slow calls")
+    parser.add_argument("--input-hash", help="only the profiles of this input")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key, ex: cumulative, tottime, ncalls")
+    parser.add_argument("--limit", type=int, default=30, help="number of functions to print")
+    args = parser.parse_args()
+
+    dumps = select_dumps(args.directory, args.tool, args.reason, args.input_hash)
+    if not dumps:
+        print(f"No profiles in {args.directory}")
+        return
+    print(f"Aggregated {len(dumps)} profiles from {args.directory}")
+    print(aggregate(dumps, args.sort, args.limit))
+
+
+if __name__ == "__main__":
+    main()
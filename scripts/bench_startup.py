@@ -0,0 +1,72 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from scripts.synthetic_reference import write_references
+from src.constants import PROJECT_ROOT, SUPPORTED_PENNYLANE_VERSIONS
+from src.tools.bundle import build_reference_bundle
+
+# runs in a fresh interpreter: import the validator and validate one snippet against the latest version
+FIRST_VALIDATION = """
+import json, time
+start = time.perf_counter()
+from src.tools.static_validation import validate_pennylane_code_statically
+imported = time.perf_counter()
+validate_pennylane_code_statically("import pennylane as qml\\nqml.Op1(wires=0)")
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_validation": done - imported, "total": done - start}))
+"""
+
+
+def time_first_validation(ref_docs_dir: Path, use_bundle: bool) -> dict[str, float]:
+    env = {**os.environ, "REF_DOCS_DIR": str(ref_docs_dir), "USE_REFERENCE_BUNDLE": "1" if use_bundle else "0"}
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_VALIDATION],
+        cwd=PROJECT_ROOT.parent,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(methods: int, repeat: int) -> dict[str, dict[str, float]]:
+    """
+    Measure the time to first validation in fresh processes, serving the references from the JSON files and
+    from the bundle.
+
+    Returns:
+        dict[str, dict[str, float]]: The median seconds of each phase, for "json" and "bundle"
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        ref_docs_dir = Path(tmp)
+        write_references(ref_docs_dir, SUPPORTED_PENNYLANE_VERSIONS, methods)
+        build_reference_bundle(
+            SUPPORTED_PENNYLANE_VERSIONS,
+            ref_docs_dir / "pennylane" / "raw",
+            ref_docs_dir / "pennylane" / "formatted",
+            ref_docs_dir / "pennylane" / "reference.bundle",
+        )
+
+        results = {}
+        for name, use_bundle in (("json", False), ("bundle", True)):
+            runs = [time_first_validation(ref_docs_dir, use_bundle) for _ in range(repeat)]
+            results[name] = {phase: statistics.median(run[phase] for run in runs) for phase in runs[0]}
+        return results
+
+
+if __name__ == "__main__":
+    methods = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    results = run(methods, repeat)
+    print(f"Time to first validation, {methods} methods per version, median of {repeat} runs:")
+    for name, timing in results.items():
+        phases = ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in timing.items())
+        print(f"  {name:<7} {phases}")
+    speedup = results["json"]["first_validation"] / results["bundle"]["first_validation"]
+    print(f"  first validation speedup: {speedup:.1f}x")
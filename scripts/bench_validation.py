@@ -0,0 +1,379 @@
+import os
+import tempfile
+from pathlib import Path
+
+# the benchmark runs on generated references, set before src.constants is imported. The worker processes of the
+# long validations import this module again as "__mp_main__", they use the references of the benchmark process
+if __name__ != "__mp_main__":
+    os.environ["REF_DOCS_DIR"] = tempfile.mkdtemp(prefix="bench_refdocs_")
+BENCH_REF_DOCS_DIR = Path(os.environ["REF_DOCS_DIR"])
+
+import argparse  # noqa: E402
+import ast  # noqa: E402
+import contextlib  # noqa: E402
+import gc  # noqa: E402
+import itertools  # noqa: E402
+import json  # noqa: E402
+import math  # noqa: E402
+import random  # noqa: E402
+import shutil  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from dataclasses import asdict, dataclass  # noqa: E402
+from typing import Callable, Iterator, cast  # noqa: E402
+from unittest import mock  # noqa: E402
+
+from scripts.synthetic_reference import write_references  # noqa: E402
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS  # noqa: E402
+from src.metrics import Counter, Histogram  # noqa: E402
+from src.tools import request_reference, search_reference, static_validation  # noqa: E402
+from src.tools.arg_validator import ArgValidator  # noqa: E402
+from src.tools.bundle import build_reference_bundle  # noqa: E402
+from src.tools.incremental_validation import validate_pennylane_code_incremental  # noqa: E402
+from src.tools.request_reference import request_pennylane_reference  # noqa: E402
+from src.tools.search_reference import search_pennylane_reference  # noqa: E402
+from src.tools.static_validation import (  # noqa: E402
+    _extract_pennylane_methods,
+    get_reference,
+    get_suggestion_index,
+    validate_pennylane_code_statically,
+)
+
+BASELINE_PATH = Path(__file__).parent / "bench_baseline.json"
+METHODS_PER_VERSION = 3000
+VERSION = SUPPORTED_PENNYLANE_VERSIONS[-1]
+# runs of each case before the measurement, to fill the caches
+WARMUP_ITERATIONS = 3
+# cases whose p50 latency must stay below the p50 latency of another case, whatever the baseline
+FASTER_THAN = {"validate_incremental/module_2k_lines_one_edit": "validate/module_2k_lines"}
+
+
+# the names of the methods and the names and types of their required arguments
+Signatures = list[tuple[str, list[tuple[str, str]]]]
+
+# a valid literal value of each type of the generated references
+_VALUES = {
+    "int": "0",
+    "float": "0.5",
+    "bool": "True",
+    "str": "'a'",
+    "Sequence[int]": "[0, 1]",
+    "Optional[str]": "None",
+    "Union[int, Sequence[int]]": "0",
+}
+
+
+def signatures(version: str = VERSION) -> Signatures:
+    """The names and required arguments of the methods of the reference, to generate mostly valid calls."""
+    reference = get_reference(version)
+    return [
+        (name, [(arg["name"], arg["type"]) for arg in entry["args"] if arg["required"]])
+        for name, entry in sorted(reference.items())
+    ]
+
+
+def _call(rng: random.Random, methods: Signatures, inner: str = "0") -> str:
+    # mostly valid calls, some with a missing argument or an unknown method
+    kind = rng.random()
+    if kind < 0.02:
+        return f"qml.Missing{rng.randrange(1000)}(wires={inner})"
+    name, required = methods[rng.randrange(len(methods))]
+    if kind < 0.05:
+        return f"{name}()" if inner == "0" else f"{name}({inner})"
+    if not required:
+        return f"{name}({inner})"
+    # the inner expression goes into the first argument only, so that nesting stays linear in size
+    values = [_VALUES.get(arg_type, "op") for _, arg_type in required]
+    if inner != "0":
+        values[0] = inner
+    return f"{name}({', '.join(f'{arg}={value}' for (arg, _), value in zip(required, values))})"
+
+
+def circuit(lines: int, methods: Signatures, seed: int = 0) -> str:
+    """A module of `lines` lines made of small circuits, one `qml.` call per line."""
+    rng = random.Random(seed)
+    out = ["import pennylane as qml", "from pennylane import numpy as np", ""]
+    while len(out) < lines:
+        out.append(f"def circuit_{len(out)}(params):")
+        for _ in range(min(20, lines - len(out) - 1)):
+            out.append(f"    {_call(rng, methods)}")
+        out.append("    return params")
+    return "\n".join(out[:lines]) + "\n"
+
+
+def deep_nesting(depth: int, methods: Signatures, seed: int = 0) -> str:
+    """Nested blocks close to the parser's indentation limit, with a call at every level."""
+    rng = random.Random(seed)
+    out = ["import pennylane as qml"]
+    for level in range(depth):
+        indent = "    " * level
+        out.append(f"{indent}if x > {level}:")
+        out.append(f"{indent}    {_call(rng, methods)}")
+    return "\n".join(out) + "\n"
+
+
+def nested_calls(depth: int, methods: Signatures, seed: int = 0) -> str:
+    """Calls nested in the arguments of other calls, ex: qml.adjoint(qml.ctrl(qml.RX(...)))."""
+    rng = random.Random(seed)
+    expr = "0"
+    for _ in range(depth):
+        expr = _call(rng, methods, inner=expr)
+    return f"import pennylane as qml\nop = {expr}\n"
+
+
+def pathological_parentheses(depth: int, repeat: int) -> str:
+    """Lines of deeply parenthesized expressions, plus one line of unbalanced parentheses (a syntax error)."""
+    balanced = "(" * depth + "qml.Op1(wires=0)" + ")" * depth
+    out = ["import pennylane as qml"] + [f"x{i} = {balanced}" for i in range(repeat)]
+    out.append("y = " + "(" * depth + "qml.Op2(wires=0" + ")" * (depth - 1))
+    return "\n".join(out) + "\n"
+
+
+def wide_calls(count: int, args: int) -> tuple[list[dict], list[ast.Call]]:
+    """The arguments of a method taking `args` arguments, and `count` calls giving each of them by keyword,
+    some with an unknown or a missing argument."""
+    expected_args = [
+        {"name": f"arg{i}", "type": "int", "required": i < args // 2, "description": f"Argument {i}."}
+        for i in range(args)
+    ]
+    rng = random.Random(6)
+    calls = []
+    for _ in range(count):
+        names = [arg["name"] for arg in expected_args]
+        if rng.random() < 0.05:
+            names[rng.randrange(args)] = "unknown"
+        calls.append(f"qml.Wide({', '.join(f'{name}={i}' for i, name in enumerate(names))})")
+    return expected_args, [cast(ast.Call, cast(ast.Expr, node).value) for node in ast.parse("\n".join(calls)).body]
+
+
+def edit_one_definition(code: str) -> str:
+    """The module with one more line at the start of its middle function."""
+    lines = code.splitlines(keepends=True)
+    definitions = [i for i, line in enumerate(lines) if line.startswith("def ")]
+    middle = definitions[len(definitions) // 2]
+    return "".join(lines[: middle + 1] + ["    params = params + 1\n"] + lines[middle + 1 :])
+
+
+def corpus(methods: Signatures) -> dict[str, str]:
+    return {
+        "circuit_10_lines": circuit(10, methods),
+        "module_200_lines": circuit(200, methods, seed=1),
+        "module_2k_lines": circuit(2_000, methods, seed=7),
+        "module_10k_lines": circuit(10_000, methods, seed=2),
+        "deep_nesting": deep_nesting(90, methods, seed=3),
+        "nested_calls": nested_calls(150, methods, seed=4),
+        "pathological_parentheses": pathological_parentheses(180, 50),
+    }
+
+
+@dataclass
+class BenchResult:
+    name: str
+    iterations: int
+    throughput: float  # calls per second
+    p50_ms: float
+    p99_ms: float
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    # nearest-rank percentile
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def measure(name: str, func: Callable[[], object], min_iterations: int, min_seconds: float) -> BenchResult:
+    for _ in range(WARMUP_ITERATIONS):
+        func()
+    timings = []
+    # like timeit, the garbage collector does not run during the measurement
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        while len(timings) < min_iterations or time.perf_counter() - start < min_seconds:
+            t = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.enable()
+    timings.sort()
+    return BenchResult(
+        name=name,
+        iterations=len(timings),
+        throughput=len(timings) / elapsed,
+        p50_ms=_percentile(timings, 50) * 1000,
+        p99_ms=_percentile(timings, 99) * 1000,
+    )
+
+
+@contextlib.contextmanager
+def uninstrumented() -> Iterator[None]:
+    """Turn the stage timings and the other metrics of the measured code into no-ops, to measure their overhead."""
+    with contextlib.ExitStack() as stack:
+        for module in (static_validation, request_reference, search_reference):
+            stack.enter_context(mock.patch.object(module, "record_stage", lambda op, stage, start: start))
+        stack.enter_context(mock.patch.object(Counter, "inc", lambda self, *labels, amount=1.0: None))
+        stack.enter_context(mock.patch.object(Histogram, "observe", lambda self, value, *labels: None))
+        yield
+
+
+def benchmarks() -> dict[str, Callable[[], object]]:
+    cases: dict[str, Callable[[], object]] = {}
+    methods = signatures()
+    codes = corpus(methods)
+    for name, code in codes.items():
+        cases[f"validate/{name}"] = lambda code=code: validate_pennylane_code_statically(code, VERSION)
+        cases[f"extract/{name}"] = lambda code=code: _extract_pennylane_methods(code)
+
+    # a module edited between validations: every call re-validates one changed function, in a worker process
+    # when the module is longer than VALIDATION_ISOLATION_MIN_CHARS
+    module = codes["module_2k_lines"]
+    documents = itertools.cycle([module, edit_one_definition(module)])
+    cases["validate_incremental/module_2k_lines_one_edit"] = lambda: validate_pennylane_code_incremental(
+        next(documents), "bench", VERSION
+    )
+
+    rng = random.Random(5)
+    names = [name for name, _ in rng.sample(methods, 100)]
+    versions = SUPPORTED_PENNYLANE_VERSIONS
+
+    def get_references() -> None:
+        for version in versions:
+            reference = get_reference(version)
+            for name in names:
+                reference.get(name)
+
+    def request_references() -> None:
+        for name in names:
+            request_pennylane_reference(name, VERSION)
+
+    def request_truncated_references() -> None:
+        for name in names:
+            request_pennylane_reference(name, VERSION, max_bytes=1024)
+
+    expected_args, calls = wide_calls(1000, 40)
+    validator = ArgValidator.from_args(expected_args)
+    cases["arg_check/1000_calls_40_args"] = lambda: [validator.check(node) for node in calls]
+
+    # unknown names one edit away from a method of the reference
+    unknown = [name[:-1] + "x" for name in names]
+
+    def suggest() -> None:
+        index = get_suggestion_index(VERSION, get_reference(VERSION))
+        for name in unknown:
+            index.suggest(name)
+
+    cases["suggest/100_unknown_methods"] = suggest
+
+    # a method name with common words, and common words only: the worst case, every method is ranked
+    queries = [f"{name.split('.')[-1]} rotation of the qubit" for name in names[:10]] + ["rotation of the qubit"]
+
+    def search() -> None:
+        for query in queries:
+            search_pennylane_reference(query, VERSION)
+
+    cases["search/11_queries"] = search
+    cases["get_reference/10_versions_100_lookups"] = get_references
+    cases["request_reference/100_methods"] = request_references
+    cases["request_reference/100_methods_1kb"] = request_truncated_references
+    return cases
+
+
+def prepare_references() -> None:
+    write_references(BENCH_REF_DOCS_DIR, SUPPORTED_PENNYLANE_VERSIONS, METHODS_PER_VERSION)
+    build_reference_bundle(
+        SUPPORTED_PENNYLANE_VERSIONS,
+        BENCH_REF_DOCS_DIR / "pennylane" / "raw",
+        BENCH_REF_DOCS_DIR / "pennylane" / "formatted",
+        BENCH_REF_DOCS_DIR / "pennylane" / "reference.bundle",
+    )
+
+
+def compare(results: list[BenchResult], baseline: dict[str, dict], tolerance: float, p99_tolerance: float) -> list[str]:
+    """
+    Compare the results with the baseline.
+
+    Returns:
+        list[str]: One message per case whose p50 latency is more than `tolerance` (ex: 0.25 for 25%), or whose p99
+            latency is more than `p99_tolerance`, above the baseline, and per case of `FASTER_THAN` that is not
+            faster than its counterpart
+    """
+    regressions = []
+    p50s = {result.name: result.p50_ms for result in results}
+    for name, other in FASTER_THAN.items():
+        if name in p50s and other in p50s and p50s[name] >= p50s[other]:
+            regressions.append(f"{name}: p50 {p50s[name]:.3f} ms >= {other} p50 {p50s[other]:.3f} ms")
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        for metric, allowed in (("p50_ms", tolerance), ("p99_ms", p99_tolerance)):
+            value, base_value = getattr(result, metric), base[metric]
+            if value > base_value * (1 + allowed):
+                regressions.append(
+                    f"{result.name}: {metric} {value:.3f} ms > baseline {base_value:.3f} ms "
+                    f"(+{value / base_value - 1:.0%})"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the static validation hot path on a generated corpus.")
+    parser.add_argument("--filter", default="", help="only run the cases whose name contains this string")
+    parser.add_argument("--min-iterations", type=int, default=10)
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown (0.25: 25%%)")
+    parser.add_argument("--p99-tolerance", type=float, default=0.5, help="allowed p99 slowdown (0.5: 50%%)")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument(
+        "--overhead", action="store_true", help="also run each case without metrics, and print the metrics overhead"
+    )
+    args = parser.parse_args()
+
+    try:
+        prepare_references()
+        results = []
+        for name, func in benchmarks().items():
+            if args.filter in name:
+                result = measure(name, func, args.min_iterations, args.min_seconds)
+                results.append(result)
+                print(
+                    f"{name:<48} {result.throughput:10.1f}/s  p50 {result.p50_ms:9.3f} ms  p99 {result.p99_ms:9.3f} ms"
+                )
+                if args.overhead:
+                    with uninstrumented():
+                        bare = measure(name, func, args.min_iterations, args.min_seconds)
+                    overhead = result.p50_ms - bare.p50_ms
+                    print(
+                        f"{'  without metrics':<48} {bare.throughput:10.1f}/s  p50 {bare.p50_ms:9.3f} ms  "
+                        f"overhead {overhead:+.3f} ms ({overhead / bare.p50_ms:+.1%})"
+                    )
+    finally:
+        shutil.rmtree(BENCH_REF_DOCS_DIR, ignore_errors=True)
+
+    report = {result.name: asdict(result) for result in results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps({**baseline, **report}, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline → {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create it")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance, args.p99_tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"✅ No regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
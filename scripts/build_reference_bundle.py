@@ -0,0 +1,17 @@
+import sys
+
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+from src.tools.bundle import build_reference_bundle
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("""No version specified. Using default supported versions.
+        If you want to specify a version, please use the following format:
+        python build_reference_bundle.py <version1>,<version2>,<version3>
+        """)
+        versions = SUPPORTED_PENNYLANE_VERSIONS
+    else:
+        versions = sys.argv[1].split(",")
+
+    bundle_path = build_reference_bundle(versions)
+    print(f"Bundled {', '.join(versions)} → {bundle_path}")
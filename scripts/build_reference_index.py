@@ -0,0 +1,20 @@
+import sys
+
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+from src.tools.reference_store import build_reference_index
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(
+            """No version specified. Using default supported versions.
+        If you want to specify a version, please use the following format:
+        python build_reference_index.py <version1>,<version2>,<version3>
+        """
+        )
+        versions = SUPPORTED_PENNYLANE_VERSIONS
+    else:
+        versions = sys.argv[1].split(",")
+
+    for version in versions:
+        index_path = build_reference_index(version)
+        print(f"Indexed {version} → {index_path}")
@@ -1,23 +1,29 @@
+import asyncio
 import getpass
-import json
 import os
 import sys
 from pathlib import Path
 from textwrap import dedent
+from typing import Any
 
-from cost import calculate_cost
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 from loguru import logger
 from pydantic import BaseModel, Field
-from tqdm import tqdm
 
+from scripts.llm_pipeline import (
+    Completion,
+    FormattingModel,
+    PipelineConfig,
+    StubChatModel,
+    Usage,
+    format_method_info,
+    format_versions,
+)
 from src.constants import SUPPORTED_PENNYLANE_VERSIONS
 
 load_dotenv(verbose=True)
-if not os.environ.get("OPENAI_API_KEY"):
-    os.environ["OPENAI_API_KEY"] = getpass.getpass("Enter API key for OpenAI: ")
 
 OPENAI_MODEL_VERSION = "gpt-4.1-2025-04-14"
 
@@ -39,8 +45,7 @@ class APIDocResult(BaseModel):
 
 
 def get_prompt_template() -> ChatPromptTemplate:
-    system_prompt_template = dedent(
-        """
+    system_prompt_template = dedent("""
         You are a software engineer with excellent explanatory skills.
         You will be provided with the method name, its arguments and their types, 
         the method's docstring, and the method's source code.
@@ -51,8 +56,7 @@ def get_prompt_template() -> ChatPromptTemplate:
 
         When creating all descriptions, use only the provided source code and docstring—prioritizing 
         the source code whenever the docstring may be outdated or conflicting.
-        """
-    )
+        """)
 
     user_prompt_template = """
             Please format the following method information into a structured format.
@@ -85,62 +89,88 @@ def get_prompt_template() -> ChatPromptTemplate:
     return ChatPromptTemplate.from_messages([("system", system_prompt_template), ("user", user_prompt_template)])
 
 
-def format_method_info(method_name: str, method_info: dict) -> str:
-    return f"""
-    Method: {method_name}
-    Signature: {method_info['signature']}
-    Docstring: {method_info['docstring']}
-    Source: {method_info['source']}
-    """
+class LangChainFormattingModel:
+    """Formats a method with a chat model returning structured output (`include_raw=True`)."""
+
+    def __init__(self, model: Any, prompt_template: ChatPromptTemplate) -> None:
+        self.model = model
+        self.prompt_template = prompt_template
 
+    async def aformat(self, method_name: str, method_info: dict[str, Any]) -> Completion:
+        formatted_method_info = format_method_info(method_name, method_info)
+        prompt = await self.prompt_template.ainvoke({"formatted_method_info": formatted_method_info})
+
+        response = await self.model.ainvoke(prompt)
+        if response["parsed"] is None:
+            raise ValueError(f"Failed to parse the response for {method_name}: {response['parsing_error']}")
+        metadata = response["raw"].usage_metadata or {}
+        usage = Usage(
+            input_tokens=metadata.get("input_tokens", 0),
+            cached_tokens=metadata.get("input_token_details", {}).get("cache_read", 0),
+            output_tokens=metadata.get("output_tokens", 0),
+        )
+        return Completion(result=response["parsed"].model_dump(), usage=usage)
 
-def format_docs_by_llm(versions: list[str]) -> None:
+
+def get_model() -> FormattingModel:
+    if os.environ.get("LLM_STUB"):
+        # dry run without API calls
+        return StubChatModel()
+
+    if not os.environ.get("OPENAI_API_KEY"):
+        os.environ["OPENAI_API_KEY"] = getpass.getpass("Enter API key for OpenAI: ")
     model = init_chat_model(
         model_provider="openai", model=OPENAI_MODEL_VERSION, temperature=0.0, timeout=1000
     ).with_structured_output(APIDocResult, include_raw=True)
-    prompt_template = get_prompt_template()
-    total_cost = 0.0
-
-    for version in versions:
-        with open(RAW_JSON_DIR / f"{version}.json", "r") as f:
-            api_docs = json.load(f)
-
-        results_dict = {}
-        for i, (method_name, method_info) in enumerate(tqdm(api_docs.items())):
-            formatted_method_info = format_method_info(method_name, method_info)
-            prompt = prompt_template.invoke({"formatted_method_info": formatted_method_info})
+    return LangChainFormattingModel(model, get_prompt_template())
+
+
+def get_pipeline_config() -> PipelineConfig:
+    requests_per_minute = os.environ.get("LLM_REQUESTS_PER_MINUTE")
+    tokens_per_minute = os.environ.get("LLM_TOKENS_PER_MINUTE")
+    return PipelineConfig(
+        model_version=OPENAI_MODEL_VERSION,
+        concurrency=int(os.environ.get("LLM_CONCURRENCY", 8)),
+        requests_per_minute=float(requests_per_minute) if requests_per_minute else None,
+        tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+        max_retries=int(os.environ.get("LLM_MAX_RETRIES", 5)),
+    )
 
-            response = model.invoke(prompt)
-            metadata = response["raw"].usage_metadata  # type: ignore
-            result = response["parsed"].model_dump()  # type: ignore
-            results_dict[method_name] = result
 
-            cost = calculate_cost(
-                input_tokens=metadata.get("input_tokens", 0),
-                cached_tokens=metadata.get("cached_tokens", 0),
-                output_tokens=metadata.get("output_tokens", 0),
-                model_version=OPENAI_MODEL_VERSION,
-            )
-            total_cost += cost
+def format_docs_by_llm(versions: list[str]) -> bool:
+    """Format the versions and report the cost of each one. Returns whether every method was formatted."""
+    reports = asyncio.run(
+        format_versions(get_model(), versions, RAW_JSON_DIR, FORMATTED_JSON_DIR, get_pipeline_config())
+    )
 
-            if i % 30 == 0:
-                with open(FORMATTED_JSON_DIR / f"{version}.json", "w") as f:
-                    json.dump(results_dict, f)
-                logger.info(f"Saved {i} methods. Cost: ${total_cost}")
+    total_cost = 0.0
+    for report in reports:
+        total_cost += report.cost
+        logger.info(
+            f"All {report.version} methods processed: {len(report.formatted)} formatted, "
+            f"{len(report.reused)} reused from an earlier version, {len(report.resumed)} resumed, "
+            f"{len(report.failed)} failed. "
+            f"Tokens: {report.usage.input_tokens} in, {report.usage.output_tokens} out. Cost: ${report.cost}"
+        )
+    logger.info(f"Total cost: ${total_cost}")
 
-        logger.info(f"All {version} methods processed. Cost: ${total_cost}")
+    for report in reports:
+        for name, error in sorted(report.failed.items()):
+            logger.error(f"Failed to format {name} of {report.version}: {error}")
+        if report.failed:
+            logger.error(f"The formatted reference of {report.version} was not written, run again to retry")
+    return not any(report.failed for report in reports)
 
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
-        print(
-            """No version specified. Using default supported versions.
+        print("""No version specified. Using default supported versions.
         If you want to specify a version, please use the following format:
         python format_docs_by_llm.py <version1>,<version2>,<version3>
-        """
-        )
+        """)
         versions = SUPPORTED_PENNYLANE_VERSIONS
     else:
         versions = sys.argv[1].split(",")
 
-    format_docs_by_llm(versions)
+    if not format_docs_by_llm(versions):
+        sys.exit(1)
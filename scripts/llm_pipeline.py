@@ -0,0 +1,396 @@
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional, Protocol
+
+from scripts.cost import calculate_cost
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+# rough number of characters per token, used to reserve tokens before a request
+CHARS_PER_TOKEN = 4
+# tokens reserved for the answer of a request, the actual usage is reconciled once the answer arrives
+ESTIMATED_OUTPUT_TOKENS = 500
+
+
+@dataclass
+class Usage:
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+
+    def __iadd__(self, other: "Usage") -> "Usage":
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        return self
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+@dataclass
+class Completion:
+    """The formatted document of a method (`{"args": [...], "description": ...}`) and the tokens it cost."""
+
+    result: dict[str, Any]
+    usage: Usage
+
+
+class FormattingModel(Protocol):
+    async def aformat(self, method_name: str, method_info: dict[str, Any]) -> Completion: ...
+
+
+def format_method_info(method_name: str, method_info: dict) -> str:
+    return f"""
+    Method: {method_name}
+    Signature: {method_info['signature']}
+    Docstring: {method_info['docstring']}
+    Source: {method_info['source']}
+    """
+
+
+def estimate_tokens(method_name: str, method_info: dict) -> int:
+    return len(format_method_info(method_name, method_info)) // CHARS_PER_TOKEN + ESTIMATED_OUTPUT_TOKENS
+
+
+def source_hash(method_info: dict) -> str:
+    """Hash of everything the model sees about a method, the formatted document is reused while it is unchanged."""
+    data = json.dumps([method_info.get("signature"), method_info.get("docstring"), method_info.get("source")])
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class StubChatModel:
+    """
+    Offline model for tests and dry runs. Derives the arguments from the signature and reports a token usage
+    proportional to the size of the prompt and of the answer.
+
+    Args:
+        latency: Seconds each call takes
+        failures: Number of times the calls for a method fail before succeeding, ex: {"qml.RX": 2}
+    """
+
+    def __init__(self, latency: float = 0.0, failures: Optional[dict[str, int]] = None) -> None:
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.calls: list[str] = []
+
+    async def aformat(self, method_name: str, method_info: dict[str, Any]) -> Completion:
+        self.calls.append(method_name)
+        await asyncio.sleep(self.latency)
+        if self.failures.get(method_name, 0) > 0:
+            self.failures[method_name] -= 1
+            raise ConnectionError(f"Stub failure for {method_name}")
+
+        result = {"args": _args_from_signature(method_info.get("signature")), "description": f"{method_name}."}
+        usage = Usage(
+            input_tokens=len(format_method_info(method_name, method_info)) // CHARS_PER_TOKEN,
+            output_tokens=len(json.dumps(result)) // CHARS_PER_TOKEN,
+        )
+        return Completion(result=result, usage=usage)
+
+
+def _args_from_signature(signature: Optional[str]) -> list[dict[str, Any]]:
+    try:
+        function = ast.parse(f"def f{signature}: pass").body[0]
+    except (SyntaxError, TypeError):
+        return []
+    assert isinstance(function, ast.FunctionDef)
+
+    arguments = function.args
+    positional = arguments.posonlyargs + arguments.args
+    # defaults apply to the last positional arguments
+    defaults = [None] * (len(positional) - len(arguments.defaults)) + list(arguments.defaults)
+    params = list(zip(positional, defaults)) + list(zip(arguments.kwonlyargs, arguments.kw_defaults))
+    return [
+        {
+            "name": arg.arg,
+            "type": ast.unparse(arg.annotation) if arg.annotation is not None else "Any",
+            "required": default is None,
+            "description": f"The {arg.arg} argument.",
+        }
+        for arg, default in params
+        if arg.arg != "self"
+    ]
+
+
+class RateLimiter:
+    """
+    Token buckets limiting the requests and the tokens sent per minute. A limit of None disables the bucket.
+
+    Tokens are reserved from an estimate before a request and reconciled with the actual usage after it,
+    so the token bucket may go negative and delay the following requests.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._requests = requests_per_minute or 0.0
+        self._tokens = tokens_per_minute or 0.0
+        self._updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.requests_per_minute is not None:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute is not None:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests_per_minute is not None and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute is not None:
+            # a request larger than the whole bucket waits for a full bucket instead of forever
+            needed = min(tokens, self.tokens_per_minute)
+            if self._tokens < needed:
+                wait = max(wait, (needed - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens: int) -> None:
+        # the lock makes waiting requests go through in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._requests -= 1
+            self._tokens -= tokens
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        self._tokens += estimated_tokens - actual_tokens
+
+
+@dataclass
+class PipelineConfig:
+    """
+    Attributes:
+        model_version: Model version used to compute the cost, ex: "gpt-4.1-2025-04-14"
+        concurrency: Maximum number of requests in flight
+        requests_per_minute: Request rate limit, None for no limit
+        tokens_per_minute: Token rate limit, None for no limit
+        max_retries: Number of retries of a failed request before the method is reported as failed
+        backoff_base: Delay before the first retry in seconds, doubled on every retry
+        backoff_max: Maximum delay between two retries in seconds
+    """
+
+    model_version: str
+    concurrency: int = 8
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_retries: int = 5
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+
+
+@dataclass
+class VersionReport:
+    version: str
+    formatted: list[str] = field(default_factory=list)
+    reused: list[str] = field(default_factory=list)
+    resumed: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    usage: Usage = field(default_factory=Usage)
+    cost: float = 0.0
+
+
+def checkpoint_path(formatted_dir: Path, version: str) -> Path:
+    return formatted_dir / f".{version}{CHECKPOINT_SUFFIX}"
+
+
+def load_checkpoint(path: Path) -> dict[str, dict[str, Any]]:
+    """
+    Read the records of a checkpoint, keyed by method name. A truncated last line, left by an interrupted run,
+    is ignored.
+    """
+    records: dict[str, dict[str, Any]] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["name"]] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_reusable_results(version: str, raw_dir: Path, formatted_dir: Path) -> dict[str, dict[str, Any]]:
+    """
+    Collect the formatted documents of the versions older than `version`, keyed by the source hash of the method.
+    When several versions have the same source, the newest document wins.
+    """
+    reusable: dict[str, dict[str, Any]] = {}
+    older = SUPPORTED_PENNYLANE_VERSIONS[: SUPPORTED_PENNYLANE_VERSIONS.index(version)]
+    for older_version in older:
+        raw_path, formatted_path = raw_dir / f"{older_version}.json", formatted_dir / f"{older_version}.json"
+        if not (raw_path.exists() and formatted_path.exists()):
+            continue
+        with open(raw_path) as f:
+            raw = json.load(f)
+        with open(formatted_path) as f:
+            formatted = json.load(f)
+        for name, method_info in raw.items():
+            if name in formatted:
+                reusable[source_hash(method_info)] = formatted[name]
+    return reusable
+
+
+async def _format_with_retries(
+    model: FormattingModel, name: str, method_info: dict, config: PipelineConfig, limiter: RateLimiter
+) -> Completion:
+    attempt = 0
+    while True:
+        estimated = estimate_tokens(name, method_info)
+        await limiter.acquire(estimated)
+        try:
+            completion = await model.aformat(name, method_info)
+        except Exception:
+            limiter.reconcile(estimated, 0)
+            if attempt >= config.max_retries:
+                raise
+            # exponential backoff with jitter, so that throttled requests do not retry in lockstep
+            delay = min(config.backoff_max, config.backoff_base * 2**attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        limiter.reconcile(estimated, completion.usage.total_tokens)
+        return completion
+
+
+async def format_version(
+    model: FormattingModel,
+    version: str,
+    raw_dir: Path,
+    formatted_dir: Path,
+    config: PipelineConfig,
+    limiter: Optional[RateLimiter] = None,
+) -> VersionReport:
+    """
+    Format the raw reference of a version and write `<formatted_dir>/<version>.json`.
+
+    Each formatted method is appended to a checkpoint file as soon as it completes. A method is not sent to the
+    model when the checkpoint already has it with the same source hash (resumed), or when an older version has a
+    formatted document for the same source (reused). The checkpoint is kept after the run, so a later run only
+    formats the methods whose source changed.
+
+    Args:
+        model: Model formatting one method per call
+        version: Version to format
+        raw_dir: Directory of the raw reference JSON files
+        formatted_dir: Directory the formatted reference and the checkpoint are written to
+        config: Concurrency, rate limits, retries and model version
+        limiter: Rate limiter, shared when several versions are formatted concurrently
+
+    Returns:
+        VersionReport: Methods formatted, reused, resumed and failed, token usage and cost. When some methods failed
+            after all retries, the formatted reference is not written, the other methods are checkpointed so that a
+            later run only formats the failed ones.
+    """
+    formatted_dir.mkdir(parents=True, exist_ok=True)
+    limiter = limiter or RateLimiter(config.requests_per_minute, config.tokens_per_minute)
+    report = VersionReport(version=version)
+    with open(raw_dir / f"{version}.json") as f:
+        raw: dict[str, dict] = json.load(f)
+
+    hashes = {name: source_hash(method_info) for name, method_info in raw.items()}
+    checkpoint = checkpoint_path(formatted_dir, version)
+    records = {
+        name: record
+        for name, record in load_checkpoint(checkpoint).items()
+        if name in hashes and record["hash"] == hashes[name]
+    }
+    report.resumed = sorted(records)
+    reusable = load_reusable_results(version, raw_dir, formatted_dir)
+    semaphore = asyncio.Semaphore(config.concurrency)
+
+    with open(checkpoint, "a") as checkpoint_file:
+
+        def save(name: str, result: dict[str, Any]) -> None:
+            record = {"name": name, "hash": hashes[name], "result": result}
+            records[name] = record
+            checkpoint_file.write(json.dumps(record) + "\n")
+            checkpoint_file.flush()
+
+        async def format_method(name: str) -> None:
+            async with semaphore:
+                try:
+                    completion = await _format_with_retries(model, name, raw[name], config, limiter)
+                except Exception as e:
+                    report.failed[name] = f"{type(e).__name__}: {e}"
+                    return
+            save(name, completion.result)
+            report.formatted.append(name)
+            report.usage += completion.usage
+            report.cost += calculate_cost(
+                input_tokens=completion.usage.input_tokens,
+                cached_tokens=completion.usage.cached_tokens,
+                output_tokens=completion.usage.output_tokens,
+                model_version=config.model_version,
+            )
+
+        pending = []
+        for name in raw:
+            if name in records:
+                continue
+            if hashes[name] in reusable:
+                save(name, reusable[hashes[name]])
+                report.reused.append(name)
+            else:
+                pending.append(name)
+        await asyncio.gather(*(format_method(name) for name in pending))
+
+    report.formatted.sort()
+    if report.failed:
+        # an incomplete reference is not served, the checkpoint keeps what was formatted and paid for
+        return report
+
+    # the checkpoint is compacted, entries of methods whose source changed since are dropped
+    _write_atomic(checkpoint, "".join(json.dumps(records[name]) + "\n" for name in raw))
+    _write_atomic(formatted_dir / f"{version}.json", json.dumps({name: records[name]["result"] for name in raw}))
+    return report
+
+
+async def format_versions(
+    model: FormattingModel, versions: list[str], raw_dir: Path, formatted_dir: Path, config: PipelineConfig
+) -> list[VersionReport]:
+    """
+    Format the versions one after the other, oldest first, so that each version reuses the documents of the
+    previous ones. The rate limits are shared by all versions. A version with failed methods does not stop the
+    next ones, see `VersionReport.failed`.
+    """
+    limiter = RateLimiter(config.requests_per_minute, config.tokens_per_minute)
+    ordered = sorted(versions, key=SUPPORTED_PENNYLANE_VERSIONS.index)
+    return [await format_version(model, v, raw_dir, formatted_dir, config, limiter) for v in ordered]
@@ -1,11 +1,17 @@
+import argparse
 import importlib
 import importlib.util
 import inspect
 import json
+import os
 import pkgutil
-import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
 
-import pennylane as qml
+# prefix of the entry names, ex: "qml.RX"
+ALIAS = "qml"
 
 
 def walk_qml_modules(package):
@@ -14,40 +20,166 @@ def walk_qml_modules(package):
         yield mod_name
 
 
-def parse_api():
-    print(f"Pennylane version: {qml.__version__}")
-    result = {}
-    for mod_name in walk_qml_modules(qml):
-        try:
-            module = importlib.import_module(mod_name)
-        except Exception:
+@dataclass
+class ModuleResult:
+    name: str
+    entries: list[tuple[str, dict[str, Optional[str]]]] = field(default_factory=list)
+    import_seconds: float = 0.0
+    extract_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+# state of a worker process, set by _init_worker
+_package: Any = None
+# id(obj) -> (obj, entry), the object is kept so that its id is not reused
+_extracted: dict[int, tuple[Any, dict[str, Optional[str]]]] = {}
+
+
+def _init_worker(package_name: str) -> None:
+    global _package
+    _package = importlib.import_module(package_name)
+    _extracted.clear()
+
+
+def _extract(obj: Any) -> dict[str, Optional[str]]:
+    # an object re-exported by several modules is only inspected once
+    memo = _extracted.get(id(obj))
+    if memo is not None:
+        return memo[1]
+
+    try:
+        source = inspect.getsource(obj)
+    except (OSError, TypeError):
+        source = None
+    try:
+        sig = str(inspect.signature(obj))
+    except (ValueError, TypeError):
+        sig = None
+    doc = inspect.getdoc(obj) or ""
+    entry = {"signature": sig, "docstring": doc, "source": source}
+    _extracted[id(obj)] = (obj, entry)
+    return entry
+
+
+def extract_module(mod_name: str) -> ModuleResult:
+    """
+    Import a module and extract the classes and functions it exposes under the top-level package.
+
+    An entry is emitted for every name under which the package itself exposes the same object as the module,
+    including aliases (ex: `Rotation = RX`). An object exposed by several modules or under several names is
+    only inspected once per worker process, the duplicated entries are dropped by `write_entries`.
+    """
+    result = ModuleResult(name=mod_name)
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(mod_name)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+    finally:
+        result.import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for attr_name, obj in inspect.getmembers(module, predicate=lambda o: inspect.isclass(o) or inspect.isfunction(o)):
+        if getattr(_package, attr_name, None) is not obj:
             continue
-        for attr_name, obj in inspect.getmembers(
-            module, predicate=lambda o: inspect.isclass(o) or inspect.isfunction(o)
-        ):
-            if not hasattr(qml, attr_name):
-                continue
-            fq = f"qml.{attr_name}"
-            try:
-                source = inspect.getsource(obj)
-            except (OSError, TypeError):
-                source = None
-            try:
-                sig = str(inspect.signature(obj))
-            except (ValueError, TypeError):
-                sig = None
-            doc = inspect.getdoc(obj) or ""
-            result[fq] = {"signature": sig, "docstring": doc, "source": source}
+        result.entries.append((f"{ALIAS}.{attr_name}", _extract(obj)))
+    result.extract_seconds = time.perf_counter() - start
     return result
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python parse_pennylane_api.py <output_json_path>")
-        sys.exit(1)
+def parse_api(package_name: str = "pennylane", max_workers: Optional[int] = None) -> Iterator[ModuleResult]:
+    """
+    Extract the API of the package, importing its modules in parallel on a process pool.
+
+    Yields:
+        ModuleResult: The entries and timings of each module, in walk order, as soon as they are available
+    """
+    package = importlib.import_module(package_name)
+    print(f"{package_name} version: {getattr(package, '__version__', 'unknown')}")
+    modules = list(walk_qml_modules(package))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(package_name,)) as executor:
+        # a few modules per task, the imports of a package's modules share most of their dependencies
+        yield from executor.map(extract_module, modules, chunksize=4)
+
 
-    out_path = sys.argv[1]
-    data = parse_api()
+def write_entries(out_path: str, results: Iterable[ModuleResult], previous: Optional[dict[str, Any]] = None) -> dict:
+    """
+    Stream the entries to a JSON file, as they are extracted.
+
+    In diff mode (`previous` is the dump of another version), only the entries that are new or differ from
+    `previous` are written, and entries missing from this version are written as null.
+
+    Returns:
+        dict: Entry counts ("written", "unchanged", "removed") and the per-module timings
+    """
+    seen: set[str] = set()
+    stats: dict[str, Any] = {"written": 0, "unchanged": 0, "removed": 0, "modules": {}}
     with open(out_path, "w", encoding="utf-8") as fp:
-        json.dump(data, fp, ensure_ascii=False, indent=2)
-    print(f"Written {len(data)} entries to {out_path}")
+        fp.write("{")
+
+        def write(name: str, entry: Optional[dict]) -> None:
+            separator = "," if stats["written"] + stats["removed"] else ""
+            value = json.dumps(entry, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            fp.write(f"{separator}\n  {json.dumps(name, ensure_ascii=False)}: {value}")
+
+        for result in results:
+            stats["modules"][result.name] = {
+                "import_seconds": result.import_seconds,
+                "extract_seconds": result.extract_seconds,
+                "entries": len(result.entries),
+                "error": result.error,
+            }
+            for name, entry in result.entries:
+                if name in seen:
+                    continue
+                seen.add(name)
+                if previous is not None and previous.get(name) == entry:
+                    stats["unchanged"] += 1
+                    continue
+                write(name, entry)
+                stats["written"] += 1
+
+        if previous is not None:
+            for name in previous.keys() - seen:
+                write(name, None)
+                stats["removed"] += 1
+        fp.write("\n}\n")
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extract the PennyLane API into a JSON file.")
+    parser.add_argument("output_json_path")
+    parser.add_argument("--diff", metavar="PREVIOUS_JSON_PATH", help="only write the entries changed since this dump")
+    parser.add_argument("--timings", metavar="TIMINGS_JSON_PATH", help="write the per-module timings to this file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--package", default="pennylane", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    previous = None
+    if args.diff:
+        with open(args.diff, encoding="utf-8") as fp:
+            previous = json.load(fp)
+
+    stats = write_entries(args.output_json_path, parse_api(args.package, args.workers), previous)
+    if previous is None:
+        print(f"Written {stats['written']} entries to {args.output_json_path}")
+    else:
+        print(
+            f"Written {stats['written']} changed and {stats['removed']} removed entries to {args.output_json_path}, "
+            f"{stats['unchanged']} unchanged"
+        )
+
+    modules = stats["modules"]
+    slowest = sorted(modules, key=lambda m: modules[m]["import_seconds"] + modules[m]["extract_seconds"], reverse=True)
+    print("Slowest modules (import + extract):")
+    for name in slowest[:10]:
+        print(f"  {name}: {modules[name]['import_seconds']:.3f}s + {modules[name]['extract_seconds']:.3f}s")
+    if args.timings:
+        with open(args.timings, "w", encoding="utf-8") as fp:
+            json.dump(modules, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
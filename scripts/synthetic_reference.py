@@ -0,0 +1,98 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+
+TYPES = ["int", "float", "bool", "str", "Sequence[int]", "Optional[str]", "Union[int, Sequence[int]]", "Operator"]
+WORDS = "the of qubit wire gate operator rotation angle matrix measurement device circuit state value".split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def generate_references(
+    versions: list[str], methods: int, seed: int = 0
+) -> dict[str, tuple[dict[str, dict], dict[str, dict]]]:
+    """
+    Generate raw and formatted references shaped like the real PennyLane dumps.
+
+    Consecutive versions share most of their methods with identical entries, a few methods are added, removed
+    or get a new argument from one version to the next.
+
+    Args:
+        versions: Versions to generate, oldest first
+        methods: Number of methods per version
+        seed: Seed of the generator, the same seed always generates the same references
+
+    Returns:
+        dict[str, tuple[dict[str, dict], dict[str, dict]]]: The (raw, formatted) references of each version
+    """
+    rng = random.Random(seed)
+
+    def make_entry(name: str, args: list[dict]) -> tuple[dict, dict]:
+        params = ", ".join(arg["name"] if arg["required"] else f"{arg['name']}=None" for arg in args)
+        raw = {
+            "signature": f"({params})",
+            "docstring": "\n\n".join(_sentence(rng, 30) for _ in range(4)),
+            "source": f"class {name.split('.')[-1]}(Operation):\n"
+            + "\n".join(f"    # {_sentence(rng, 10)}" for _ in range(20)),
+        }
+        return raw, {"args": args, "description": _sentence(rng, 20)}
+
+    entries: dict[str, tuple[dict, dict]] = {}
+    for i in range(methods):
+        args = [
+            {
+                "name": f"arg{j}" if j else "wires",
+                "type": rng.choice(TYPES),
+                "required": j < 2,
+                "description": _sentence(rng, 8),
+            }
+            for j in range(rng.randint(1, 6))
+        ]
+        entries[f"qml.Op{i}"] = make_entry(f"qml.Op{i}", args)
+
+    references = {}
+    next_method = methods
+    for version in versions:
+        # ~1% of the methods change between two versions: one removed, one added and one with a new argument
+        for _ in range(max(1, methods // 100)):
+            del entries[rng.choice(list(entries))]
+            name = f"qml.Op{next_method}"
+            next_method += 1
+            wires = {"name": "wires", "type": "Sequence[int]", "required": True, "description": _sentence(rng, 8)}
+            entries[name] = make_entry(name, [wires])
+            name = rng.choice(list(entries))
+            new_arg = {"name": f"new{next_method}", "type": "bool", "required": False, "description": "New."}
+            entries[name] = make_entry(name, entries[name][1]["args"] + [new_arg])
+
+        raw = {name: entry[0] for name, entry in entries.items()}
+        formatted = {name: entry[1] for name, entry in entries.items()}
+        references[version] = (raw, formatted)
+    return references
+
+
+def write_references(ref_docs_dir: Path, versions: list[str], methods: int, seed: int = 0) -> None:
+    """
+    Write generated references with the same layout as the synced reference directory.
+    """
+    raw_dir = ref_docs_dir / "pennylane" / "raw"
+    formatted_dir = ref_docs_dir / "pennylane" / "formatted"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    formatted_dir.mkdir(parents=True, exist_ok=True)
+    for version, (raw, formatted) in generate_references(versions, methods, seed).items():
+        (raw_dir / f"{version}.json").write_text(json.dumps(raw, indent=2))
+        (formatted_dir / f"{version}.json").write_text(json.dumps(formatted, indent=2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python synthetic_reference.py <ref_docs_dir> [<methods_per_version>]")
+        sys.exit(1)
+
+    methods = int(sys.argv[2]) if len(sys.argv) == 3 else 3000
+    write_references(Path(sys.argv[1]), SUPPORTED_PENNYLANE_VERSIONS, methods)
+    print(f"Written {len(SUPPORTED_PENNYLANE_VERSIONS)} versions of {methods} methods to {sys.argv[1]}")
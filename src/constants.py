@@ -1,10 +1,15 @@
+import os
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).parent.absolute()
-REF_DOCS_DIR = PROJECT_ROOT / "refdocs"
+# Overridable to serve references from another directory, ex: the synthetic references of the benchmarks.
+REF_DOCS_DIR = Path(os.environ.get("REF_DOCS_DIR", PROJECT_ROOT / "refdocs"))
 
 RAW_PENNYLANE_JSON_DIR = REF_DOCS_DIR / "pennylane" / "raw"
 FORMATTED_PENNYLANE_JSON_DIR = REF_DOCS_DIR / "pennylane" / "formatted"
+INDEXED_PENNYLANE_DIR = REF_DOCS_DIR / "pennylane" / "index"
+COMPATIBILITY_INDEX_PATH = REF_DOCS_DIR / "pennylane" / "compatibility.json"
+REFERENCE_BUNDLE_PATH = REF_DOCS_DIR / "pennylane" / "reference.bundle"
 
 
 SUPPORTED_PENNYLANE_VERSIONS = [
@@ -19,3 +24,60 @@ SUPPORTED_PENNYLANE_VERSIONS = [
     "v0.41.0",
     "v0.41.1",
 ]
+
+# Serve the references from the precompiled bundle when it exists, instead of parsing the JSON files.
+USE_REFERENCE_BUNDLE = os.environ.get("USE_REFERENCE_BUNDLE", "1").lower() not in ("0", "false", "no")
+# Maximum number of parsed reference files kept in memory per process.
+REFERENCE_CACHE_SIZE = len(SUPPORTED_PENNYLANE_VERSIONS)
+# Minimum number of seconds between two checks of a cached reference file's mtime and size.
+REFERENCE_CACHE_CHECK_INTERVAL = 1.0
+
+# Number of worker processes used by the batch validation tool.
+BATCH_VALIDATION_MAX_WORKERS = int(os.environ.get("BATCH_VALIDATION_MAX_WORKERS", os.cpu_count() or 1))
+# Maximum number of items accepted in a single batch validation request.
+BATCH_VALIDATION_MAX_ITEMS = int(os.environ.get("BATCH_VALIDATION_MAX_ITEMS", 100))
+
+# Executor the server runs tool calls on, off the event loop: "thread" or "process".
+TOOL_EXECUTOR_KIND = os.environ.get("TOOL_EXECUTOR_KIND", "thread")
+# Number of tool calls running at the same time.
+TOOL_MAX_CONCURRENCY = int(os.environ.get("TOOL_MAX_CONCURRENCY", 4))
+# Number of tool calls waiting for a free worker before new calls are rejected as overloaded.
+TOOL_MAX_QUEUE = int(os.environ.get("TOOL_MAX_QUEUE", 32))
+
+# Limits of a single validation, larger or deeper submissions get a "limit exceeded" result instead of being validated.
+VALIDATION_MAX_CODE_CHARS = int(os.environ.get("VALIDATION_MAX_CODE_CHARS", 1_000_000))
+VALIDATION_MAX_CALLS = int(os.environ.get("VALIDATION_MAX_CALLS", 20_000))
+# Nesting depth of the syntax tree, deeper trees overflow the recursion of the tree walks.
+VALIDATION_MAX_DEPTH = int(os.environ.get("VALIDATION_MAX_DEPTH", 400))
+# Number of seconds a validation may run before its worker process is killed (default: 10, 0 disables the deadline).
+VALIDATION_TIMEOUT = float(os.environ.get("VALIDATION_TIMEOUT", 10))
+# Code shorter than this is validated in-process: within the limits above it cannot run long enough to need a deadline.
+VALIDATION_ISOLATION_MIN_CHARS = int(os.environ.get("VALIDATION_ISOLATION_MIN_CHARS", 20_000))
+# Check literal argument values (numbers, strings, None, lists, tuples, sets, dicts) against the argument types.
+VALIDATION_CHECK_TYPES = os.environ.get("VALIDATION_CHECK_TYPES", "1").lower() not in ("0", "false", "no")
+
+# Default maximum size in bytes of the documentation returned by the reference tool, 0 (the default) for no limit.
+REFERENCE_MAX_BYTES = int(os.environ.get("REFERENCE_MAX_BYTES", 0))
+# Maximum number of results of a page of the reference search tool.
+SEARCH_MAX_PAGE_SIZE = int(os.environ.get("SEARCH_MAX_PAGE_SIZE", 50))
+
+# Maximum number of validation results kept in memory per process.
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 1024))
+# Number of seconds a cached validation result stays valid.
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 600))
+
+# Fraction of tool calls profiled with cProfile, ex: 0.01 for 1% (default: 0, off).
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+# Tool calls taking at least this many seconds are profiled (default: 0, off). Every call then runs under the profiler.
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", 0))
+# Directory the profiles are written to, and the number of profiles kept in it before the oldest are removed.
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", PROJECT_ROOT.parent / "profiles"))
+PROFILE_MAX_DUMPS = int(os.environ.get("PROFILE_MAX_DUMPS", 200))
+
+# Number of documents whose per-definition results are kept for incremental validation, and the number of seconds
+# a document is kept after its last validation.
+INCREMENTAL_MAX_SESSIONS = int(os.environ.get("INCREMENTAL_MAX_SESSIONS", 256))
+INCREMENTAL_SESSION_TTL = float(os.environ.get("INCREMENTAL_SESSION_TTL", 3600))
+
+# Maximum number of reference files downloaded in parallel by src/setup.py.
+SYNC_MAX_WORKERS = int(os.environ.get("SYNC_MAX_WORKERS", 8))
@@ -0,0 +1,225 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Optional, TypeVar
+
+from src.constants import TOOL_EXECUTOR_KIND, TOOL_MAX_CONCURRENCY, TOOL_MAX_QUEUE
+
+T = TypeVar("T")
+
+
+class ToolOverloadedError(RuntimeError):
+    """Raised when a tool call is rejected because the executor queue is full."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call run on a `KillableWorkerPool` does not complete before its deadline."""
+
+
+class BoundedExecutor:
+    """Runs blocking tool functions off the event loop with bounded concurrency and a bounded queue.
+
+    At most `max_workers` calls run at the same time and at most `max_queue` more wait for a worker.
+    Further calls are rejected immediately with `ToolOverloadedError`, so that the event loop and cheap
+    routes such as `/healthz` stay responsive while large submissions are running.
+
+    Args:
+        max_workers (int): The number of calls running at the same time.
+        max_queue (int): The number of calls waiting for a free worker.
+        kind (str): "thread" or "process". Functions run on a process executor must be picklable.
+            Calls made with `in_process=True` always run on threads, ex: tools that keep state in the server.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, kind: str = "thread") -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: '{kind}' (expected 'thread' or 'process')")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor: Executor | None = None
+        self._thread_executor: ThreadPoolExecutor | None = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self, in_process: bool = False) -> Executor:
+        if in_process and self.kind == "process":
+            if self._thread_executor is None:
+                self._thread_executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+            return self._thread_executor
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._executor
+
+    @property
+    def in_flight(self) -> int:
+        """The number of calls running or waiting for a worker."""
+        return self._in_flight
+
+    async def run(self, func: Callable[..., T], *args: Any, in_process: bool = False) -> T:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                raise ToolOverloadedError(
+                    f"Server is overloaded: {self._in_flight} requests are in progress. Please retry later."
+                )
+            self._in_flight += 1
+            executor = self._get_executor(in_process)
+
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # a call cancelled by its caller (ex: a client disconnect) keeps running in its worker, it counts until it
+        # completes, not until the caller stops waiting
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+            if self._thread_executor is not None:
+                self._thread_executor.shutdown(cancel_futures=True)
+                self._thread_executor = None
+
+
+tool_executor = BoundedExecutor(max_workers=TOOL_MAX_CONCURRENCY, max_queue=TOOL_MAX_QUEUE, kind=TOOL_EXECUTOR_KIND)
+
+
+def _worker_main(conn: Connection, initializer: Optional[Callable[[], None]] = None) -> None:
+    # runs the calls sent by the pool one after another, until the pool closes the connection
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        # the deadline of the call starts now, not while the worker process was starting
+        conn.send(("started", None))
+        try:
+            reply = ("ok", func(*args))
+        except BaseException as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # ex: an exception or result that cannot be pickled
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    def __init__(self, context: Any, initializer: Optional[Callable[[], None]] = None) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process: BaseProcess = context.Process(target=_worker_main, args=(child_conn, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class KillableWorkerPool:
+    """Runs calls in long-lived worker processes, and kills the worker of a call that misses its deadline.
+
+    Unlike a `ProcessPoolExecutor`, whose running tasks cannot be interrupted, a call that runs too long
+    does not keep a worker busy: its process is killed and replaced on the next call. The deadline of a call
+    starts when its worker receives it. Functions, arguments and results must be picklable.
+
+    Args:
+        max_workers (int): The number of calls running at the same time, further calls wait for a worker.
+        initializer (Optional[Callable[[], None]]): Called once in each worker process when it starts,
+            before its first call, ex: to warm up caches.
+    """
+
+    def __init__(self, max_workers: int, initializer: Optional[Callable[[], None]] = None) -> None:
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle: list[_Worker] = []
+        self._lock = threading.Lock()
+        # runs the calls of `submit`, one thread per worker
+        self._threads: Optional[ThreadPoolExecutor] = None
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+        return _Worker(self._context, self.initializer)
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            self._idle.append(worker)
+
+    def start(self, workers: Optional[int] = None) -> None:
+        """Start idle workers ahead of the first calls, which would otherwise wait for the interpreter start."""
+        with self._lock:
+            while len(self._idle) < min(workers or self.max_workers, self.max_workers):
+                self._idle.append(_Worker(self._context, self.initializer))
+
+    def run(self, timeout: Optional[float], func: Callable[..., T], *args: Any) -> T:
+        """Run `func(*args)` in a worker process and return its result.
+
+        Raises:
+            DeadlineExceededError: If the call did not complete within `timeout` seconds (None: no deadline) of its
+                worker receiving it, its worker is killed.
+            RuntimeError: If the worker process died during the call.
+        """
+        with self._slots:
+            worker = self._acquire()
+            try:
+                worker.conn.send((func, args))
+                # sent when the worker received the call
+                worker.conn.recv()
+                reply = worker.conn.recv() if worker.conn.poll(timeout) else None
+            except (EOFError, OSError) as e:
+                worker.kill()
+                raise RuntimeError(f"Worker process died (exit code {worker.process.exitcode})") from e
+            except BaseException:
+                worker.kill()
+                raise
+            if reply is None:
+                worker.kill()
+                raise DeadlineExceededError(f"Call did not complete within {timeout} seconds")
+            self._release(worker)
+
+        status, value = reply
+        if status == "error":
+            raise value
+        return value
+
+    def submit(self, timeout: Optional[float], func: Callable[..., T], *args: Any) -> "Future[T]":
+        """Run `func(*args)` like `run`, from a thread of the pool, and return its future."""
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="worker")
+            threads = self._threads
+        return threads.submit(self.run, timeout, func, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._threads is not None:
+                self._threads.shutdown(wait=False, cancel_futures=True)
+                self._threads = None
+            for worker in self._idle:
+                worker.kill()
+            self._idle.clear()
@@ -0,0 +1,305 @@
+import bisect
+import math
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+
+# content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# stage latencies, from a few microseconds (reference lookups) to seconds (parsing a huge module)
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1_000, 10_000)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names.
+
+    Args:
+        name (str): The metric name, ex: "qcv_tool_requests_total".
+        help (str): The description shown in the exposition.
+        labelnames (tuple[str, ...]): The names of the labels, given as positional values to `inc`.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def snapshot(self) -> dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: dict[LabelValues, float]) -> None:
+        """Add the values of a snapshot, ex: of another process."""
+        with self._lock:
+            for labels, value in values.items():
+                self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histogram with fixed buckets and a fixed set of label names.
+
+    Only the count of each bucket is incremented on `observe`, the cumulative counts of the exposition
+    are computed on scrape.
+
+    Args:
+        name (str): The metric name, ex: "qcv_stage_duration_seconds".
+        help (str): The description shown in the exposition.
+        labelnames (tuple[str, ...]): The names of the labels, given as positional values to `observe`.
+        buckets (tuple[float, ...]): The upper bounds of the buckets, in increasing order, without +Inf.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [count of each bucket and +Inf, sum]
+        self._values: dict[LabelValues, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(labels)
+        return int(sum(counts[:-1])) if counts is not None else 0
+
+    def sum(self, *labels: str) -> float:
+        counts = self._values.get(labels)
+        return counts[-1] if counts is not None else 0.0
+
+    def snapshot(self) -> dict[LabelValues, list[float]]:
+        with self._lock:
+            return {labels: list(counts) for labels, counts in self._values.items()}
+
+    def merge(self, values: dict[LabelValues, list[float]]) -> None:
+        """Add the bucket counts and sums of a snapshot with the same buckets, ex: of another process."""
+        with self._lock:
+            for labels, counts in values.items():
+                current = self._values.get(labels)
+                if current is None:
+                    self._values[labels] = list(counts)
+                else:
+                    for i, count in enumerate(counts):
+                        current[i] += count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(cumulative)}"
+
+
+class CallbackMetric:
+    """Metric whose values are read on scrape from `callback`, ex: the counters a cache already keeps.
+
+    Args:
+        name (str): The metric name.
+        help (str): The description shown in the exposition.
+        type (str): "counter" or "gauge".
+        labelnames (tuple[str, ...]): The names of the labels.
+        callback (Callable[[], Iterable[tuple[LabelValues, float]]]): Returns the label values and value of each
+            sample.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        labelnames: tuple[str, ...],
+        callback: Callable[[], Iterable[tuple[LabelValues, float]]],
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def clear(self) -> None:
+        pass
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.callback():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+Metric = Counter | Histogram | CallbackMetric
+M = TypeVar("M", Counter, Histogram, CallbackMetric)
+T = TypeVar("T")
+
+
+class MetricsRegistry:
+    """The metrics of the process, rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def clear(self) -> None:
+        """Reset the values of all the metrics, ex: between tests."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Return the values of the counters and histograms that were recorded, by metric name."""
+        snapshot: dict[str, dict] = {}
+        for name, metric in self._metrics.items():
+            if isinstance(metric, (Counter, Histogram)):
+                values = metric.snapshot()
+                if values:
+                    snapshot[name] = values
+        return snapshot
+
+    def merge(self, snapshot: dict[str, dict]) -> None:
+        """Add the values of a snapshot of the same metrics, ex: of a worker process, see `run_recording_metrics`."""
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if isinstance(metric, (Counter, Histogram)):
+                metric.merge(values)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TOOL_REQUESTS = REGISTRY.register(
+    Counter("qcv_tool_requests_total", "Tool calls received, by tool and requested version.", ("tool", "version"))
+)
+TOOL_FAILURES = REGISTRY.register(
+    Counter("qcv_tool_failures_total", "Tool calls that raised an error, by tool and error type.", ("tool", "error"))
+)
+TOOL_DURATION = REGISTRY.register(
+    Histogram("qcv_tool_duration_seconds", "Duration of tool calls, including the executor queue.", ("tool",))
+)
+TOOL_INPUT_SIZE = REGISTRY.register(
+    Histogram(
+        "qcv_tool_input_characters", "Size of the code or name sent to a tool call.", ("tool",), buckets=SIZE_BUCKETS
+    )
+)
+STAGE_DURATION = REGISTRY.register(
+    Histogram(
+        "qcv_stage_duration_seconds", "Duration of each stage of a validation or reference request.", ("op", "stage")
+    )
+)
+VALIDATED_CALLS = REGISTRY.register(
+    Histogram(
+        "qcv_validated_calls", "Number of PennyLane calls checked per validation.", ("op",), buckets=COUNT_BUCKETS
+    )
+)
+VALIDATION_ERRORS = REGISTRY.register(
+    Counter("qcv_validation_errors_total", "Errors reported in validation results, by category.", ("category",))
+)
+
+_SUPPORTED_VERSIONS = frozenset(SUPPORTED_PENNYLANE_VERSIONS)
+
+
+def version_label(version: Optional[str]) -> str:
+    # the version is user input, only supported versions get their own label so that the label set stays bounded
+    if version is None:
+        return "default"
+    # "0.41.1" is served as "v0.41.1", see `resolve_version`
+    version = f"v{version}" if not version.startswith("v") else version
+    return version if version in _SUPPORTED_VERSIONS else "other"
+
+
+def record_stage(op: str, stage: str, start: float) -> float:
+    """Record the duration of a stage that started at `start` (a `time.perf_counter()` value).
+
+    Returns:
+        float: The end of the stage, to be passed as the start of the next stage.
+    """
+    now = time.perf_counter()
+    STAGE_DURATION.observe(now - start, op, stage)
+    return now
+
+
+def run_recording_metrics(func: Callable[..., T], *args: Any) -> tuple[T, dict[str, dict]]:
+    """Run `func(*args)` in a worker process, and return its result with the metrics it recorded.
+
+    The metrics recorded in a worker process never reach `/metrics`, the caller adds them to the metrics of the
+    server with `REGISTRY.merge`. The metrics of the worker are reset first, so the worker must run one call at
+    a time. The metrics of a call that raises are dropped.
+    """
+    REGISTRY.clear()
+    result = func(*args)
+    return result, REGISTRY.snapshot()
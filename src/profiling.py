@@ -0,0 +1,170 @@
+import cProfile
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from src.constants import PROFILE_DIR, PROFILE_MAX_DUMPS, PROFILE_SAMPLE_RATE, PROFILE_SLOW_SECONDS
+
+T = TypeVar("T")
+
+# suffixes of the files of a dump: the cProfile stats and the metadata of the call
+STATS_SUFFIX = ".prof"
+META_SUFFIX = ".json"
+
+_rotation_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 or PROFILE_SLOW_SECONDS > 0
+
+
+def input_hash(args: tuple) -> str:
+    """Hash of the arguments of a call, to find the dumps of the same input across runs without storing it."""
+    return hashlib.sha256(repr(args).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def _rotate(directory: Path, max_dumps: int) -> None:
+    # the oldest dumps are removed first, the file names start with the timestamp
+    with _rotation_lock:
+        dumps = sorted(directory.glob(f"*{STATS_SUFFIX}"))
+        for stats_path in dumps[: max(0, len(dumps) - max_dumps)]:
+            stats_path.unlink(missing_ok=True)
+            stats_path.with_suffix(META_SUFFIX).unlink(missing_ok=True)
+
+
+def write_dump(
+    profile: cProfile.Profile,
+    tool: str,
+    digest: str,
+    seconds: float,
+    reason: str,
+    directory: Path = PROFILE_DIR,
+    max_dumps: int = PROFILE_MAX_DUMPS,
+) -> Path:
+    """Write the stats of a profiled call and its metadata, then remove the oldest dumps beyond `max_dumps`.
+
+    Returns:
+        Path: The path of the stats file, readable with `pstats.Stats`.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f"{time.time_ns()}-{tool}-{digest}"
+    stats_path = directory / f"{stem}{STATS_SUFFIX}"
+    profile.dump_stats(stats_path)
+    meta = {"tool": tool, "input_hash": digest, "seconds": seconds, "reason": reason, "pid": os.getpid()}
+    stats_path.with_suffix(META_SUFFIX).write_text(json.dumps(meta))
+    _rotate(directory, max_dumps)
+    return stats_path
+
+
+@dataclass
+class _ActiveProfile:
+    # a profiled call running in a thread, see `profiled_in_worker`
+    tool: str
+    digest: str
+    sampled: bool
+    # whether the work of the call was sent to a worker process and profiled there
+    isolated: bool = False
+
+
+_local = threading.local()
+
+
+def _profile_call(
+    func: Callable[..., T],
+    args: tuple,
+    active: _ActiveProfile,
+    slow_seconds: float,
+    directory: Path,
+    max_dumps: int,
+) -> T:
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # only one profiler can be active at a time since Python 3.12, ex: another call being profiled
+        return func(*args)
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        profile.disable()
+        seconds = time.perf_counter() - start
+        slow = slow_seconds > 0 and seconds >= slow_seconds
+        # the profile of an isolated call only shows the wait for the worker, which dumps its own profile
+        if (active.sampled or slow) and not active.isolated:
+            try:
+                reason = "slow" if slow else "sampled"
+                write_dump(profile, active.tool, active.digest, seconds, reason, directory, max_dumps)
+            except OSError:
+                # a profile that cannot be written must not fail the call it profiled
+                pass
+
+
+class ProfiledCall(Generic[T]):
+    """Calls `func` under cProfile when the call is sampled or when profiling slow calls, and dumps the profile
+    when the call was sampled or took more than `PROFILE_SLOW_SECONDS`.
+
+    The profiler runs in the thread or process executing the call, and in the worker process the call sends its
+    work to, see `profiled_in_worker`. Picklable when `func` is, so that it can be run on a process executor.
+    """
+
+    def __init__(self, tool: str, func: Callable[..., T]) -> None:
+        self.tool = tool
+        self.func = func
+
+    def __call__(self, *args: Any) -> T:
+        sampled = random.random() < PROFILE_SAMPLE_RATE
+        if not (sampled or PROFILE_SLOW_SECONDS > 0):
+            return self.func(*args)
+
+        _local.active = _ActiveProfile(self.tool, input_hash(args), sampled)
+        try:
+            return _profile_call(self.func, args, _local.active, PROFILE_SLOW_SECONDS, PROFILE_DIR, PROFILE_MAX_DUMPS)
+        finally:
+            _local.active = None
+
+
+class WorkerProfiledCall(Generic[T]):
+    """Calls `func` under cProfile in a worker process, for a profiled call of the server, see `profiled_in_worker`.
+
+    The profile is dumped from the worker, with the tool and input hash of the call of the server.
+    """
+
+    def __init__(
+        self, func: Callable[..., T], active: _ActiveProfile, slow_seconds: float, directory: Path, max_dumps: int
+    ) -> None:
+        self.func = func
+        self.active = active
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        self.max_dumps = max_dumps
+
+    def __call__(self, *args: Any) -> T:
+        return _profile_call(self.func, args, self.active, self.slow_seconds, self.directory, self.max_dumps)
+
+
+def profiled_in_worker(func: Callable[..., T]) -> Callable[..., T]:
+    """Return `func` wrapped to be profiled in the worker process it is sent to, or `func` itself when the current
+    thread is not running a profiled call.
+
+    The profiled call of the thread then dumps no profile of its own, which would only show the wait for the worker.
+    """
+    active: Optional[_ActiveProfile] = getattr(_local, "active", None)
+    if active is None:
+        return func
+    active.isolated = True
+    worker_active = _ActiveProfile(active.tool, active.digest, active.sampled)
+    return WorkerProfiledCall(func, worker_active, PROFILE_SLOW_SECONDS, PROFILE_DIR, PROFILE_MAX_DUMPS)
+
+
+def profiled(tool: str, func: Callable[..., T]) -> Callable[..., T]:
+    """Return `func` wrapped to be profiled, or `func` itself when profiling is off."""
+    if not profiling_enabled():
+        return func
+    return ProfiledCall(tool, func)
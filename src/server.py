@@ -1,14 +1,103 @@
 import os
-from typing import Annotated
+import time
+from typing import Annotated, Any, Callable, Literal, Optional, TypeVar
 
 from mcp.server.fastmcp import FastMCP
 from pydantic import Field
 from starlette.requests import Request
-from starlette.responses import PlainTextResponse
+from starlette.responses import JSONResponse, PlainTextResponse, Response
 
-from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+from src import metrics
+from src.constants import (
+    BATCH_VALIDATION_MAX_ITEMS,
+    REFERENCE_MAX_BYTES,
+    SEARCH_MAX_PAGE_SIZE,
+    SUPPORTED_PENNYLANE_VERSIONS,
+    VALIDATION_TIMEOUT,
+)
+from src.executor import tool_executor
+from src.profiling import profiled
 from src.prompts import fix_by_reference_prompt, fix_error_prompt
-from src.tools import request_pennylane_reference, validate_pennylane_code_statically
+from src.tools import (
+    BatchValidationItem,
+    check_pennylane_compatibility,
+    request_pennylane_reference,
+    search_pennylane_reference,
+    validate_pennylane_code_batch,
+    validate_pennylane_code_cached,
+    validate_pennylane_code_incremental,
+)
+from src.tools.common import get_version_catalog
+from src.tools.limits import get_deadline_pool
+from src.tools.result_cache import RESULT_CACHE
+from src.tools.static_validation import REFERENCE_CACHE
+
+T = TypeVar("T")
+
+_CACHES = {"reference": REFERENCE_CACHE, "result": RESULT_CACHE}
+
+
+def _cache_samples(*keys: str) -> list[tuple[metrics.LabelValues, float]]:
+    # the caches count their own hits and misses, they are read on scrape instead of counted twice
+    samples = []
+    for cache_name, cache in _CACHES.items():
+        stats = cache.stats()
+        samples.extend(((cache_name, key), stats[key]) for key in keys if key in stats)
+    return samples
+
+
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "qcv_cache_requests_total",
+        "Cache lookups, by cache and result (hits, misses, coalesced).",
+        "counter",
+        ("cache", "result"),
+        lambda: _cache_samples("hits", "misses", "coalesced"),
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "qcv_cache_evictions_total",
+        "Entries evicted from the caches, by cache.",
+        "counter",
+        ("cache",),
+        lambda: [((name,), value) for (name, _), value in _cache_samples("evictions")],
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "qcv_cache_entries",
+        "Entries held by the caches, by cache.",
+        "gauge",
+        ("cache",),
+        lambda: [((name,), value) for (name, _), value in _cache_samples("size")],
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "qcv_tool_calls_in_flight",
+        "Tool calls running or waiting for a worker.",
+        "gauge",
+        (),
+        lambda: [((), tool_executor.in_flight)],
+    )
+)
+
+
+async def _run_tool(
+    tool: str, version: Optional[str], func: Callable[..., T], *args: Any, in_process: bool = False
+) -> T:
+    # counts the call and its errors, and times it including the wait for a worker
+    metrics.TOOL_REQUESTS.inc(tool, metrics.version_label(version))
+    start = time.perf_counter()
+    try:
+        return await tool_executor.run(profiled(tool, func), *args, in_process=in_process)
+    except Exception as e:
+        metrics.TOOL_FAILURES.inc(tool, type(e).__name__)
+        raise
+    finally:
+        metrics.TOOL_DURATION.observe(time.perf_counter() - start, tool)
+
 
 mcp = FastMCP(
     name="QuantumCodeValidator",
@@ -22,9 +111,21 @@ mcp = FastMCP(
     - validate_pennylane_method_by_static():
         - Static validation of code containing PennyLane methods.
         - This tool is used after generating code with PennyLane or when the user requests confirmation.
+    - validate_pennylane_batch():
+        - Static validation of several code snippets containing PennyLane methods in one call.
+        - This tool is used when many candidate snippets have to be validated at once.
+    - validate_pennylane_module_incrementally():
+        - Static validation of a module that is validated again after each change, with a session id.
+        - This tool is used when the same large module is edited and validated repeatedly.
+    - find_compatible_pennylane_versions():
+        - Static validation of code containing PennyLane methods against all supported versions at once.
+        - This tool is used when the user asks which PennyLane versions a code works with.
     - request_pennylane_method_reference():
         - Request reference documentation of a method in a specific version of the PennyLane library.
         - This tool is used when the user requests reference documentation for a specific method.
+    - search_pennylane_reference_by_keywords():
+        - Keyword search of the reference documentation of a specific version of the PennyLane library.
+        - This tool is used to find the methods for a task when their exact names are not known.
     """,
     dependencies=["ast", "py_compile", "pennylane"],
     log_level="INFO",
@@ -46,14 +147,104 @@ mcp = FastMCP(
         supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
     )
 )
-def validate_pennylane_method_by_static(
+async def validate_pennylane_method_by_static(
     code: Annotated[str, Field(description="source code that includes PennyLane methods.")],
     version: Annotated[
         str | None, Field(None, description="The version of the PennyLane library to use. (ex: 'v0.41.1')")
     ],
 ) -> dict:
     """Static validation of code containing PennyLane methods."""
-    return validate_pennylane_code_statically(code, version)
+    metrics.TOOL_INPUT_SIZE.observe(len(code), "validate")
+    return await _run_tool("validate", version, validate_pennylane_code_cached, code, version)
+
+
+@mcp.tool(
+    description="""Static validation of several code snippets containing PennyLane methods in one call.
+    PennyLane is a Python library for quantum computing.
+
+    Each item has an id, the code and an optional version, and is validated with the same steps as
+    validate_pennylane_method_by_static. The items are validated in parallel, and the results are returned
+    as a dictionary keyed by item id. At most {max_items} items are accepted per call.
+
+    Current supported versions are {supported_versions}.
+    """.format(
+        max_items=BATCH_VALIDATION_MAX_ITEMS, supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
+    )
+)
+async def validate_pennylane_batch(
+    items: Annotated[
+        list[BatchValidationItem], Field(description="The code snippets to validate, each with a unique id.")
+    ],
+) -> dict:
+    """Static validation of several code snippets containing PennyLane methods."""
+    for item in items:
+        metrics.TOOL_INPUT_SIZE.observe(len(item.code), "validate_batch")
+    return await _run_tool("validate_batch", None, validate_pennylane_code_batch, items)
+
+
+@mcp.tool(
+    description="""Static validation of a module containing PennyLane methods, that is validated again after changes.
+    PennyLane is a Python library for quantum computing.
+
+    The module is validated with the same steps as validate_pennylane_method_by_static. The server remembers the
+    results of each top-level function, class and statement of the module under the session id, and only checks
+    again the ones that changed since the last validation of the same session. Use the same session id for every
+    validation of the same module, ex: its file path.
+
+    The result has the same valid and errors as validate_pennylane_method_by_static, plus:
+    - recomputed: The name and first and last lines of each top-level definition that was checked again.
+    - reused: The number of top-level definitions whose previous results were reused.
+
+    Current supported versions are {supported_versions}.
+    """.format(
+        supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
+    )
+)
+async def validate_pennylane_module_incrementally(
+    code: Annotated[str, Field(description="source code of the module that includes PennyLane methods.")],
+    session_id: Annotated[
+        str, Field(description="Identifies the module across validations. (ex: 'src/circuits.py')", max_length=256)
+    ],
+    version: Annotated[
+        str | None, Field(None, description="The version of the PennyLane library to use. (ex: 'v0.41.1')")
+    ],
+) -> dict:
+    """Static validation of a module, reusing the results of its unchanged top-level definitions."""
+    metrics.TOOL_INPUT_SIZE.observe(len(code), "validate_incremental")
+    # the sessions are kept in the server process
+    return await _run_tool(
+        "validate_incremental",
+        version,
+        validate_pennylane_code_incremental,
+        code,
+        session_id,
+        version,
+        in_process=True,
+    )
+
+
+@mcp.tool(
+    description="""Find the versions of the PennyLane library that a code containing PennyLane methods is valid for.
+    PennyLane is a Python library for quantum computing.
+
+    This tool checks the usage of PennyLane library methods against the documents of all supported versions
+    in a single pass, and returns:
+    - compatible_versions: The versions the code is valid for, oldest first.
+    - compatible_range: The oldest and latest compatible versions, or null if no version is compatible.
+    - common_errors: The errors reported for every version.
+    - version_errors: The remaining errors of each incompatible version, only where they differ.
+
+    Current supported versions are {supported_versions}.
+    """.format(
+        supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
+    )
+)
+async def find_compatible_pennylane_versions(
+    code: Annotated[str, Field(description="source code that includes PennyLane methods.")],
+) -> dict:
+    """Find the versions of the PennyLane library that a code is valid for."""
+    metrics.TOOL_INPUT_SIZE.observe(len(code), "compatibility")
+    return await _run_tool("compatibility", None, check_pennylane_compatibility, code)
 
 
 @mcp.tool(
@@ -65,21 +256,76 @@ def validate_pennylane_method_by_static(
     Do not include parentheses and arguments. (ex: "qml.CNOT(wires=[0, 1])" -> "qml.CNOT")
     The version is optional. If not specified, version set to None.
 
+    Request only the sections needed, ex: ["signature", "args"] to call a method. By default the signature, the
+    docstring and the source code are returned. Set max_bytes to limit the size of the documentation (default:
+    {max_bytes}, 0 for no limit): longer documentation is truncated and ends with a cursor, request again with the
+    same arguments and the cursor to get the rest.
+
     Current supported versions are {supported_versions}.
     """.format(
-        supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
+        max_bytes=REFERENCE_MAX_BYTES, supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
     ),
 )
-def request_pennylane_method_reference(
+async def request_pennylane_method_reference(
     method_name: Annotated[
         str, Field(description="The name of the PennyLane method to request reference documentation. (ex: 'qml.CNOT')")
     ],
     version: Annotated[
         str | None, Field(None, description="The version of the PennyLane library to use. (ex: 'v0.41.1')")
     ],
+    sections: Annotated[
+        list[Literal["signature", "description", "args", "docstring", "source"]] | None,
+        Field(None, description="The sections to return. (ex: ['signature', 'args'])"),
+    ],
+    max_bytes: Annotated[
+        int | None, Field(None, description="The maximum size of the documentation in bytes, 0 for no limit.", ge=0)
+    ],
+    cursor: Annotated[
+        str | None, Field(None, description="The cursor given at the end of a truncated documentation.")
+    ],
 ) -> str:
     """Request reference documentation of a method in a specific version of the PennyLane library."""
-    return request_pennylane_reference(method_name, version)
+    metrics.TOOL_INPUT_SIZE.observe(len(method_name), "request_reference")
+    return await _run_tool(
+        "request_reference",
+        version,
+        request_pennylane_reference,
+        method_name,
+        version,
+        sections,
+        max_bytes,
+        cursor,
+    )
+
+
+@mcp.tool(
+    description="""Search the reference documentation of a specific version of the PennyLane library by keywords.
+    The PennyLane library is a Python library for quantum computing.
+
+    This tool finds the methods matching any word of the query, ranked by relevance (BM25) over their names,
+    descriptions and docstrings. Use it to find the methods for a task, then request the reference documentation
+    of the best results by name. (ex: "gradient of an expectation value", "amplitude embedding")
+    The results are paginated: pass the returned next_offset as offset to get the next page.
+    The version is optional. If not specified, version set to None.
+
+    Current supported versions are {supported_versions}.
+    """.format(
+        supported_versions=", ".join(SUPPORTED_PENNYLANE_VERSIONS)
+    ),
+)
+async def search_pennylane_reference_by_keywords(
+    query: Annotated[str, Field(description="Keywords describing the method. (ex: 'rotation around the X axis')")],
+    version: Annotated[
+        str | None, Field(None, description="The version of the PennyLane library to use. (ex: 'v0.41.1')")
+    ],
+    offset: Annotated[int, Field(0, description="The number of best results to skip.", ge=0)],
+    limit: Annotated[
+        int, Field(10, description="The maximum number of results to return.", ge=1, le=SEARCH_MAX_PAGE_SIZE)
+    ],
+) -> dict:
+    """Search the reference documentation of a version of the PennyLane library by keywords."""
+    metrics.TOOL_INPUT_SIZE.observe(len(query), "search_reference")
+    return await _run_tool("search_reference", version, search_pennylane_reference, query, version, offset, limit)
 
 
 @mcp.prompt()
@@ -99,6 +345,16 @@ async def health_check(request: Request) -> PlainTextResponse:
     return PlainTextResponse("OK")
 
 
+@mcp.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    return JSONResponse({"reference_cache": REFERENCE_CACHE.stats(), "result_cache": RESULT_CACHE.stats()})
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @mcp.custom_route("/", methods=["GET"])
 async def root(request: Request) -> PlainTextResponse:
     return PlainTextResponse("Quantum Code Validator MCP Server")
@@ -115,4 +371,9 @@ if __name__ == "__main__":
         help="Transport type: 'stdio', 'sse', or 'streamable-http' (default: 'sse' or $TRANSPORT env var)",
     )
     args = parser.parse_args()
+    # scan the available reference versions once before serving requests
+    get_version_catalog()
+    if VALIDATION_TIMEOUT > 0:
+        # start the workers of the long validations, so that the first ones do not wait for them
+        get_deadline_pool().start()
     mcp.run(transport=args.transport)
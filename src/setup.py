@@ -1,14 +1,18 @@
 import json
 import os
-import pathlib
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 from google.cloud import storage
 from google.cloud.exceptions import GoogleCloudError
 from google.oauth2 import service_account
 
-from src.constants import REF_DOCS_DIR
+from src.constants import RAW_PENNYLANE_JSON_DIR, REF_DOCS_DIR, SUPPORTED_PENNYLANE_VERSIONS, SYNC_MAX_WORKERS
+from src.sync import LocalDirectoryBackend, RemoteObject, SyncBackend, sync_references
+from src.tools.bundle import build_reference_bundle, is_reference_bundle_stale
+from src.tools.common import refresh_version_catalog
+from src.tools.compatibility import get_compatibility_index
+from src.tools.reference_store import build_reference_index, is_reference_index_stale
 
 
 def get_credentials() -> service_account.Credentials:
@@ -57,31 +61,76 @@ def initialize_storage_client(
         raise GoogleCloudError(f"Failed to initialize storage client: {str(e)}")
 
 
-def download_blob(blob: storage.Blob, prefix: str, download_dir: Path = REF_DOCS_DIR) -> None:
+class GCSBackend:
     """
-    Download the specified blob to local storage.
+    Sync backend serving the files of a GCS bucket under a prefix.
+    """
+
+    def __init__(self, bucket: storage.Bucket, prefix: str = "") -> None:
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def list_objects(self) -> Iterable[RemoteObject]:
+        """
+        List the files under the prefix.
+
+        Raises:
+            GoogleCloudError: If listing fails
+        """
+        try:
+            for blob in self.bucket.list_blobs(prefix=self.prefix):
+                blob_name = str(blob.name)  # Explicitly convert to string
+                # the generation changes on every overwrite, the hash guards against reused generations
+                checksum = f"{blob.generation}:{blob.md5_hash or blob.crc32c}"
+                yield RemoteObject(name=blob_name[len(self.prefix) :], checksum=checksum, size=blob.size or 0)
+        except GoogleCloudError as e:
+            raise GoogleCloudError(f"Failed to list files under {self.prefix}: {str(e)}")
+
+    def download(self, name: str, destination: Path) -> None:
+        """
+        Download a file to the destination path.
+
+        Raises:
+            GoogleCloudError: If download fails
+        """
+        try:
+            self.bucket.blob(self.prefix + name).download_to_filename(destination)
+        except GoogleCloudError as e:
+            raise GoogleCloudError(f"Failed to download file {self.prefix + name}: {str(e)}")
+
+
+def changed_versions(downloaded: Iterable[str]) -> set[str]:
+    """
+    Return the versions of the downloaded reference files.
 
     Args:
-        blob: Blob to download
-        prefix: Object prefix
-        download_dir: Local download directory
+        downloaded: Names of the downloaded files, relative to the download directory
 
-    Raises:
-        GoogleCloudError: If download fails
+    Returns:
+        set[str]: Versions whose raw or formatted reference file was downloaded
     """
-    try:
-        blob_name = str(blob.name)  # Explicitly convert to string
-        relative_path = blob_name[len(prefix) :] if prefix else blob_name
-        local_path = download_dir / relative_path
+    return {Path(name).stem for name in downloaded if name.endswith(".json")}
 
-        # Create directory if it doesn't exist
-        pathlib.Path(local_path).parent.mkdir(parents=True, exist_ok=True)
 
-        # Download the file
-        blob.download_to_filename(local_path)
-        print(f"✅ Downloaded: {blob_name} → {local_path}")
-    except GoogleCloudError as e:
-        raise GoogleCloudError(f"Failed to download file {blob.name}: {str(e)}")
+def build_reference_indexes(raw_dir: Path = RAW_PENNYLANE_JSON_DIR, changed: Iterable[str] = ()) -> None:
+    """
+    Build the per-version SQLite reference index for every downloaded raw reference file.
+
+    An index is rebuilt only when its version was just downloaded, or when it is missing, of an older format or
+    older than its reference files.
+
+    Args:
+        raw_dir: Directory of the raw reference JSON files
+        changed: Versions whose reference files were just downloaded
+    """
+    changed = set(changed)
+    for raw_path in sorted(raw_dir.glob("*.json")):
+        version = raw_path.stem
+        if version not in changed and not is_reference_index_stale(version):
+            print(f"⏭️ Index up to date: {raw_path}")
+            continue
+        index_path = build_reference_index(version, raw_dir=raw_dir)
+        print(f"✅ Indexed: {raw_path} → {index_path}")
 
 
 def main() -> None:
@@ -89,23 +138,41 @@ def main() -> None:
     Main execution function.
     """
     try:
-        # Get credentials
-        credentials = get_credentials()
-
-        # Get configuration from environment variables
-        bucket_name = os.getenv("GCS_BUCKET_NAME")
-        if not bucket_name:
-            raise ValueError("GCS_BUCKET_NAME environment variable is not set")
-
-        prefix = os.getenv("GCS_PREFIX", "")
-
-        # Initialize storage client
-        _, bucket, prefix = initialize_storage_client(credentials=credentials, bucket_name=bucket_name, prefix=prefix)
-
-        # Download files
-        blobs = bucket.list_blobs(prefix=prefix)
-        for blob in blobs:
-            download_blob(blob, prefix)
+        source_dir = os.getenv("REFDOCS_SOURCE_DIR")
+        backend: SyncBackend
+        if source_dir:
+            # Sync from a local directory, without Google Cloud access
+            backend = LocalDirectoryBackend(Path(source_dir))
+        else:
+            # Get credentials
+            credentials = get_credentials()
+
+            # Get configuration from environment variables
+            bucket_name = os.getenv("GCS_BUCKET_NAME")
+            if not bucket_name:
+                raise ValueError("GCS_BUCKET_NAME environment variable is not set")
+
+            prefix = os.getenv("GCS_PREFIX", "")
+
+            # Initialize storage client
+            _, bucket, prefix = initialize_storage_client(
+                credentials=credentials, bucket_name=bucket_name, prefix=prefix
+            )
+            backend = GCSBackend(bucket, prefix)
+
+        # Download new and changed files
+        report = sync_references(backend, REF_DOCS_DIR, max_workers=SYNC_MAX_WORKERS)
+        changed = changed_versions(report.downloaded)
+
+        # Build indexes for fast per-method lookups and cross-version checks, only when their inputs changed
+        build_reference_indexes(changed=changed)
+        if changed or is_reference_bundle_stale(SUPPORTED_PENNYLANE_VERSIONS):
+            bundle_path = build_reference_bundle(SUPPORTED_PENNYLANE_VERSIONS)
+            print(f"✅ Bundled references → {bundle_path}")
+        else:
+            print("⏭️ Reference bundle up to date")
+        if refresh_version_catalog().formatted:
+            get_compatibility_index()
 
     except Exception as e:
         print(f"❌ Error occurred: {str(e)}")
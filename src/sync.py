@@ -0,0 +1,162 @@
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Protocol
+
+MANIFEST_FILENAME = ".sync_manifest.json"
+PARTIAL_SUFFIX = ".partial"
+
+
+@dataclass(frozen=True)
+class RemoteObject:
+    """A file of the remote reference storage.
+
+    Attributes:
+        name: Path of the file relative to the storage prefix, with "/" separators
+        checksum: Changes whenever the content of the file changes (ex: generation and MD5 hash)
+        size: Size of the file in bytes
+    """
+
+    name: str
+    checksum: str
+    size: int
+
+
+class SyncBackend(Protocol):
+    def list_objects(self) -> Iterable[RemoteObject]: ...
+
+    def download(self, name: str, destination: Path) -> None: ...
+
+
+class LocalDirectoryBackend:
+    """Backend serving the files of a local directory, for offline setups and tests."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def list_objects(self) -> Iterable[RemoteObject]:
+        for path in sorted(self.root.rglob("*")):
+            if path.is_file():
+                md5 = hashlib.md5(path.read_bytes()).digest()
+                yield RemoteObject(
+                    name=path.relative_to(self.root).as_posix(),
+                    checksum=base64.b64encode(md5).decode(),
+                    size=path.stat().st_size,
+                )
+
+    def download(self, name: str, destination: Path) -> None:
+        shutil.copyfile(self.root / name, destination)
+
+
+@dataclass
+class SyncReport:
+    downloaded: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+def _load_manifest(path: Path) -> dict[str, str]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=PARTIAL_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove_partial_files(download_dir: Path) -> None:
+    # leftovers of an interrupted run
+    for path in download_dir.rglob(f"*{PARTIAL_SUFFIX}"):
+        path.unlink(missing_ok=True)
+
+
+def sync_references(backend: SyncBackend, download_dir: Path, max_workers: int = 8) -> SyncReport:
+    """
+    Mirror the remote reference files into the download directory.
+
+    Files are downloaded in parallel on a bounded thread pool. A file is skipped when the local manifest
+    records the same remote checksum and the local file has the expected size. Each file is downloaded to a
+    temporary file and renamed into place, and the manifest is updated after every completed file, so an
+    interrupted sync resumes where it stopped.
+
+    Args:
+        backend: Storage the files are downloaded from
+        download_dir: Local download directory
+        max_workers: Maximum number of parallel downloads
+
+    Returns:
+        SyncReport: Names of the downloaded, skipped and failed files
+
+    Raises:
+        RuntimeError: If any file failed to download, after all other files were synced
+    """
+    download_dir.mkdir(parents=True, exist_ok=True)
+    _remove_partial_files(download_dir)
+    manifest_path = download_dir / MANIFEST_FILENAME
+    manifest = _load_manifest(manifest_path)
+    manifest_lock = threading.Lock()
+    report = SyncReport()
+
+    to_download = []
+    for obj in backend.list_objects():
+        if obj.name.endswith("/") or obj.name == MANIFEST_FILENAME:
+            continue
+        local_path = download_dir / obj.name
+        if not local_path.resolve().is_relative_to(download_dir.resolve()):
+            report.failed[obj.name] = "path escapes the download directory"
+            continue
+        if manifest.get(obj.name) == obj.checksum and local_path.is_file() and local_path.stat().st_size == obj.size:
+            report.skipped.append(obj.name)
+        else:
+            to_download.append(obj)
+
+    def download(obj: RemoteObject) -> None:
+        local_path = download_dir / obj.name
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=local_path.parent, prefix=f".{local_path.name}.", suffix=PARTIAL_SUFFIX)
+        os.close(fd)
+        try:
+            backend.download(obj.name, Path(tmp_path))
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with manifest_lock:
+            manifest[obj.name] = obj.checksum
+            _write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download, obj): obj.name for obj in to_download}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                report.downloaded.append(name)
+                print(f"✅ Downloaded: {name} → {download_dir / name}")
+            except Exception as e:
+                report.failed[name] = str(e)
+                print(f"❌ Failed to download {name}: {str(e)}")
+
+    report.downloaded.sort()
+    print(f"Synced {len(report.downloaded)} file(s), skipped {len(report.skipped)} unchanged file(s)")
+    if report.failed:
+        raise RuntimeError(f"Failed to download {len(report.failed)} file(s): {', '.join(sorted(report.failed))}")
+    return report
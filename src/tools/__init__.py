@@ -1,4 +1,18 @@
+from .batch_validation import BatchValidationItem, validate_pennylane_code_batch
+from .compatibility import check_pennylane_compatibility
+from .incremental_validation import validate_pennylane_code_incremental
 from .request_reference import request_pennylane_reference
+from .result_cache import validate_pennylane_code_cached
+from .search_reference import search_pennylane_reference
 from .static_validation import validate_pennylane_code_statically
 
-__all__ = ["request_pennylane_reference", "validate_pennylane_code_statically"]
+__all__ = [
+    "BatchValidationItem",
+    "check_pennylane_compatibility",
+    "request_pennylane_reference",
+    "search_pennylane_reference",
+    "validate_pennylane_code_batch",
+    "validate_pennylane_code_cached",
+    "validate_pennylane_code_incremental",
+    "validate_pennylane_code_statically",
+]
@@ -0,0 +1,184 @@
+import ast
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+
+from src.constants import VALIDATION_CHECK_TYPES
+from src.metrics import VALIDATION_ERRORS
+from src.tools.suggestions import closest_names, did_you_mean
+from src.tools.type_specs import TypeSpec, accepts, literal_kind, parse_type_spec
+
+
+def variadic_kind(name: str) -> Optional[str]:
+    """Return "*" for `*args`, "**" for `**kwargs` and None for other argument names."""
+    if name.startswith("**"):
+        return "**"
+    if name.startswith("*"):
+        return "*"
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class ArgValidator:
+    """The arguments of a method, compiled once from its formatted reference entry so that checking a call
+    only takes a few set operations.
+
+    Attributes:
+        positional (tuple[str, ...]): The names bound to positional values, in order, up to `*args`.
+        names (frozenset[str]): The names accepted as keywords.
+        required (tuple[str, ...]): The required names, in the order of the reference.
+        required_names (frozenset[str]): The same names, to check them all at once.
+        var_positional (bool): Whether the method takes `*args`, any number of positional values.
+        var_keyword (bool): Whether the method takes `**kwargs`, any keyword.
+        missing_messages (Mapping[str, str]): The error of each required argument when it is missing.
+        types (Mapping[str, tuple[TypeSpec, str]]): The parsed and documented types of the arguments literal
+            values are checked against. Empty when `VALIDATION_CHECK_TYPES` is off.
+    """
+
+    positional: tuple[str, ...]
+    names: frozenset[str]
+    required: tuple[str, ...]
+    required_names: frozenset[str]
+    var_positional: bool
+    var_keyword: bool
+    missing_messages: Mapping[str, str]
+    types: Mapping[str, tuple[TypeSpec, str]]
+
+    @classmethod
+    def from_args(cls, args: list[dict[str, Any]]) -> "ArgValidator":
+        positional: list[str] = []
+        names = []
+        required = []
+        missing_messages = {}
+        types = {}
+        var_positional = var_keyword = False
+        # positional values are bound in order until `*args` (or a bare `*`), the following names are keywords
+        binds_positional = True
+        for arg in args:
+            name = arg["name"]
+            kind = variadic_kind(name)
+            if kind == "**":
+                var_keyword = True
+                continue
+            if kind == "*":
+                var_positional = var_positional or name != "*"
+                binds_positional = False
+                continue
+            if binds_positional:
+                positional.append(name)
+            names.append(name)
+            arg_type = arg.get("type", "")
+            spec = parse_type_spec(arg_type) if VALIDATION_CHECK_TYPES and arg_type else None
+            if spec is not None and spec.checked:
+                types[name] = (spec, arg_type)
+            if bool(arg["required"]):
+                required.append(name)
+                arg_description = arg.get("description", "")
+                missing_messages[name] = f"Missing required argument '{name}'.\n{name} ({arg_type}): {arg_description}"
+        return cls(
+            positional=tuple(positional),
+            names=frozenset(names),
+            required=tuple(required),
+            required_names=frozenset(required),
+            var_positional=var_positional,
+            var_keyword=var_keyword,
+            missing_messages=missing_messages,
+            types=types,
+        )
+
+    def check(self, node: ast.Call) -> list[str]:
+        """Return the unexpected and missing arguments of the call, and its literal values of the wrong type.
+
+        Required arguments are not reported when the call unpacks `*args` or `**kwargs`, which may provide them.
+        """
+        has_unpacking = False
+        count = 0
+        for arg in node.args:
+            if isinstance(arg, ast.Starred):
+                has_unpacking = True
+                break
+            count += 1
+        provided = set(self.positional[:count])
+
+        errors = []
+        type_errors = []
+        types = self.types
+        if types:
+            for name, value in zip(self.positional, node.args[:count]):
+                expected = types.get(name)
+                if expected is not None and not accepts(expected[0], value):
+                    type_errors.append(format_type_error(name, expected[1], value))
+        for keyword in node.keywords:
+            name = keyword.arg
+            if name is None:
+                has_unpacking = True
+                continue
+            provided.add(name)
+            if name not in self.names and not self.var_keyword:
+                errors.append(f"Unexpected argument '{name}'{did_you_mean(closest_names(name, self.names))}")
+            elif types:
+                expected = types.get(name)
+                if expected is not None and not accepts(expected[0], keyword.value):
+                    type_errors.append(format_type_error(name, expected[1], keyword.value))
+        if errors:
+            VALIDATION_ERRORS.inc("unexpected_argument", amount=len(errors))
+
+        if not has_unpacking and not self.required_names <= provided:
+            missing = [self.missing_messages[name] for name in self.required if name not in provided]
+            VALIDATION_ERRORS.inc("missing_argument", amount=len(missing))
+            errors.extend(missing)
+        if type_errors:
+            VALIDATION_ERRORS.inc("type_mismatch", amount=len(type_errors))
+            errors.extend(type_errors)
+        return errors
+
+
+def format_type_error(name: str, arg_type: str, value: ast.expr) -> str:
+    return f"Invalid type for argument '{name}': expected {arg_type}, got {literal_kind(value)}"
+
+
+def split_call_arguments(node: ast.Call) -> tuple[list[ast.expr], dict[str, ast.expr], bool]:
+    """Split the arguments of a call into positional values, keyword values and whether it unpacks
+    `*args` or `**kwargs`, which may provide any argument. Positional values after a `*args` are dropped.
+    """
+    positional = []
+    keywords = {}
+    has_unpacking = False
+
+    for arg in node.args:
+        if isinstance(arg, ast.Starred):
+            has_unpacking = True
+            break
+        positional.append(arg)
+
+    for keyword in node.keywords:
+        if keyword.arg is None:
+            has_unpacking = True
+        else:
+            keywords[keyword.arg] = keyword.value
+
+    return positional, keywords, has_unpacking
+
+
+class ArgValidators:
+    """The validators of the methods of a formatted reference.
+
+    A method is compiled on its first call and then kept as long as the reference is loaded, so that the
+    entries of a bundle reference, which are decoded lazily, are not all decoded up front.
+
+    Args:
+        reference (Mapping[str, dict[str, Any]]): The formatted reference of a version.
+    """
+
+    def __init__(self, reference: Mapping[str, dict[str, Any]]) -> None:
+        self._reference = reference
+        self._validators: dict[str, ArgValidator] = {}
+
+    def get(self, name: str) -> Optional[ArgValidator]:
+        validator = self._validators.get(name)
+        if validator is None:
+            entry = self._reference.get(name)
+            if entry is None:
+                return None
+            # concurrent compilations of the same method give equal validators, the first one is kept
+            validator = self._validators.setdefault(name, ArgValidator.from_args(entry["args"]))
+        return validator
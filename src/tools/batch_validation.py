@@ -0,0 +1,154 @@
+import atexit
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from src.constants import BATCH_VALIDATION_MAX_ITEMS, BATCH_VALIDATION_MAX_WORKERS
+from src.executor import DeadlineExceededError, KillableWorkerPool
+from src.metrics import REGISTRY, run_recording_metrics
+from src.profiling import profiled_in_worker
+from src.tools import limits
+from src.tools.common import get_version_catalog
+from src.tools.limits import LimitExceededError, limit_exceeded_result
+from src.tools.result_cache import validate_pennylane_code_cached
+from src.tools.static_validation import get_reference
+
+# seconds between two checks of which items of another executor were started, their deadline starts then
+_DEADLINE_POLL_INTERVAL = 0.05
+
+
+class BatchValidationItem(BaseModel):
+    id: str = Field(..., description="The identifier of the item, used as the key of its result.")
+    code: str = Field(..., description="source code that includes PennyLane methods.")
+    version: Optional[str] = Field(None, description="The version of the PennyLane library to use. (ex: 'v0.41.1')")
+
+
+def _warm_reference_cache() -> None:
+    # runs once in each worker process, so that the first item does not pay for loading the reference
+    try:
+        get_reference(get_version_catalog().latest("formatted"))
+    except FileNotFoundError:
+        pass
+
+
+_pool: Optional[KillableWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_batch_pool() -> KillableWorkerPool:
+    """Return the pool of worker processes shared by all batch validation requests, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawned workers, killed one by one when their item misses its deadline
+            _pool = KillableWorkerPool(max_workers=BATCH_VALIDATION_MAX_WORKERS, initializer=_warm_reference_cache)
+        return _pool
+
+
+@atexit.register
+def shutdown_batch_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _error_result(error: BaseException) -> dict[str, bool | list[str]]:
+    return {"valid": False, "errors": [f"{type(error).__name__}: {error}"]}
+
+
+def _timeout_result() -> dict[str, bool | list[str]]:
+    return limit_exceeded_result(LimitExceededError("timeout_seconds", limits.VALIDATION_TIMEOUT))
+
+
+def _validate_on_executor(
+    items: list[BatchValidationItem], executor: Executor, timeout: Optional[float]
+) -> dict[str, dict[str, bool | list[str]]]:
+    # a task of another executor cannot be stopped, an item that misses its deadline is only left behind. Its
+    # deadline starts when its future is seen running, which is when a thread takes it on a thread executor
+    results: dict[str, dict[str, bool | list[str]]] = {}
+    pending = {executor.submit(validate_pennylane_code_cached, item.code, item.version): item for item in items}
+    # future -> time it was first seen running
+    started: dict[Future, float] = {}
+    while pending:
+        wait_timeout = None
+        if timeout is not None:
+            now = time.monotonic()
+            for future in pending:
+                if future not in started and future.running():
+                    started[future] = now
+            deadlines = [started[future] + timeout for future in pending if future in started]
+            wait_timeout = max(0.0, min(deadlines + [now + _DEADLINE_POLL_INTERVAL]) - now)
+        done, _ = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            item = pending.pop(future)
+            try:
+                results[item.id] = future.result()
+            except Exception as e:
+                results[item.id] = _error_result(e)
+        if timeout is not None:
+            now = time.monotonic()
+            for future in [future for future in pending if future in started and now - started[future] >= timeout]:
+                results[pending.pop(future).id] = _timeout_result()
+    return results
+
+
+def validate_pennylane_code_batch(
+    items: list[BatchValidationItem], executor: Optional[Executor] = None
+) -> dict[str, dict[str, bool | list[str]]]:
+    """Validate several code snippets in parallel.
+
+    Each item must complete within `VALIDATION_TIMEOUT` seconds of being started by a worker, or it gets a
+    "limit exceeded" result. On the shared pool, the worker process of the item is then killed and replaced.
+    A task of another executor cannot be stopped, it is only left behind.
+
+    Args:
+        items (list[BatchValidationItem]): The snippets to validate, each with a unique id.
+        executor (Optional[Executor]): The executor the items are validated on. Defaults to the shared pool of
+            worker processes.
+
+    Returns:
+        dict[str, dict[str, bool | list[str]]]: The validation result of each item, keyed by item id.
+            An item whose validation raised (ex: unsupported version) gets an invalid result with the error.
+
+    Raises:
+        ValueError: If the batch is too large or contains duplicate ids.
+    """
+    if len(items) > BATCH_VALIDATION_MAX_ITEMS:
+        raise ValueError(f"Too many items in batch: {len(items)} (max: {BATCH_VALIDATION_MAX_ITEMS})")
+    ids = [item.id for item in items]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Item ids must be unique in a batch")
+
+    timeout = limits.VALIDATION_TIMEOUT if limits.VALIDATION_TIMEOUT > 0 else None
+    results: dict[str, dict[str, bool | list[str]]] = {}
+    if executor is not None:
+        results = _validate_on_executor(items, executor, timeout)
+    elif len(items) == 1:
+        # not worth the round-trip to a worker process, long submissions get their own deadline
+        item = items[0]
+        try:
+            results[item.id] = validate_pennylane_code_cached(item.code, item.version)
+        except Exception as e:
+            results[item.id] = _error_result(e)
+    else:
+        pool = get_batch_pool()
+        # the worker processes return the metrics they recorded with the result, and profile the items of a
+        # profiled tool call
+        validate = profiled_in_worker(validate_pennylane_code_cached)
+        futures = [pool.submit(timeout, run_recording_metrics, validate, item.code, item.version) for item in items]
+        for item, future in zip(items, futures):
+            try:
+                results[item.id], recorded = future.result()
+                REGISTRY.merge(recorded)
+            except DeadlineExceededError:
+                results[item.id] = _timeout_result()
+            except Exception as e:
+                results[item.id] = _error_result(e)
+
+    return {item.id: results[item.id] for item in items}
@@ -0,0 +1,361 @@
+import functools
+import json
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from src.constants import (
+    FORMATTED_PENNYLANE_JSON_DIR,
+    RAW_PENNYLANE_JSON_DIR,
+    REFERENCE_BUNDLE_PATH,
+    REFERENCE_CACHE_CHECK_INTERVAL,
+    USE_REFERENCE_BUNDLE,
+)
+from src.tools.cache import FileCache
+from src.tools.reference_sections import text_slices
+
+# Layout of a bundle file:
+#   [magic: 8 bytes][meta offset: u64][meta length: u64]
+#   [records: marshal-serialized entries, one after another, each distinct entry stored once]
+#   [indexes: one marshal {name: (offset, length)} per version and kind]
+#   [meta: marshal {"format": int, "indexes": {version: {"raw": (offset, length) | None, "formatted": ...}},
+#          "sources": {"raw/<version>.json": (mtime_ns, size), ...}}]
+# Only the meta is decoded when the bundle is opened, the index of a version is decoded on its first use.
+# Records are content-addressed: an entry that is identical in several versions is written once and all the
+# indexes point to the same location, so the bundle grows with the API changes, not with the number of versions.
+# Formatted records are (args, description), where args is a tuple of (name, type, required, description); the
+# formatted records of older bundles also end with the names and required names of the args, which are ignored.
+# Raw records are (signature, docstring, source, docstring slices, source slices), see `text_slices`; the slices
+# of the raw records of older bundles are computed on request.
+BUNDLE_MAGIC = b"QCVREF01"
+BUNDLE_FORMAT = 1
+_HEADER = struct.Struct("<8sQQ")
+# number of decoded raw entries kept per open bundle
+RAW_ENTRY_CACHE_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+def _intern(value: Any) -> Any:
+    # interned strings are written as such by marshal and interned again on load,
+    # so that names and types repeated across entries and versions share one object
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _formatted_record(entry: dict[str, Any]) -> tuple:
+    args = tuple(
+        (
+            _intern(arg["name"]),
+            _intern(arg.get("type", "")),
+            bool(arg["required"]),
+            arg.get("description", ""),
+        )
+        for arg in entry["args"]
+    )
+    return args, entry.get("description", "")
+
+
+def _raw_record(entry: dict[str, Any]) -> tuple:
+    docstring, source = entry.get("docstring"), entry.get("source")
+    return entry.get("signature"), docstring, source, text_slices(docstring), text_slices(source)
+
+
+def _load_json(path: Path) -> Optional[dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _source_stats(versions: list[str], raw_dir: Path, formatted_dir: Path) -> dict[str, tuple[int, int]]:
+    # (mtime, size) of each JSON dump the bundle is built from
+    stats = {}
+    for version in versions:
+        for kind, source_dir in (("raw", raw_dir), ("formatted", formatted_dir)):
+            try:
+                stat = os.stat(source_dir / f"{version}.json")
+            except FileNotFoundError:
+                continue
+            stats[f"{kind}/{version}.json"] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+def build_reference_bundle(
+    versions: list[str],
+    raw_dir: Path = RAW_PENNYLANE_JSON_DIR,
+    formatted_dir: Path = FORMATTED_PENNYLANE_JSON_DIR,
+    path: Path = REFERENCE_BUNDLE_PATH,
+) -> Path:
+    """Compile the raw and formatted JSON dumps of the versions into one binary bundle.
+
+    Versions without any dump are skipped. Entries identical across versions are stored once. The bundle is
+    written to a temporary file first and renamed into place.
+
+    Returns:
+        Path: The path of the built bundle.
+    """
+    # read before the dumps, so that a dump changed during the build makes the bundle stale
+    sources = _source_stats(versions, raw_dir, formatted_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(BUNDLE_MAGIC, 0, 0))
+            indexes: dict[str, dict[str, Optional[tuple[int, int]]]] = {}
+            # record content -> location, the records are tuples of strings, numbers and bools, so hashable
+            locations: dict[tuple, tuple[int, int]] = {}
+
+            def write_record(record: Any) -> tuple[int, int]:
+                data = marshal.dumps(record)
+                offset = f.tell()
+                f.write(data)
+                return offset, len(data)
+
+            def write_entry(record: tuple) -> tuple[int, int]:
+                location = locations.get(record)
+                if location is None:
+                    location = locations[record] = write_record(record)
+                return location
+
+            for version in versions:
+                raw = _load_json(raw_dir / f"{version}.json")
+                formatted = _load_json(formatted_dir / f"{version}.json")
+                if raw is None and formatted is None:
+                    continue
+                indexes[version] = {"raw": None, "formatted": None}
+                if raw is not None:
+                    index = {_intern(name): write_entry(_raw_record(entry)) for name, entry in raw.items()}
+                    indexes[version]["raw"] = write_record(index)
+                if formatted is not None:
+                    index = {_intern(name): write_entry(_formatted_record(entry)) for name, entry in formatted.items()}
+                    indexes[version]["formatted"] = write_record(index)
+
+            meta_offset, meta_length = write_record({"format": BUNDLE_FORMAT, "indexes": indexes, "sources": sources})
+            f.seek(0)
+            f.write(_HEADER.pack(BUNDLE_MAGIC, meta_offset, meta_length))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return path
+
+
+def _unpack_header(header: bytes, path: Path) -> tuple[int, int]:
+    if len(header) < _HEADER.size:
+        raise ValueError(f"Not a reference bundle: {path}")
+    magic, meta_offset, meta_length = _HEADER.unpack_from(header, 0)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError(f"Not a reference bundle: {path}")
+    return meta_offset, meta_length
+
+
+def _load_meta(data: bytes, path: Path) -> dict[str, Any]:
+    try:
+        meta = marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        # ex: a bundle truncated while it was copied
+        raise ValueError(f"Corrupted reference bundle: {path}")
+    if not isinstance(meta, dict):
+        raise ValueError(f"Corrupted reference bundle: {path}")
+    if meta.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported reference bundle format {meta.get('format')}: {path}")
+    return meta
+
+
+def _versions(meta: dict[str, Any]) -> dict[str, dict[str, bool]]:
+    return {
+        version: {kind: location is not None for kind, location in kinds.items()}
+        for version, kinds in meta["indexes"].items()
+    }
+
+
+def read_bundle_versions(path: Path = REFERENCE_BUNDLE_PATH) -> dict[str, dict[str, bool]]:
+    """Return the raw and formatted availability of each version in the bundle, reading only its header and meta."""
+    with open(path, "rb") as f:
+        meta_offset, meta_length = _unpack_header(f.read(_HEADER.size), path)
+        f.seek(meta_offset)
+        return _versions(_load_meta(f.read(meta_length), path))
+
+
+def is_reference_bundle_stale(
+    versions: list[str],
+    raw_dir: Path = RAW_PENNYLANE_JSON_DIR,
+    formatted_dir: Path = FORMATTED_PENNYLANE_JSON_DIR,
+    path: Path = REFERENCE_BUNDLE_PATH,
+) -> bool:
+    """Whether the bundle is missing, unreadable, or was built from other JSON dumps than the current ones.
+
+    A dump that was added, removed, or changed in mtime or size since the build makes the bundle stale.
+    """
+    try:
+        with open(path, "rb") as f:
+            meta_offset, meta_length = _unpack_header(f.read(_HEADER.size), path)
+            f.seek(meta_offset)
+            meta = _load_meta(f.read(meta_length), path)
+    except (OSError, ValueError):
+        return True
+    # bundles built before the sources were recorded are stale
+    return meta.get("sources") != _source_stats(versions, raw_dir, formatted_dir)
+
+
+class BundleReference(Mapping):
+    """Read-only view of the formatted reference of one version, decoded lazily entry by entry.
+
+    Entries have the same shape as in the formatted JSON files. An entry that is identical in several versions is
+    the same object in all of them.
+    """
+
+    def __init__(self, bundle: "ReferenceBundle", offsets: dict[str, tuple[int, int]]) -> None:
+        self._bundle = bundle
+        self._offsets = offsets
+
+    def __getitem__(self, name: str) -> dict[str, Any]:
+        return self._bundle.formatted_entry(self._offsets[name])
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+
+class ReferenceBundle:
+    """Memory-mapped reference bundle. Only the index is decoded on load, entries are decoded on first access."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            meta_offset, meta_length = _unpack_header(self._buffer[: _HEADER.size], path)
+            meta = _load_meta(self._buffer[meta_offset : meta_offset + meta_length], path)
+        except BaseException:
+            self._buffer.close()
+            raise
+        self.versions = _versions(meta)
+        self._index_locations: dict[str, dict[str, Optional[tuple[int, int]]]] = meta["indexes"]
+        self._indexes: dict[tuple[str, str], dict[str, tuple[int, int]]] = {}
+        self._formatted: dict[str, BundleReference] = {}
+        # decoded entries keyed by location, shared by all the versions pointing to the same record
+        self._formatted_entries: dict[tuple[int, int], dict[str, Any]] = {}
+        # raw entries are large and rarely requested, only the most recent ones are kept
+        self._raw_record = functools.lru_cache(maxsize=RAW_ENTRY_CACHE_SIZE)(self.read_record)
+        self._lock = threading.Lock()
+
+    def read_record(self, location: tuple[int, int]) -> Any:
+        offset, length = location
+        return marshal.loads(self._buffer[offset : offset + length])
+
+    def formatted_entry(self, location: tuple[int, int]) -> dict[str, Any]:
+        entry = self._formatted_entries.get(location)
+        if entry is None:
+            args, description = self.read_record(location)[:2]
+            entry = {
+                "args": [
+                    {"name": arg_name, "type": arg_type, "required": required, "description": arg_description}
+                    for arg_name, arg_type, required, arg_description in args
+                ],
+                "description": description,
+            }
+            entry = self._formatted_entries.setdefault(location, entry)
+        return entry
+
+    def _index(self, version: str, kind: str) -> Optional[dict[str, tuple[int, int]]]:
+        location = self._index_locations.get(version, {}).get(kind)
+        if location is None:
+            return None
+        index = self._indexes.get((version, kind))
+        if index is None:
+            index = self._indexes[(version, kind)] = self.read_record(location)
+        return index
+
+    def formatted(self, version: str) -> Optional[BundleReference]:
+        """Return the formatted reference of the version, or None if the bundle does not have it."""
+        reference = self._formatted.get(version)
+        if reference is None:
+            with self._lock:
+                index = self._index(version, "formatted")
+                if index is None:
+                    return None
+                reference = self._formatted.setdefault(version, BundleReference(self, index))
+        return reference
+
+    def raw_entry(self, version: str, name: str, slices: bool = False) -> Optional[dict[str, Any]]:
+        """Return the signature, docstring and source code of the method, or None if the bundle does not have it.
+
+        With `slices`, the entry also has the precomputed `docstring_slices` and `source_slices`, see `text_slices`.
+        """
+        with self._lock:
+            index = self._index(version, "raw")
+        location = index.get(name) if index is not None else None
+        if location is None:
+            return None
+        record = self._raw_record(location)
+        signature, docstring, source = record[:3]
+        entry = {"signature": signature, "docstring": docstring, "source": source}
+        if slices:
+            entry["docstring_slices"] = record[3] if len(record) > 3 else text_slices(docstring)
+            entry["source_slices"] = record[4] if len(record) > 3 else text_slices(source)
+        return entry
+
+    def close(self) -> None:
+        self._raw_record.cache_clear()
+        self._buffer.close()
+
+
+# the bundle is reopened when the file is replaced, ex: by a new build, and the replaced bundle is closed
+_BUNDLE_CACHE: FileCache[ReferenceBundle] = FileCache(
+    max_entries=1, check_interval=REFERENCE_CACHE_CHECK_INTERVAL, on_evict=ReferenceBundle.close
+)
+# (path, mtime, size) of the last bundle file that could not be opened, reported once and not opened again
+_unreadable_bundle: Optional[tuple[Path, int, int]] = None
+
+
+def _file_id(path: Path) -> Optional[tuple[Path, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def get_reference_bundle() -> Optional[ReferenceBundle]:
+    """Return the reference bundle, or None if bundles are disabled, no bundle was built, or the bundle file cannot
+    be read, in which case the references are served from the JSON files."""
+    global _unreadable_bundle
+    if not USE_REFERENCE_BUNDLE:
+        return None
+    if _unreadable_bundle is not None and _unreadable_bundle == _file_id(REFERENCE_BUNDLE_PATH):
+        return None
+    try:
+        return _BUNDLE_CACHE.get(REFERENCE_BUNDLE_PATH, REFERENCE_BUNDLE_PATH, ReferenceBundle)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        # ex: an empty, truncated or foreign file
+        _unreadable_bundle = _file_id(REFERENCE_BUNDLE_PATH)
+        logger.warning("Ignoring the reference bundle %s, serving the JSON references: %s", REFERENCE_BUNDLE_PATH, e)
+        return None
+
+
+def get_reference_bundle_fingerprint() -> Optional[tuple[int, int]]:
+    """Return the mtime and size of the bundle file, changes when the bundle is rebuilt."""
+    return _BUNDLE_CACHE.fingerprint(REFERENCE_BUNDLE_PATH) if get_reference_bundle() is not None else None
+
+
+def clear_reference_bundle() -> None:
+    global _unreadable_bundle
+    _BUNDLE_CACHE.clear()
+    _unreadable_bundle = None
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _CacheEntry(Generic[T]):
+    value: T
+    mtime_ns: int
+    size: int
+    checked_at: float
+
+
+class FileCache(Generic[T]):
+    """Thread-safe LRU cache of values loaded from files.
+
+    Each entry remembers the mtime and size of the file it was loaded from. On a hit the file is
+    re-stat'ed at most once every `check_interval` seconds, and the entry is reloaded when the file
+    has changed on disk. Hits inside the interval never touch the filesystem.
+
+    Args:
+        max_entries (int): The maximum number of entries kept before the least recently used is evicted.
+        check_interval (float): The minimum number of seconds between two staleness checks of an entry.
+        on_evict (Optional[Callable[[T], None]]): Called with each value that is dropped from the cache, because it
+            was reloaded, evicted, invalidated or cleared, ex: to release the resources of the value.
+    """
+
+    def __init__(
+        self, max_entries: int, check_interval: float = 1.0, on_evict: Optional[Callable[[T], None]] = None
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.on_evict = on_evict
+        self._entries: OrderedDict[Hashable, _CacheEntry[T]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, path: Path, loader: Callable[[Path], T]) -> T:
+        """Return the cached value for `key`, loading it from `path` with `loader` on a miss.
+
+        Raises:
+            FileNotFoundError: If `path` does not exist when the entry has to be (re)validated.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.checked_at < self.check_interval:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.value
+
+        stat = _stat(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                entry.checked_at = now
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.value
+            self._misses += 1
+
+        # load outside the lock so that a slow parse does not block hits on other keys
+        value = loader(path)
+        dropped = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                # loaded by another thread in the meantime, whose callers already use its value
+                dropped.append(value)
+                value = entry.value
+            else:
+                if entry is not None:
+                    dropped.append(entry.value)
+                self._entries[key] = _CacheEntry(value, stat.st_mtime_ns, stat.st_size, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                dropped.append(self._entries.popitem(last=False)[1].value)
+                self._evictions += 1
+        self._drop(dropped)
+        return value
+
+    def fingerprint(self, key: Hashable) -> Optional[tuple[int, int]]:
+        """Return the mtime and size of the file the cached value of `key` was loaded from, or None if not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry.mtime_ns, entry.size) if entry is not None else None
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        self._drop([entry.value] if entry is not None else [])
+
+    def clear(self) -> None:
+        with self._lock:
+            dropped = [entry.value for entry in self._entries.values()]
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+        self._drop(dropped)
+
+    def _drop(self, values: list[T]) -> None:
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+def _stat(path: Path) -> os.stat_result:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Reference file not found: {path}")
+
+
+class DerivedCache(Generic[T]):
+    """Thread-safe cache of values derived from a source object, ex: an index built from a cached reference.
+
+    A value is rebuilt when the source object stored under the key is replaced, which happens when the
+    `FileCache` holding the source reloads it.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Hashable, tuple[object, T]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, source: object, builder: Callable[[Any], T]) -> T:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] is source:
+            return entry[1]
+
+        value = builder(source)
+        with self._lock:
+            self._entries[key] = (source, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
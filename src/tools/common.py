@@ -1,14 +1,148 @@
 import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal, Optional
 
-from src.constants import RAW_PENNYLANE_JSON_DIR
+from src.constants import (
+    FORMATTED_PENNYLANE_JSON_DIR,
+    INDEXED_PENNYLANE_DIR,
+    RAW_PENNYLANE_JSON_DIR,
+    REFERENCE_CACHE_CHECK_INTERVAL,
+    SUPPORTED_PENNYLANE_VERSIONS,
+)
+from src.tools import bundle
 
+# "raw": reference documentation lookups, "formatted": static validation
+ReferenceKind = Literal["raw", "formatted"]
 
-def get_latest_version() -> str:
-    def version_to_tuple(v: str) -> tuple:
-        return tuple(map(int, v.lstrip("v").split(".")))
 
-    file_list = os.listdir(RAW_PENNYLANE_JSON_DIR)
-    versions = [f.replace(".json", "") for f in file_list if f.endswith(".json")]
-    latest_version = max(versions, key=version_to_tuple)
+@dataclass(frozen=True)
+class VersionCatalog:
+    """The supported versions whose reference files are available on disk, oldest first."""
+
+    raw: tuple[str, ...]
+    formatted: tuple[str, ...]
+
+    def available(self, kind: ReferenceKind) -> tuple[str, ...]:
+        return self.raw if kind == "raw" else self.formatted
+
+    def latest(self, kind: ReferenceKind = "raw") -> str:
+        versions = self.available(kind)
+        if not versions:
+            raise FileNotFoundError(f"No {kind} PennyLane reference is available")
+        return versions[-1]
+
+    def availability(self) -> dict[str, dict[str, bool]]:
+        return {v: {"raw": v in self.raw, "formatted": v in self.formatted} for v in SUPPORTED_PENNYLANE_VERSIONS}
+
+
+def _list_versions(directory: Path, suffix: str) -> set[str]:
+    try:
+        return {f.removesuffix(suffix) for f in os.listdir(directory) if f.endswith(suffix)}
+    except FileNotFoundError:
+        return set()
+
+
+def _bundle_versions() -> dict[str, dict[str, bool]]:
+    if not bundle.USE_REFERENCE_BUNDLE:
+        return {}
+    try:
+        return bundle.read_bundle_versions(bundle.REFERENCE_BUNDLE_PATH)
+    except (OSError, ValueError):
+        # a missing or unreadable bundle, the versions of the JSON files are served
+        return {}
+
+
+def _scan_versions() -> VersionCatalog:
+    # SUPPORTED_PENNYLANE_VERSIONS is ordered oldest first, files of unsupported versions are ignored
+    bundled = _bundle_versions()
+    raw = _list_versions(RAW_PENNYLANE_JSON_DIR, ".json") | _list_versions(INDEXED_PENNYLANE_DIR, ".sqlite")
+    raw |= {v for v, kinds in bundled.items() if kinds["raw"]}
+    formatted = _list_versions(FORMATTED_PENNYLANE_JSON_DIR, ".json")
+    formatted |= {v for v, kinds in bundled.items() if kinds["formatted"]}
+    return VersionCatalog(
+        raw=tuple(v for v in SUPPORTED_PENNYLANE_VERSIONS if v in raw),
+        formatted=tuple(v for v in SUPPORTED_PENNYLANE_VERSIONS if v in formatted),
+    )
+
+
+def _directories_state() -> tuple[Optional[int], ...]:
+    # the mtime of a directory changes when a file is added, removed or renamed in it,
+    # the bundle is replaced by a rename so its own mtime changes on every rebuild
+    state = []
+    for path in (
+        RAW_PENNYLANE_JSON_DIR,
+        INDEXED_PENNYLANE_DIR,
+        FORMATTED_PENNYLANE_JSON_DIR,
+        bundle.REFERENCE_BUNDLE_PATH,
+    ):
+        try:
+            state.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            state.append(None)
+    return tuple(state)
+
 
-    return latest_version
+_catalog: Optional[VersionCatalog] = None
+_catalog_state: tuple[Optional[int], ...] = ()
+_catalog_checked_at = 0.0
+_catalog_lock = threading.Lock()
+
+
+def get_version_catalog() -> VersionCatalog:
+    """Return the catalog of available versions.
+
+    The catalog is scanned once and rescanned only when a reference directory changes, which is checked
+    at most once every `REFERENCE_CACHE_CHECK_INTERVAL` seconds.
+    """
+    global _catalog, _catalog_state, _catalog_checked_at
+    now = time.monotonic()
+    with _catalog_lock:
+        if _catalog is not None and now - _catalog_checked_at < REFERENCE_CACHE_CHECK_INTERVAL:
+            return _catalog
+
+        state = _directories_state()
+        if _catalog is None or state != _catalog_state:
+            _catalog = _scan_versions()
+            _catalog_state = state
+        _catalog_checked_at = now
+        return _catalog
+
+
+def refresh_version_catalog() -> VersionCatalog:
+    """Rescan the reference directories, ex: right after new reference files were written."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+    return get_version_catalog()
+
+
+def resolve_version(version: Optional[str], kind: ReferenceKind = "raw") -> str:
+    """Normalize the version and check that its reference is available, defaulting to the latest available version.
+
+    Raises:
+        ValueError: If the version is not supported, or if its reference files are not available.
+    """
+    catalog = get_version_catalog()
+    if version is None:
+        return catalog.latest(kind)
+
+    version = f"v{version}" if not version.startswith("v") else version
+    if version not in SUPPORTED_PENNYLANE_VERSIONS:
+        raise ValueError(
+            f"Unsupported PennyLane version '{version}'. "
+            f"Supported versions are {', '.join(SUPPORTED_PENNYLANE_VERSIONS)}"
+        )
+    if version not in catalog.available(kind):
+        available = ", ".join(catalog.available(kind)) or "none"
+        raise ValueError(
+            f"The {kind} reference of PennyLane version '{version}' is not available. "
+            f"Available versions are {available}"
+        )
+    return version
+
+
+def get_latest_version() -> str:
+    return get_version_catalog().latest("raw")
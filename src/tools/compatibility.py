@@ -0,0 +1,291 @@
+import ast
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, cast
+
+from src.constants import COMPATIBILITY_INDEX_PATH, FORMATTED_PENNYLANE_JSON_DIR, VALIDATION_CHECK_TYPES
+from src.tools import bundle
+from src.tools.arg_validator import format_type_error, split_call_arguments, variadic_kind
+from src.tools.cache import FileCache
+from src.tools.common import get_version_catalog
+from src.tools.limits import LimitExceededError, run_with_deadline
+from src.tools.static_validation import (
+    COMPILE_FILENAME,
+    collect_pennylane_calls,
+    get_reference,
+    parse_code,
+    validate_by_py_compile,
+)
+from src.tools.symbols import DottedNameTrie, is_top_level_name, resolve_reference_name
+from src.tools.type_specs import accepts, parse_type_spec
+
+# version of the saved index layout, an index saved with another one is rebuilt
+COMPATIBILITY_INDEX_FORMAT = 2
+
+
+@dataclass
+class MethodCompatibility:
+    """Bitsets of the versions a method and its arguments exist in.
+
+    Bit i stands for `CompatibilityIndex.versions[i]`. The arguments are bound and checked by the same rules as
+    `ArgValidator`, on all the versions at once.
+    """
+
+    versions: int = 0
+    # argument name -> versions accepting the argument
+    args: dict[str, int] = field(default_factory=dict)
+    # argument name -> versions requiring the argument
+    required: dict[str, int] = field(default_factory=dict)
+    # order of the argument names, used to bind positional arguments -> versions with this order
+    positional: dict[tuple[str, ...], int] = field(default_factory=dict)
+    # versions accepting any keyword argument (`**kwargs`)
+    var_keyword: int = 0
+    # argument name -> documented type -> versions documenting the argument with this type
+    types: dict[str, dict[str, int]] = field(default_factory=dict)
+
+
+@dataclass
+class CompatibilityIndex:
+    versions: list[str]
+    methods: dict[str, MethodCompatibility]
+
+    def __post_init__(self) -> None:
+        self.all_versions = (1 << len(self.versions)) - 1
+        self.trie = DottedNameTrie(self.methods)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "format": COMPATIBILITY_INDEX_FORMAT,
+            "versions": self.versions,
+            "methods": {
+                name: {
+                    "versions": method.versions,
+                    "args": method.args,
+                    "required": method.required,
+                    "positional": [[list(order), mask] for order, mask in method.positional.items()],
+                    "var_keyword": method.var_keyword,
+                    "types": method.types,
+                }
+                for name, method in self.methods.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "CompatibilityIndex":
+        """Load a saved index.
+
+        Raises:
+            ValueError: If the index was saved with another layout.
+        """
+        if data.get("format") != COMPATIBILITY_INDEX_FORMAT:
+            raise ValueError(f"Unsupported compatibility index format {data.get('format')}")
+        methods = {
+            name: MethodCompatibility(
+                versions=method["versions"],
+                args=method["args"],
+                required=method["required"],
+                positional={tuple(order): mask for order, mask in method["positional"]},
+                var_keyword=method["var_keyword"],
+                types=method["types"],
+            )
+            for name, method in data["methods"].items()
+        }
+        return cls(versions=data["versions"], methods=methods)
+
+
+def build_compatibility_index(versions: list[str]) -> CompatibilityIndex:
+    """Build the index from the formatted reference of each version, read from the bundle or the JSON files."""
+    methods: dict[str, MethodCompatibility] = {}
+    for i, version in enumerate(versions):
+        bit = 1 << i
+        reference = get_reference(version)
+        for name, signature in reference.items():
+            method = methods.setdefault(name, MethodCompatibility())
+            method.versions |= bit
+            order = []
+            # positional values are bound in order until `*args`, the following names are keywords
+            binds_positional = True
+            for arg in signature["args"]:
+                kind = variadic_kind(arg["name"])
+                if kind is not None:
+                    if kind == "**":
+                        method.var_keyword |= bit
+                    else:
+                        binds_positional = False
+                    continue
+                method.args[arg["name"]] = method.args.get(arg["name"], 0) | bit
+                if bool(arg["required"]):
+                    method.required[arg["name"]] = method.required.get(arg["name"], 0) | bit
+                arg_type = arg.get("type", "")
+                if arg_type:
+                    types = method.types.setdefault(arg["name"], {})
+                    types[arg_type] = types.get(arg_type, 0) | bit
+                if binds_positional:
+                    order.append(arg["name"])
+            method.positional[tuple(order)] = method.positional.get(tuple(order), 0) | bit
+
+    return CompatibilityIndex(versions=versions, methods=methods)
+
+
+def save_compatibility_index(index: CompatibilityIndex, path: Path = COMPATIBILITY_INDEX_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _load_compatibility_index(path: Path) -> CompatibilityIndex:
+    with open(path) as f:
+        return CompatibilityIndex.from_dict(json.load(f))
+
+
+_INDEX_CACHE: FileCache[CompatibilityIndex] = FileCache(max_entries=1, check_interval=0.0)
+_build_lock = threading.Lock()
+
+
+def _is_stale(versions: list[str]) -> bool:
+    if not COMPATIBILITY_INDEX_PATH.exists():
+        return True
+    index_mtime = COMPATIBILITY_INDEX_PATH.stat().st_mtime
+    # a version may be available from the JSON file, the bundle, or both
+    sources = [FORMATTED_PENNYLANE_JSON_DIR / f"{v}.json" for v in versions] + [bundle.REFERENCE_BUNDLE_PATH]
+    return any(path.stat().st_mtime > index_mtime for path in sources if path.exists())
+
+
+def get_compatibility_index() -> CompatibilityIndex:
+    """Return the compatibility index of all available versions, building and saving it if missing or outdated.
+
+    Raises:
+        FileNotFoundError: If no formatted reference is available.
+    """
+    versions = list(get_version_catalog().formatted)
+    if not versions:
+        raise FileNotFoundError(f"Reference file not found in: {FORMATTED_PENNYLANE_JSON_DIR}")
+
+    with _build_lock:
+        if _is_stale(versions):
+            save_compatibility_index(build_compatibility_index(versions), COMPATIBILITY_INDEX_PATH)
+        try:
+            index = _INDEX_CACHE.get(COMPATIBILITY_INDEX_PATH, COMPATIBILITY_INDEX_PATH, _load_compatibility_index)
+        except ValueError:
+            # saved with an older layout
+            index = None
+        if index is None or index.versions != versions:
+            # a version was added or removed since the index was saved
+            index = build_compatibility_index(versions)
+            save_compatibility_index(index, COMPATIBILITY_INDEX_PATH)
+    return index
+
+
+def _check_call(
+    index: CompatibilityIndex, call_name: str, explicit: bool, node: ast.Call, location: str, errors: dict[str, int]
+) -> None:
+    def add_error(message: str, mask: int) -> None:
+        if mask:
+            error = f"Method '{call_name}' ({location}): {message}"
+            errors[error] = errors.get(error, 0) | mask
+
+    reference_name = resolve_reference_name(index.trie, call_name)
+    method = index.methods.get(reference_name) if reference_name is not None else None
+    if method is None:
+        if explicit and is_top_level_name(call_name):
+            add_error(f"Method '{call_name}' not found", index.all_versions)
+        return
+
+    if explicit and is_top_level_name(call_name):
+        add_error(f"Method '{call_name}' not found", index.all_versions & ~method.versions)
+
+    positional, keywords, has_unpacking = split_call_arguments(node)
+    for order, order_versions in method.positional.items():
+        provided = set(order[: len(positional)]) | keywords.keys()
+        for arg in sorted(provided):
+            add_error(f"Unexpected argument '{arg}'", order_versions & ~method.args.get(arg, 0) & ~method.var_keyword)
+        if not has_unpacking:
+            for arg, required_versions in method.required.items():
+                if arg not in provided:
+                    add_error(f"Missing required argument '{arg}'", order_versions & required_versions)
+        if VALIDATION_CHECK_TYPES and method.types:
+            # the literal values are checked against the type each version documents for their argument
+            values = list(zip(order, positional)) + list(keywords.items())
+            for arg, value in values:
+                for arg_type, type_versions in method.types.get(arg, {}).items():
+                    if not accepts(parse_type_spec(arg_type), value):
+                        add_error(format_type_error(arg, arg_type, value), order_versions & type_versions)
+
+
+def check_pennylane_compatibility(code: str) -> dict[str, Any]:
+    """Check a code against all available versions of PennyLane in a single pass.
+
+    The code is parsed and walked once, and each call is checked against the bitsets of the compatibility index
+    instead of validating the code once per version. As in `validate_pennylane_code_statically`, literal argument
+    values are checked against the type each version documents. Code that exceeds the validation limits, or runs
+    out of time, is reported as compatible with no version, with the exceeded limit under "limit_exceeded".
+
+    Returns:
+        dict[str, Any]:
+            - compatible_versions: The versions the code is valid for, oldest first.
+            - compatible_range: The oldest and latest compatible versions, or None if no version is compatible.
+            - common_errors: The errors reported for every checked version.
+            - version_errors: The remaining errors of each incompatible version.
+    """
+    try:
+        return run_with_deadline(_check_pennylane_compatibility, code)
+    except LimitExceededError as e:
+        return {
+            "compatible_versions": [],
+            "compatible_range": None,
+            "common_errors": [str(e)],
+            "version_errors": {},
+            "limit_exceeded": e.details,
+        }
+
+
+def _check_pennylane_compatibility(code: str) -> dict[str, Any]:
+    index = get_compatibility_index()
+    # error -> versions reporting it
+    errors: dict[str, int] = {}
+
+    all_versions_errors: list[str] = []
+    try:
+        tree = parse_code(code)
+    except SyntaxError as e:
+        all_versions_errors.append(f"SyntaxError: {e}")
+        all_versions_errors.extend(cast(list[str], validate_by_py_compile(code)["errors"]))
+    else:
+        try:
+            compile(tree, COMPILE_FILENAME, "exec", dont_inherit=True)
+        except Exception:
+            # compile the source again so that the error shows the offending line like py_compile does
+            all_versions_errors.extend(cast(list[str], validate_by_py_compile(code)["errors"]))
+        for call in collect_pennylane_calls(tree):
+            location = f"line {call.lineno}, col {call.col_offset}"
+            _check_call(index, call.name, call.explicit, call.node, location, errors)
+
+    errors = {error: index.all_versions for error in all_versions_errors} | errors
+    invalid_versions = 0
+    for mask in errors.values():
+        invalid_versions |= mask
+
+    compatible_versions = [v for i, v in enumerate(index.versions) if not invalid_versions >> i & 1]
+    common_errors = [error for error, mask in errors.items() if mask == index.all_versions]
+    version_errors = {
+        v: [error for error, mask in errors.items() if mask >> i & 1 and mask != index.all_versions]
+        for i, v in enumerate(index.versions)
+        if invalid_versions >> i & 1
+    }
+
+    return {
+        "compatible_versions": compatible_versions,
+        "compatible_range": [compatible_versions[0], compatible_versions[-1]] if compatible_versions else None,
+        "common_errors": common_errors,
+        "version_errors": {v: version_error for v, version_error in version_errors.items() if version_error},
+    }
@@ -0,0 +1,328 @@
+import ast
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Optional, cast
+
+from src.constants import INCREMENTAL_MAX_SESSIONS, INCREMENTAL_SESSION_TTL
+from src.metrics import VALIDATION_ERRORS, record_stage
+from src.tools import limits
+from src.tools.limits import LimitExceededError, check_call_count, limit_exceeded_result, run_with_deadline
+from src.tools.result_cache import normalize_code
+from src.tools.static_validation import (
+    _SOURCE_LINE,
+    COMPILE_FILENAME,
+    PennyLaneCall,
+    _check_calls,
+    _PennyLaneCallCollector,
+    _resolve_version,
+    format_call_error,
+    get_reference_fingerprint,
+    parse_code,
+    validate_by_py_compile,
+)
+from src.tools.symbols import SymbolTable
+
+OP = "validate_incremental"
+
+
+@dataclass
+class _Definition:
+    """The imports and dotted calls of a top-level definition, which only depend on its source text.
+
+    Line numbers are relative to the first line of the definition, so that a definition that moved in the module
+    is still reused.
+    """
+
+    name: Optional[str]
+    imports: list[ast.Import | ast.ImportFrom]
+    # (parts of the called name, call node, line relative to the first line of the definition)
+    dotted_calls: list[tuple[list[str], ast.Call, int]]
+
+
+# (relative line, column, canonical name, joined error messages) of each call with errors
+_CallErrors = list[tuple[int, int, str, str]]
+# (text hash, imports of the module, version, reference fingerprint) of a part of a module
+_PartKey = tuple[bytes, Hashable, str, Optional[tuple[int, int]]]
+
+
+@dataclass
+class _Session:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # hash of the source text of a definition -> its imports, the calls of every definition resolve through them
+    imports: dict[bytes, list[ast.Import | ast.ImportFrom]] = field(default_factory=dict)
+    # key of a part -> (number of PennyLane calls, errors)
+    errors: dict[_PartKey, tuple[int, _CallErrors]] = field(default_factory=dict)
+    # key and result of the last validated document, returned as is when the same document is validated again
+    last: Optional[tuple[Hashable, dict[str, Any]]] = None
+    used_at: float = 0.0
+
+
+@dataclass
+class _Changes:
+    """The results of the parts of a module that were not cached in its session, computed by `_validate_changes`.
+
+    Only these are sent back from a worker process, the server merges them with the cached results.
+    """
+
+    # the whole result when the module could not be split into parts, ex: a syntax error
+    result: Optional[dict[str, Any]] = None
+    compile_errors: list[str] = field(default_factory=list)
+    # (first line, key) of each part of the module, in source order
+    parts: list[tuple[int, _PartKey]] = field(default_factory=list)
+    # imports of the definitions the session did not know, by text hash
+    imports: dict[bytes, list[ast.Import | ast.ImportFrom]] = field(default_factory=dict)
+    errors: dict[_PartKey, tuple[int, _CallErrors]] = field(default_factory=dict)
+    recomputed: list[dict[str, Any]] = field(default_factory=list)
+
+
+class SessionStore:
+    """Thread-safe LRU store of the per-definition results of the documents validated incrementally.
+
+    Args:
+        max_sessions (int): The maximum number of sessions kept before the least recently used is dropped.
+        ttl (float): The number of seconds a session is kept after its last use.
+    """
+
+    def __init__(self, max_sessions: int, ttl: float) -> None:
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> _Session:
+        """Return the session, or a new empty one if it does not exist or has expired."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session.used_at >= self.ttl:
+                session = self._sessions[session_id] = _Session()
+            session.used_at = now
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+SESSIONS = SessionStore(max_sessions=INCREMENTAL_MAX_SESSIONS, ttl=INCREMENTAL_SESSION_TTL)
+
+
+def _split_definitions(tree: ast.Module) -> list[tuple[int, int, list[ast.stmt]]]:
+    # (first line, last line, statements) of each top-level definition or statement, decorators included.
+    # statements sharing a line (ex: `a(); b()`) are kept together, so that the lines of a part identify it
+    parts: list[tuple[int, int, list[ast.stmt]]] = []
+    for stmt in tree.body:
+        decorators = getattr(stmt, "decorator_list", [])
+        first = min([stmt.lineno] + [decorator.lineno for decorator in decorators])
+        last = cast(int, stmt.end_lineno)
+        if parts and first <= parts[-1][1]:
+            parts[-1] = (parts[-1][0], max(last, parts[-1][1]), parts[-1][2] + [stmt])
+        else:
+            parts.append((first, last, [stmt]))
+    return parts
+
+
+def _walk_definition(statements: list[ast.stmt], first: int) -> _Definition:
+    collector = _PennyLaneCallCollector(limits.VALIDATION_MAX_DEPTH)
+    for stmt in statements:
+        collector.visit(stmt)
+    stmt = statements[0]
+    is_definition = len(statements) == 1 and isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    name = cast(str, getattr(stmt, "name")) if is_definition else None
+    dotted_calls = [(parts, node, node.lineno - first) for parts, node in collector.dotted_calls]
+    return _Definition(name, collector.imports, dotted_calls)
+
+
+def _symbol_table(imports: list[list[ast.Import | ast.ImportFrom]]) -> SymbolTable:
+    symbols = SymbolTable()
+    for nodes in imports:
+        for node in nodes:
+            if isinstance(node, ast.Import):
+                symbols.add_import(node)
+            else:
+                symbols.add_import_from(node)
+    return symbols
+
+
+def _nothing_reused() -> dict[str, Any]:
+    # result fields of a module that could not be split into definitions, ex: a syntax error
+    return {"definitions": 0, "recomputed": [], "reused": 0}
+
+
+def _document_key(code: str, version: str) -> tuple[bytes, str, Optional[tuple[int, int]]]:
+    fingerprint = get_reference_fingerprint(version)
+    return hashlib.sha256(code.encode("utf-8", "surrogatepass")).digest(), version, fingerprint
+
+
+def _last_result(session: _Session, code: str, version: str) -> Optional[dict[str, Any]]:
+    # the result of the last document of the session, if it is the same document
+    if session.last is None or session.last[0] != _document_key(code, version):
+        return None
+    result = session.last[1]
+    # the session holds the results of the distinct parts of the last document
+    return {**result, "errors": list(result["errors"]), "recomputed": [], "reused": len(session.errors)}
+
+
+def _validate_changes(
+    code: str,
+    version: str,
+    imports: dict[bytes, list[ast.Import | ast.ImportFrom]],
+    cached: dict[_PartKey, int],
+) -> _Changes:
+    # validates the parts of the module that are not in `cached` (key -> number of PennyLane calls), given the
+    # imports of the definitions the session knows. Only takes and returns what changed, so that it can run in a
+    # worker process without sending the session there and back
+    start = time.perf_counter()
+    try:
+        tree = parse_code(code)
+    except LimitExceededError as e:
+        VALIDATION_ERRORS.inc("limit_exceeded")
+        return _Changes({**limit_exceeded_result(e), **_nothing_reused()})
+    except SyntaxError as e:
+        record_stage(OP, "ast", start)
+        VALIDATION_ERRORS.inc("syntax")
+        py_compile_errors = cast(list[str], validate_by_py_compile(code)["errors"])
+        return _Changes({"valid": False, "errors": [f"SyntaxError: {e}"] + py_compile_errors, **_nothing_reused()})
+    start = record_stage(OP, "ast", start)
+
+    # the whole module is compiled, some compile errors depend on other statements (ex: `from __future__`)
+    changes = _Changes()
+    try:
+        compile(tree, COMPILE_FILENAME, "exec", dont_inherit=True)
+    except Exception:
+        changes.compile_errors.extend(cast(list[str], validate_by_py_compile(code)["errors"]))
+        VALIDATION_ERRORS.inc("compile")
+    start = record_stage(OP, "py_compile", start)
+
+    lines = _SOURCE_LINE.findall(code)
+    fingerprint = get_reference_fingerprint(version)
+    # definitions walked by this validation, by text hash
+    walked: dict[bytes, _Definition] = {}
+    # (first line, last line, text hash, statements) of each part of the module, in source order
+    parts: list[tuple[int, int, bytes, list[ast.stmt]]] = []
+    # calls of the parts that are not cached, with the key of their part
+    pending: list[tuple[_PartKey, PennyLaneCall]] = []
+    counts: dict[_PartKey, int] = {}
+    try:
+        for first, last, statements in _split_definitions(tree):
+            text = "".join(lines[first - 1 : last]).encode("utf-8", "surrogatepass")
+            digest = hashlib.blake2b(text, digest_size=16).digest()
+            if digest not in imports and digest not in walked:
+                walked[digest] = _walk_definition(statements, first)
+            parts.append((first, last, digest, statements))
+
+        # the calls of a definition resolve through the imports of the whole module
+        symbols = _symbol_table(
+            [walked[digest].imports if digest in walked else imports[digest] for *_, digest, _ in parts]
+        )
+        symbols_key = (frozenset(symbols.aliases.items()), symbols.star_import)
+        for first, last, digest, statements in parts:
+            key = (digest, symbols_key, version, fingerprint)
+            changes.parts.append((first, key))
+            if key in counts:
+                continue
+            if key in cached:
+                counts[key] = cached[key]
+                continue
+            if digest not in walked:
+                # a known definition whose calls may resolve differently, ex: after a change of the imports
+                walked[digest] = _walk_definition(statements, first)
+            definition = walked[digest]
+            dotted_calls = sorted(definition.dotted_calls, key=lambda call: (call[2], call[1].col_offset))
+            calls = []
+            for name_parts, node, line in dotted_calls:
+                resolved = symbols.resolve(name_parts)
+                if resolved is not None:
+                    name, explicit = resolved
+                    calls.append(PennyLaneCall(name, node, line, node.col_offset, explicit))
+            counts[key] = len(calls)
+            changes.errors[key] = (len(calls), [])
+            pending.extend((key, call) for call in calls)
+            changes.recomputed.append({"name": definition.name, "lines": [first, last]})
+        start = record_stage(OP, "extraction", start)
+        check_call_count(sum(counts[key] for _, key in changes.parts))
+    except LimitExceededError as e:
+        VALIDATION_ERRORS.inc("limit_exceeded")
+        return _Changes({**limit_exceeded_result(e), **_nothing_reused()})
+
+    if pending:
+        owners = {id(call): key for key, call in pending}
+        for call, message in _check_calls([call for _, call in pending], version, OP):
+            changes.errors[owners[id(call)]][1].append((call.lineno, call.col_offset, call.name, message))
+    changes.imports = {digest: definition.imports for digest, definition in walked.items() if digest not in imports}
+    return changes
+
+
+def _merge(session: _Session, document_key: Hashable, changes: _Changes) -> dict[str, Any]:
+    # the result of the module from the cached and the recomputed results of its parts, stored in the session
+    if changes.result is not None:
+        # the session keeps the results of the previous document
+        return changes.result
+    part_errors = {
+        key: changes.errors[key] if key in changes.errors else session.errors[key] for _, key in changes.parts
+    }
+    errors = list(changes.compile_errors)
+    for first, key in changes.parts:
+        for line, col_offset, name, message in part_errors[key][1]:
+            errors.append(format_call_error(name, first + line, col_offset, message))
+
+    result = {"valid": len(errors) == 0, "errors": errors, "definitions": len(changes.parts)}
+    imports = {**session.imports, **changes.imports}
+    session.imports = {key[0]: imports[key[0]] for _, key in changes.parts}
+    session.errors = part_errors
+    session.last = (document_key, result)
+    # identical parts share their results, they count once
+    reused = len(part_errors) - len(changes.recomputed)
+    return {**result, "errors": list(errors), "recomputed": changes.recomputed, "reused": reused}
+
+
+def validate_pennylane_code_incremental(code: str, session_id: str, version: Optional[str] = None) -> dict[str, Any]:
+    """Validate a module the same way as `validate_pennylane_code_statically`, reusing the results of the
+    top-level definitions that did not change since the last validation of the same session.
+
+    The module is split into its top-level functions, classes and statements, and each one is identified by the
+    hash of its source text. The PennyLane calls of a definition are only collected and checked again when its
+    text changed, when the imports of the module changed, or when the version or reference data changed.
+    Long modules are validated in a worker process killed after `VALIDATION_TIMEOUT` seconds, like
+    `validate_pennylane_code_cached`, they then get a "limit exceeded" result and the session is left unchanged.
+    The session stays in the server, the worker only gets the keys of the cached parts and returns the results of
+    the changed ones.
+
+    Args:
+        code (str): The source code of the module.
+        session_id (str): Identifies the document across validations, ex: a file path or a random id.
+        version (Optional[str]): The version of the PennyLane library to use.
+
+    Returns:
+        dict[str, Any]:
+            - valid, errors: The same as `validate_pennylane_code_statically`.
+            - definitions: The number of top-level definitions and statements of the module.
+            - recomputed: The name (None for other statements) and first and last lines of each definition
+              that was checked again.
+            - reused: The number of definitions whose results were reused, identical definitions counting once.
+    """
+    version = _resolve_version(version)
+    code = normalize_code(code)
+    session = SESSIONS.get(session_id)
+    # the validations of a session are serialized, each one starts from the results of the previous one
+    with session.lock:
+        result = _last_result(session, code, version)
+        if result is not None:
+            return result
+        # only the imports and call counts of the known parts are sent along, not the results of the session
+        cached = {key: count for key, (count, _) in session.errors.items()}
+        try:
+            changes = run_with_deadline(_validate_changes, code, version, session.imports, cached)
+        except LimitExceededError as e:
+            # the session keeps the results of the previous document
+            return {**limit_exceeded_result(e), **_nothing_reused()}
+        return _merge(session, _document_key(code, version), changes)
@@ -0,0 +1,115 @@
+import atexit
+import multiprocessing
+import threading
+from typing import Any, Callable, Optional, TypeVar
+
+from src.constants import (
+    TOOL_MAX_CONCURRENCY,
+    VALIDATION_ISOLATION_MIN_CHARS,
+    VALIDATION_MAX_CALLS,
+    VALIDATION_MAX_CODE_CHARS,
+    VALIDATION_MAX_DEPTH,
+    VALIDATION_TIMEOUT,
+)
+from src.executor import DeadlineExceededError, KillableWorkerPool
+from src.metrics import REGISTRY, run_recording_metrics
+from src.profiling import profiled_in_worker
+
+T = TypeVar("T")
+
+_DESCRIPTIONS = {
+    "max_code_chars": "the code has too many characters",
+    "max_calls": "the code has too many PennyLane calls",
+    "max_depth": "the code is nested too deeply",
+    "timeout_seconds": "the validation did not complete in time",
+}
+
+
+class LimitExceededError(ValueError):
+    """Raised when a submission exceeds one of the validation limits.
+
+    Args:
+        limit (str): The name of the limit, ex: "max_code_chars".
+        maximum (float): The value of the limit.
+        value (Optional[float]): The value of the submission, if known, ex: the number of characters.
+    """
+
+    def __init__(self, limit: str, maximum: float, value: Optional[float] = None) -> None:
+        self.limit = limit
+        self.maximum = maximum
+        self.value = value
+        measured = f"{value} > {maximum}" if value is not None else f"max: {maximum}"
+        super().__init__(f"Limit exceeded: {_DESCRIPTIONS.get(limit, limit)} ({measured})")
+
+    @property
+    def details(self) -> dict[str, Any]:
+        return {"limit": self.limit, "max": self.maximum, "value": self.value}
+
+    def __reduce__(self) -> tuple:
+        # pickled with its arguments, ex: when raised in a worker process
+        return type(self), (self.limit, self.maximum, self.value)
+
+
+def limit_exceeded_result(error: LimitExceededError) -> dict[str, Any]:
+    """The validation result of a submission that exceeds a limit."""
+    return {"valid": False, "errors": [str(error)], "limit_exceeded": error.details}
+
+
+def check_code_size(code: str, max_chars: Optional[int] = None) -> None:
+    max_chars = VALIDATION_MAX_CODE_CHARS if max_chars is None else max_chars
+    if len(code) > max_chars:
+        raise LimitExceededError("max_code_chars", max_chars, len(code))
+
+
+def check_call_count(count: int, max_calls: Optional[int] = None) -> None:
+    max_calls = VALIDATION_MAX_CALLS if max_calls is None else max_calls
+    if count > max_calls:
+        raise LimitExceededError("max_calls", max_calls, count)
+
+
+_pool: Optional[KillableWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_deadline_pool() -> KillableWorkerPool:
+    """Return the pool of killable workers the long validations run on, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # one worker per tool call running at the same time
+            _pool = KillableWorkerPool(max_workers=TOOL_MAX_CONCURRENCY)
+        return _pool
+
+
+@atexit.register
+def shutdown_deadline_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def run_with_deadline(func: Callable[..., T], code: str, *args: Any) -> T:
+    """Run `func(code, *args)` in a killable worker process, killed after `VALIDATION_TIMEOUT` seconds.
+
+    The call runs in-process when the deadline is disabled, when the code is shorter than
+    `VALIDATION_ISOLATION_MIN_CHARS` (the round-trip to a worker would cost more than the validation), and in
+    worker processes (ex: of the batch pool, which kills the workers of expired items itself), whose own children
+    would not be killed with them. The metrics recorded in a worker are added to the metrics of this process.
+
+    Raises:
+        LimitExceededError: If the call did not complete in time.
+    """
+    timeout = VALIDATION_TIMEOUT
+    if timeout <= 0 or len(code) < VALIDATION_ISOLATION_MIN_CHARS or multiprocessing.parent_process() is not None:
+        return func(code, *args)
+    try:
+        # a profiled tool call is profiled in the worker, where the work runs
+        worker_func = profiled_in_worker(func)
+        result, recorded = get_deadline_pool().run(timeout, run_recording_metrics, worker_func, code, *args)
+    except DeadlineExceededError:
+        raise LimitExceededError("timeout_seconds", timeout)
+    # the stage timings and counts recorded in the worker
+    REGISTRY.merge(recorded)
+    return result
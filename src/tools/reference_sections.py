@@ -0,0 +1,220 @@
+from typing import Any, Iterator, Optional, Sequence
+
+# sections of a reference response, in the order they are returned: the short ones first, so that a budget
+# truncates the source code before the signature
+SECTIONS = ("signature", "description", "args", "docstring", "source")
+# sections returned when none are requested
+DEFAULT_SECTIONS = ("signature", "docstring", "source")
+# sections sliced when the index and the bundle are built, the others are short
+SLICED_SECTIONS = ("docstring", "source")
+# maximum size of a slice in UTF-8 bytes, a budget truncates a long section between two slices
+REFERENCE_SLICE_BYTES = 1024
+
+_TITLES = {
+    "signature": "Signature",
+    "description": "Description",
+    "args": "Arguments",
+    "docstring": "Docstring",
+    "source": "Source Code",
+}
+# the headings are ASCII, their length is their size in bytes
+_HEADINGS = {section: f"\n# {title}\n" for section, title in _TITLES.items()}
+_CONTINUED_HEADINGS = {section: f"\n# {title} (continued)\n" for section, title in _TITLES.items()}
+
+# (start offset in characters, size in UTF-8 bytes) of each slice of a text
+Slices = tuple[tuple[int, int], ...]
+
+
+def _utf8_size(text: str) -> int:
+    return len(text.encode("utf-8", "surrogatepass"))
+
+
+def _units(text: str, max_bytes: int) -> Iterator[tuple[int, int, int, bool]]:
+    # (offset, characters, bytes, is blank) of each line, lines longer than a slice are split
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        size = _utf8_size(line)
+        if size <= max_bytes:
+            yield offset, len(line), size, not line.strip()
+        else:
+            start = chunk_size = 0
+            for i, char in enumerate(line):
+                char_size = _utf8_size(char)
+                if chunk_size + char_size > max_bytes:
+                    yield offset + start, i - start, chunk_size, False
+                    start, chunk_size = i, 0
+                chunk_size += char_size
+            yield offset + start, len(line) - start, chunk_size, False
+        offset += len(line)
+
+
+def text_slices(text: Optional[str], max_bytes: int = REFERENCE_SLICE_BYTES) -> Slices:
+    """Split a text into slices of at most `max_bytes` UTF-8 bytes.
+
+    A slice ends after a blank line when that keeps at least half of it, so that docstrings are cut between
+    paragraphs, and otherwise at the end of a line. Lines longer than a slice are cut anywhere.
+    """
+    if not text:
+        return ()
+    slices = []
+    start = size = 0
+    # (offset, size) of the current slice up to its last blank line
+    paragraph: Optional[tuple[int, int]] = None
+    for offset, length, unit_size, blank in _units(text, max_bytes):
+        while size and size + unit_size > max_bytes:
+            if paragraph is not None and paragraph[1] * 2 >= max_bytes:
+                end, end_size = paragraph
+            else:
+                end, end_size = offset, size
+            slices.append((start, end_size))
+            start, size, paragraph = end, size - end_size, None
+        size += unit_size
+        if blank:
+            paragraph = (offset + length, size)
+    if size:
+        slices.append((start, size))
+    return tuple(slices)
+
+
+def _slice_text(text: str, slices: Slices, i: int) -> str:
+    end = slices[i + 1][0] if i + 1 < len(slices) else len(text)
+    return text[slices[i][0] : end]
+
+
+def parse_cursor(cursor: str, sections: Sequence[str]) -> tuple[str, int]:
+    """Return the section and the slice a cursor returned by `render_reference` continues from.
+
+    Raises:
+        ValueError: If the cursor is malformed, or if its section is not requested.
+    """
+    section, _, index = cursor.partition(":")
+    if section not in sections or not index.isdigit():
+        raise ValueError(f"Invalid cursor {cursor!r}, expected a cursor returned with the same sections")
+    return section, int(index)
+
+
+def normalize_sections(sections: Optional[Sequence[str]]) -> tuple[str, ...]:
+    """Return the requested sections in response order, or the default ones.
+
+    Raises:
+        ValueError: If a section is unknown.
+    """
+    if not sections:
+        return DEFAULT_SECTIONS
+    unknown = [section for section in sections if section not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown sections {', '.join(map(repr, unknown))}. Sections are {', '.join(SECTIONS)}")
+    return tuple(section for section in SECTIONS if section in sections)
+
+
+def _args_text(formatted: dict[str, Any]) -> str:
+    lines = []
+    for arg in formatted.get("args", []):
+        required = ", required" if arg["required"] else ""
+        lines.append(f"- {arg['name']} ({arg.get('type', '')}{required}): {arg.get('description', '')}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _section_text(section: str, raw: dict[str, Any], formatted: Optional[dict[str, Any]]) -> Optional[str]:
+    if section in ("description", "args"):
+        if formatted is None:
+            return None
+        return formatted.get("description", "") if section == "description" else _args_text(formatted)
+    return raw.get(section)
+
+
+def _trailer(section: str, left: int, i: int) -> str:
+    return (
+        f"\n[Truncated: {left} more bytes of the {_TITLES[section].lower()}. "
+        f"Request again with cursor='{section}:{i}' to continue.]\n"
+    )
+
+
+def render_reference(
+    method_name: str,
+    raw: dict[str, Any],
+    formatted: Optional[dict[str, Any]],
+    sections: Sequence[str],
+    max_bytes: int = 0,
+    cursor: Optional[str] = None,
+) -> str:
+    """Render the sections of a reference entry within a budget.
+
+    The docstring and the source code are cut between the slices precomputed by `text_slices`, and a truncated
+    response ends with the cursor of the first slice left out. The budget includes that cursor. The response holds
+    at least one slice, so it may exceed a budget smaller than `REFERENCE_SLICE_BYTES`.
+
+    Args:
+        method_name (str): The name of the method.
+        raw (dict[str, Any]): The signature, docstring and source code of the method, and the slices of the
+            docstring and of the source code (`docstring_slices`, `source_slices`) when precomputed.
+        formatted (Optional[dict[str, Any]]): The formatted entry of the method, for the description and the args.
+        sections (Sequence[str]): The sections to render, in response order.
+        max_bytes (int): The maximum size of the response in UTF-8 bytes, 0 for no limit.
+        cursor (Optional[str]): The cursor of a truncated response, to render the rest of the sections.
+
+    Returns:
+        str: The rendered reference.
+    """
+    first_section, first_slice = parse_cursor(cursor, sections) if cursor else (sections[0], 0)
+    header = f"# {method_name}\n"
+    # (section, text, slices, first slice, bytes left from it) of the sections left to render
+    parts = []
+    total = _utf8_size(header)
+    for section in sections[sections.index(first_section) :]:
+        text = _section_text(section, raw, formatted)
+        if not text:
+            continue
+        if section in SLICED_SECTIONS:
+            slices = raw.get(f"{section}_slices")
+            if slices is None:
+                slices = text_slices(text)
+        else:
+            slices = ((0, _utf8_size(text)),)
+        start = first_slice if section == first_section else 0
+        if start >= len(slices):
+            continue
+        left = sum(slice_size for _, slice_size in slices[start:])
+        parts.append((section, text, slices, start, left))
+        heading = _CONTINUED_HEADINGS[section] if start else _HEADINGS[section]
+        total += len(heading) + left + (not text.endswith("\n"))
+
+    out = [header]
+    if not max_bytes or total <= max_bytes:
+        # everything left fits
+        for section, text, slices, start, _ in parts:
+            out.append(_CONTINUED_HEADINGS[section] if start else _HEADINGS[section])
+            out.append(text[slices[start][0] :] if start else text)
+            if not text.endswith("\n"):
+                out.append("\n")
+        return "".join(out)
+
+    size = _utf8_size(header)
+    rendered_slice = False
+    for k, (section, text, slices, start, left) in enumerate(parts):
+        heading = _CONTINUED_HEADINGS[section] if start else _HEADINGS[section]
+        for i in range(start, len(slices)):
+            slice_size = slices[i][1] + (len(heading) if i == start else 0)
+            last_slice = i == len(slices) - 1
+            if last_slice and not text.endswith("\n"):
+                slice_size += 1
+            # the cursor of the next slice must fit after this one, unless no slice was rendered yet
+            if not last_slice:
+                trailer_size = len(_trailer(section, left - slices[i][1], i + 1))
+            elif k + 1 < len(parts):
+                next_section, _, _, next_start, next_left = parts[k + 1]
+                trailer_size = len(_trailer(next_section, next_left, next_start))
+            else:
+                trailer_size = 0
+            if rendered_slice and size + slice_size + trailer_size > max_bytes:
+                out.append(_trailer(section, left, i))
+                return "".join(out)
+            if i == start:
+                out.append(heading)
+            out.append(_slice_text(text, slices, i))
+            if last_slice and not text.endswith("\n"):
+                out.append("\n")
+            size += slice_size
+            left -= slices[i][1]
+            rendered_slice = True
+    return "".join(out)
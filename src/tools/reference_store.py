@@ -0,0 +1,370 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from src.constants import FORMATTED_PENNYLANE_JSON_DIR, INDEXED_PENNYLANE_DIR, RAW_PENNYLANE_JSON_DIR
+from src.tools.reference_sections import text_slices
+
+# page cache per open store in KiB, keeps resident memory flat no matter how many versions are opened
+SQLITE_CACHE_SIZE_KIB = 512
+# layout of the index, indexes of another format are rebuilt from the JSON dumps
+INDEX_FORMAT = "3"
+# BM25 weights of the searched columns: the name, the words of the name, the formatted description, the docstring
+SEARCH_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+# words of a query searched, the following ones are ignored
+SEARCH_MAX_TERMS = 32
+# words of more than this fraction of the methods (ex: "the", "qubit") add almost nothing to the BM25 scores, they
+# are only searched when all the words of the query are, so that ranking does not score most of the methods
+_COMMON_TERM_FRACTION = 0.5
+# length of the summary of a search result, in characters
+SEARCH_SUMMARY_CHARS = 200
+
+_SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE entries (
+    name TEXT PRIMARY KEY,
+    signature TEXT,
+    docstring TEXT,
+    source TEXT,
+    formatted TEXT,
+    -- JSON [[start, bytes], ...] of the slices of the docstring and of the source code, see `text_slices`
+    docstring_slices TEXT,
+    source_slices TEXT
+) WITHOUT ROWID;
+CREATE TABLE search_names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+-- inverted index of the searched text, contentless: the text is read from `entries`
+CREATE VIRTUAL TABLE search USING fts5(
+    name, words, description, docstring, content='', tokenize='porter unicode61'
+);
+"""
+
+# ex: "AmplitudeEmbedding" -> "Amplitude", "Embedding", "QNode" -> "Q", "Node", "CNOT" -> "CNOT"
+_CAMEL_WORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# the tokens of the `unicode61` tokenizer, underscores and punctuation separate words
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def _load_json(path: Path) -> dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _name_words(name: str) -> str:
+    # the words of the camel case parts of a name, the name column only holds its dotted and snake case parts
+    words = []
+    for token in _TOKEN.findall(name):
+        parts = _CAMEL_WORD.findall(token)
+        if len(parts) > 1:
+            words.extend(parts)
+    return " ".join(words)
+
+
+def _search_row(i: int, name: str, raw_entry: dict[str, Any], formatted_entry: Optional[dict]) -> tuple:
+    description = ""
+    if formatted_entry is not None:
+        # the descriptions of the arguments, ex: a search for "wires" finds the methods taking wires
+        args = " ".join(f"{arg['name']}: {arg.get('description', '')}" for arg in formatted_entry.get("args", []))
+        description = f"{formatted_entry.get('description', '')} {args}"
+    return (i, name, _name_words(name), description, raw_entry.get("docstring") or "")
+
+
+def search_terms(query: str) -> list[str]:
+    """Return the lowercase words of a free-text query, and the camel case parts of its words, ex:
+    "AmplitudeEmbedding features" -> ["amplitudeembedding", "amplitude", "embedding", "features"].
+
+    Raises:
+        ValueError: If the query has no words.
+    """
+    terms: list[str] = []
+    for token in _TOKEN.findall(query):
+        for term in [token] + _CAMEL_WORD.findall(token):
+            if term.lower() not in terms:
+                terms.append(term.lower())
+    if not terms:
+        raise ValueError(f"No words to search for in the query: {query!r}")
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def _match(terms: list[str]) -> str:
+    # an FTS5 query matching any of the terms, quoted so that words such as "AND" or "NOT" are not read as operators
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _summary(docstring: Optional[str], formatted: Optional[str]) -> str:
+    # the formatted description, or the first paragraph of the docstring
+    text = json.loads(formatted).get("description", "") if formatted is not None else ""
+    if not text and docstring:
+        text = docstring.strip().split("\n\n", 1)[0]
+    text = " ".join(text.split())
+    return text if len(text) <= SEARCH_SUMMARY_CHARS else text[: SEARCH_SUMMARY_CHARS - 3].rstrip() + "..."
+
+
+def build_reference_index(
+    version: str,
+    raw_dir: Path = RAW_PENNYLANE_JSON_DIR,
+    formatted_dir: Path = FORMATTED_PENNYLANE_JSON_DIR,
+    index_dir: Path = INDEXED_PENNYLANE_DIR,
+) -> Path:
+    """Convert the raw and formatted JSON dumps of a version into a single indexed SQLite file.
+
+    Besides the entries, the index holds the slices of the docstrings and source codes (see `text_slices`) and a
+    full-text index of the method names, formatted descriptions and docstrings, searched by `ReferenceStore.search`.
+    The index is written to a temporary file first and renamed into place, so readers never see a partially
+    written index.
+
+    Args:
+        version (str): The version of the PennyLane library. (ex: 'v0.41.1')
+        raw_dir (Path): Directory of the raw JSON dumps produced by `parse_pennylane_api.py`.
+        formatted_dir (Path): Directory of the formatted JSON dumps produced by `format_docs_by_llm.py`.
+        index_dir (Path): Directory the index is written to.
+
+    Returns:
+        Path: The path of the built index.
+
+    Raises:
+        FileNotFoundError: If the raw JSON dump of the version does not exist.
+    """
+    raw_path = raw_dir / f"{version}.json"
+    if not raw_path.exists():
+        raise FileNotFoundError(f"Reference file not found: {raw_path}")
+    raw = _load_json(raw_path)
+
+    formatted_path = formatted_dir / f"{version}.json"
+    formatted = _load_json(formatted_path) if formatted_path.exists() else {}
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    index_path = index_dir / f"{version}.sqlite"
+    fd, tmp_path = tempfile.mkstemp(dir=index_dir, prefix=f".{version}.", suffix=".sqlite.tmp")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)", (("version", version), ("format", INDEX_FORMAT))
+            )
+            names = sorted(raw.keys())
+            conn.executemany(
+                """
+                INSERT INTO entries (name, signature, docstring, source, formatted, docstring_slices, source_slices)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (
+                        name,
+                        raw[name].get("signature"),
+                        raw[name].get("docstring"),
+                        raw[name].get("source"),
+                        json.dumps(formatted[name]) if name in formatted else None,
+                        json.dumps(text_slices(raw[name].get("docstring"))),
+                        json.dumps(text_slices(raw[name].get("source"))),
+                    )
+                    for name in names
+                ),
+            )
+            rows = [_search_row(i, name, raw[name], formatted.get(name)) for i, name in enumerate(names)]
+            conn.executemany("INSERT INTO search_names (id, name) VALUES (?, ?)", (row[:2] for row in rows))
+            conn.executemany(
+                "INSERT INTO search (rowid, name, words, description, docstring) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.execute("INSERT INTO search (search) VALUES ('optimize')")
+            conn.commit()
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.replace(tmp_path, index_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return index_path
+
+
+class ReferenceStore:
+    """Read-only lookup layer over the SQLite index of one version.
+
+    Every lookup is a primary key read of a single row, so only the requested entry is loaded into memory.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KIB}")
+        self._lock = threading.Lock()
+        # indexes of an older format that could not be rebuilt, their JSON dumps are missing, cannot be searched
+        # and have no precomputed slices
+        self.searchable = (
+            self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search'").fetchone()
+            is not None
+        )
+        self._entry_count = self._fetchone("SELECT count(*) FROM entries", ())[0]
+        # whether the slices of the docstrings and sources were precomputed, they are computed on request otherwise
+        self._sliced = any(
+            row[1] == "source_slices" for row in self._conn.execute("PRAGMA table_info(entries)").fetchall()
+        )
+
+    def _fetchone(self, query: str, params: tuple) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()
+
+    def __contains__(self, name: object) -> bool:
+        return self._fetchone("SELECT 1 FROM entries WHERE name = ?", (name,)) is not None
+
+    def names(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM entries ORDER BY name").fetchall()
+        return (row[0] for row in rows)
+
+    def get_raw(self, name: str, slices: bool = False) -> Optional[dict[str, Any]]:
+        """Return the signature, docstring and source code of the method, or None if it is not indexed.
+
+        With `slices`, the entry also has the precomputed `docstring_slices` and `source_slices`, see `text_slices`.
+        """
+        if not slices or not self._sliced:
+            row = self._fetchone("SELECT signature, docstring, source FROM entries WHERE name = ?", (name,))
+            if row is None:
+                return None
+            entry = {"signature": row[0], "docstring": row[1], "source": row[2]}
+            if slices:
+                entry["docstring_slices"] = text_slices(row[1])
+                entry["source_slices"] = text_slices(row[2])
+            return entry
+        row = self._fetchone(
+            "SELECT signature, docstring, source, docstring_slices, source_slices FROM entries WHERE name = ?", (name,)
+        )
+        if row is None:
+            return None
+        return {
+            "signature": row[0],
+            "docstring": row[1],
+            "source": row[2],
+            "docstring_slices": tuple(map(tuple, json.loads(row[3]))),
+            "source_slices": tuple(map(tuple, json.loads(row[4]))),
+        }
+
+    def get_formatted(self, name: str) -> Optional[dict[str, Any]]:
+        """Return the formatted (LLM generated) entry of the method, or None if it does not exist."""
+        row = self._fetchone("SELECT formatted FROM entries WHERE name = ?", (name,))
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def search(self, query: str, offset: int = 0, limit: int = 10) -> tuple[int, list[dict[str, Any]]]:
+        """Rank the methods matching any word of the query by BM25 over their names, formatted descriptions and
+        docstrings, best first. The words found in most of the methods are left out, unless all the words are.
+
+        Args:
+            query (str): Free text, ex: "gradient of an expectation value".
+            offset (int): The number of best results skipped, for the following pages.
+            limit (int): The maximum number of results returned.
+
+        Returns:
+            tuple[int, list[dict[str, Any]]]: The number of matching methods, and the name, score (higher is
+            better) and summary of the results of the page.
+
+        Raises:
+            ValueError: If the query has no words, or if the index has no full-text index.
+        """
+        if not self.searchable:
+            raise ValueError(f"The reference index cannot be searched, rebuild it: {self.path}")
+        terms = search_terms(query)
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        count_query = "SELECT count(*) FROM search WHERE search MATCH ?"
+        with self._lock:
+            max_count = self._entry_count * _COMMON_TERM_FRACTION
+            distinctive = [
+                term for term in terms if self._conn.execute(count_query, (_match([term]),)).fetchone()[0] <= max_count
+            ]
+            match = _match(distinctive or terms)
+            total = self._conn.execute(count_query, (match,)).fetchone()[0]
+            rows = self._conn.execute(
+                f"""
+                SELECT n.name, -page.rank, e.docstring, e.formatted
+                FROM (
+                    SELECT rowid, bm25(search, {weights}) AS rank FROM search WHERE search MATCH ?
+                    ORDER BY rank, rowid LIMIT ? OFFSET ?
+                ) AS page
+                JOIN search_names n ON n.id = page.rowid JOIN entries e ON e.name = n.name
+                ORDER BY page.rank, page.rowid
+                """,
+                (match, limit, offset),
+            ).fetchall()
+        return total, [
+            {"name": name, "score": round(score, 4), "summary": _summary(docstring, formatted)}
+            for name, score, docstring, formatted in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_stores: dict[str, ReferenceStore] = {}
+_stores_lock = threading.Lock()
+
+
+def is_reference_index_stale(version: str) -> bool:
+    """Whether the index of the version is missing, unreadable, of an older format, or older than its JSON dumps."""
+    index_path = INDEXED_PENNYLANE_DIR / f"{version}.sqlite"
+    if not index_path.exists():
+        return True
+    try:
+        conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return True
+    if row is None or row[0] != INDEX_FORMAT:
+        return True
+    index_mtime = index_path.stat().st_mtime
+    for source_dir in (RAW_PENNYLANE_JSON_DIR, FORMATTED_PENNYLANE_JSON_DIR):
+        source_path = source_dir / f"{version}.json"
+        if source_path.exists() and source_path.stat().st_mtime > index_mtime:
+            return True
+    return False
+
+
+def get_reference_store(version: str) -> ReferenceStore:
+    """Return the shared store of the version, building its index from the JSON dumps if missing or outdated.
+
+    Raises:
+        FileNotFoundError: If neither the index nor the raw JSON dump of the version exists.
+    """
+    with _stores_lock:
+        store = _stores.get(version)
+        if store is not None:
+            return store
+
+        index_path = INDEXED_PENNYLANE_DIR / f"{version}.sqlite"
+        raw_path = RAW_PENNYLANE_JSON_DIR / f"{version}.json"
+        if is_reference_index_stale(version):
+            if raw_path.exists():
+                build_reference_index(
+                    version, RAW_PENNYLANE_JSON_DIR, FORMATTED_PENNYLANE_JSON_DIR, INDEXED_PENNYLANE_DIR
+                )
+            elif not index_path.exists():
+                raise FileNotFoundError(f"Reference file not found: {raw_path}")
+
+        store = ReferenceStore(index_path)
+        _stores[version] = store
+        return store
+
+
+def close_reference_stores() -> None:
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
@@ -1,47 +1,70 @@
-import json
-import os
-from typing import Optional
+import time
+from typing import Optional, Sequence
 
-from src.constants import RAW_PENNYLANE_JSON_DIR
-from src.tools.common import get_latest_version
+from src.constants import REFERENCE_MAX_BYTES
+from src.metrics import record_stage
+from src.tools.bundle import get_reference_bundle
+from src.tools.common import resolve_version
+from src.tools.reference_sections import normalize_sections, parse_cursor, render_reference
+from src.tools.reference_store import get_reference_store
 
 
-def request_pennylane_reference(method_name: str, version: Optional[str] = None) -> str:
+def request_pennylane_reference(
+    method_name: str,
+    version: Optional[str] = None,
+    sections: Optional[Sequence[str]] = None,
+    max_bytes: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> str:
     """Request reference documentation for a specific method in a specific version of the PennyLane library.
     The PennyLane library is a Python library for quantum computing.
 
     Args:
         method_name (str): The name of the method to request reference documentation.
         version (Optional[str]): The version of the PennyLane library to use.
+        sections (Optional[Sequence[str]]): The sections to return among "signature", "description", "args",
+            "docstring" and "source", by default the signature, the docstring and the source code.
+        max_bytes (Optional[int]): The maximum size of the documentation in UTF-8 bytes, 0 for no limit. Long
+            sections are truncated between precomputed slices. Defaults to `REFERENCE_MAX_BYTES`, no limit unless
+            set.
+        cursor (Optional[str]): The cursor given at the end of a truncated documentation, to get the rest of it.
+            The other arguments must be the same as for the truncated documentation.
 
     Returns:
         str: The reference documentation for the specified PennyLane method.
-    """
-    if version is None:
-        version = get_latest_version()
-
-    version = f"v{version}" if not version.startswith("v") else version
 
-    reference_path = RAW_PENNYLANE_JSON_DIR / f"{version}.json"
-    if not os.path.exists(reference_path):
-        raise FileNotFoundError(f"Reference file not found: {reference_path}")
-    with open(reference_path) as f:
-        reference = json.load(f)
+    Raises:
+        ValueError: If the method is not found, or if a section, the budget or the cursor is invalid.
+    """
+    version = resolve_version(version, "raw")
+    sections = normalize_sections(sections)
+    max_bytes = REFERENCE_MAX_BYTES if max_bytes is None else max_bytes
+    if max_bytes < 0:
+        raise ValueError(f"The budget must not be negative, got {max_bytes}")
+    if cursor:
+        parse_cursor(cursor, sections)
+    # the description and the args are read from the formatted entry
+    needs_formatted = "description" in sections or "args" in sections
 
-    if method_name not in reference:
-        raise ValueError(f"Method '{method_name}' not found in reference: {reference_path}")
+    start = time.perf_counter()
+    bundle = get_reference_bundle()
+    formatted = None
+    if bundle is not None and bundle.versions.get(version, {}).get("raw"):
+        start = record_stage("request_reference", "reference_load", start)
+        entry = bundle.raw_entry(version, method_name, slices=True)
+        reference_path = bundle.path
+        if needs_formatted:
+            reference = bundle.formatted(version)
+            formatted = reference.get(method_name) if reference is not None else None
     else:
-        reference_doc = f"""
-        # {method_name}
+        store = get_reference_store(version)
+        start = record_stage("request_reference", "reference_load", start)
+        entry = store.get_raw(method_name, slices=True)
+        reference_path = store.path
+        if needs_formatted:
+            formatted = store.get_formatted(method_name)
+    record_stage("request_reference", "lookup", start)
 
-        # Signature
-        {reference[method_name]["signature"]}
-
-        # Docstring
-        {reference[method_name]["docstring"]}
-
-        # Source Code
-        {reference[method_name]["source"]}
-        """
-
-    return reference_doc
+    if entry is None:
+        raise ValueError(f"Method '{method_name}' not found in reference: {reference_path}")
+    return render_reference(method_name, entry, formatted, sections, max_bytes, cursor)
@@ -0,0 +1,142 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+from src.constants import RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+from src.tools.limits import LimitExceededError, limit_exceeded_result, run_with_deadline
+from src.tools.static_validation import (
+    _resolve_version,
+    get_reference_fingerprint,
+    validate_pennylane_code_statically,
+)
+
+T = TypeVar("T")
+
+
+class ResultCache(Generic[T]):
+    """Thread-safe LRU cache of computed results with a TTL and single-flight coalescing.
+
+    When several threads ask for the same missing key at the same time, only the first one computes the
+    result and the others wait for it. Values are deep-copied on the way out, so callers may modify them.
+
+    Args:
+        max_entries (int): The maximum number of results kept before the least recently used is evicted.
+        ttl (float): The number of seconds a result stays valid.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self._expirations += 1
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                owner = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self._misses += 1
+                owner = True
+
+        if not owner:
+            return copy.deepcopy(future.result())
+
+        try:
+            value = compute()
+        except BaseException as e:
+            # errors are not cached, the waiting callers get the same error
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if self.max_entries > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        future.set_result(value)
+        return copy.deepcopy(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._coalesced = 0
+            self._evictions = 0
+            self._expirations = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+def normalize_code(code: str) -> str:
+    """Normalize line endings, so that the same code sent from different platforms shares a cache entry."""
+    return code.replace("\r\n", "\n").replace("\r", "\n")
+
+
+RESULT_CACHE: ResultCache[dict[str, bool | list[str]]] = ResultCache(
+    max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL
+)
+
+
+def validation_cache_key(code: str, version: str) -> tuple[str, str, Optional[tuple[int, int]]]:
+    # (hash of the normalized code, resolved version, fingerprint of the reference data)
+    code_hash = hashlib.sha256(code.encode("utf-8", "surrogatepass")).hexdigest()
+    return code_hash, version, get_reference_fingerprint(version)
+
+
+def validate_pennylane_code_cached(code: str, version: Optional[str] = None) -> dict[str, bool | list[str]]:
+    """Same as `validate_pennylane_code_statically`, served from `RESULT_CACHE` when the same code was already
+    validated against the same version and reference data.
+
+    Long submissions are validated in a worker process that is killed after `VALIDATION_TIMEOUT` seconds, they
+    then get a "limit exceeded" result.
+    """
+    version = _resolve_version(version)
+    code = normalize_code(code)
+    key = validation_cache_key(code, version)
+    try:
+        return RESULT_CACHE.get_or_compute(
+            key, lambda: run_with_deadline(validate_pennylane_code_statically, code, version)
+        )
+    except LimitExceededError as e:
+        # a validation that ran out of time is not cached, it may complete on a less loaded server
+        return limit_exceeded_result(e)
@@ -0,0 +1,51 @@
+import time
+from typing import Any, Optional
+
+from src.constants import SEARCH_MAX_PAGE_SIZE
+from src.metrics import record_stage
+from src.tools.common import resolve_version
+from src.tools.reference_store import get_reference_store
+
+
+def search_pennylane_reference(
+    query: str, version: Optional[str] = None, offset: int = 0, limit: int = 10
+) -> dict[str, Any]:
+    """Search the reference documentation of a version of the PennyLane library by keywords.
+
+    The methods matching any word of the query are ranked by BM25 over their names, formatted descriptions and
+    docstrings, using the full-text index of the SQLite reference index of the version.
+
+    Args:
+        query (str): Free text, ex: "gradient of an expectation value".
+        version (Optional[str]): The version of the PennyLane library to use.
+        offset (int): The number of best results skipped, ex: the `next_offset` of the previous page.
+        limit (int): The maximum number of results returned, at most `SEARCH_MAX_PAGE_SIZE`.
+
+    Returns:
+        dict[str, Any]:
+            - version: The version searched.
+            - total: The number of matching methods.
+            - results: The name, score (higher is better) and summary of the methods of the page, best first.
+            - next_offset: The offset of the next page, or None on the last page.
+
+    Raises:
+        ValueError: If the query has no words, or if the offset or the limit is out of range.
+    """
+    if offset < 0:
+        raise ValueError(f"The offset must not be negative, got {offset}")
+    if not 1 <= limit <= SEARCH_MAX_PAGE_SIZE:
+        raise ValueError(f"The limit must be between 1 and {SEARCH_MAX_PAGE_SIZE}, got {limit}")
+    version = resolve_version(version, "raw")
+    start = time.perf_counter()
+    store = get_reference_store(version)
+    start = record_stage("search_reference", "reference_load", start)
+    total, results = store.search(query, offset, limit)
+    record_stage("search_reference", "search", start)
+
+    next_offset = offset + len(results)
+    return {
+        "version": version,
+        "total": total,
+        "results": results,
+        "next_offset": next_offset if next_offset < total else None,
+    }
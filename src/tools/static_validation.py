@@ -1,14 +1,42 @@
 import ast
 import json
-import os
 import py_compile
 import re
-from typing import Optional, cast
-
-from src.constants import FORMATTED_PENNYLANE_JSON_DIR
-from src.tools.common import get_latest_version
-
-TMP_CODE_PATH = "tmp_code.py"
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Mapping, Optional, cast
+
+from src.constants import FORMATTED_PENNYLANE_JSON_DIR, REFERENCE_CACHE_CHECK_INTERVAL, REFERENCE_CACHE_SIZE
+from src.metrics import VALIDATED_CALLS, VALIDATION_ERRORS, record_stage
+from src.tools import limits
+from src.tools.arg_validator import ArgValidators
+from src.tools.bundle import get_reference_bundle, get_reference_bundle_fingerprint
+from src.tools.cache import DerivedCache, FileCache
+from src.tools.common import resolve_version
+from src.tools.limits import LimitExceededError, check_call_count, check_code_size, limit_exceeded_result
+from src.tools.suggestions import SuggestionIndex, did_you_mean
+from src.tools.symbols import (
+    DottedNameTrie,
+    SymbolTable,
+    get_dotted_parts,
+    is_top_level_name,
+    resolve_reference_name,
+)
+
+# file name reported in compile errors, the code itself is compiled in memory and never written to disk
+COMPILE_FILENAME = "tmp_code.py"
+
+# process-wide cache of formatted reference docs, keyed by version
+REFERENCE_CACHE: FileCache[dict] = FileCache(
+    max_entries=REFERENCE_CACHE_SIZE, check_interval=REFERENCE_CACHE_CHECK_INTERVAL
+)
+# dotted name tries of the cached references, rebuilt when a reference is reloaded
+_SYMBOL_TRIES: DerivedCache[DottedNameTrie] = DerivedCache()
+# argument validators of the cached references, compiled once per method and reference load
+_ARG_VALIDATORS: DerivedCache[ArgValidators] = DerivedCache()
+# method name indexes of the cached references, built on the first unknown method
+_SUGGESTION_INDEXES: DerivedCache[SuggestionIndex] = DerivedCache()
 
 
 def validate_by_ast(code: str) -> dict[str, bool | list[str]]:
@@ -19,173 +47,277 @@ def validate_by_ast(code: str) -> dict[str, bool | list[str]]:
         return {"valid": False, "errors": [f"SyntaxError: {e}"]}
 
 
-def validate_by_py_compile(code: str, tmp_code_path: str = TMP_CODE_PATH) -> dict[str, bool | list[str]]:
+def validate_by_py_compile(code: str, filename: str = COMPILE_FILENAME) -> dict[str, bool | list[str]]:
     try:
-        # write to tmp python file for compile
-        with open(tmp_code_path, "w") as file:
-            file.write(code)
-        py_compile.compile(tmp_code_path, doraise=True)
+        # compile in memory, errors are formatted the same way py_compile.compile() formats them
+        compile(code, filename, "exec", dont_inherit=True)
         return {"valid": True, "errors": []}
-    except py_compile.PyCompileError as e:
-        return {"valid": False, "errors": [f"py_compile: Syntax error: {e}"]}
-    finally:
-        os.remove(tmp_code_path)
+    except Exception as e:
+        error = py_compile.PyCompileError(e.__class__, e, filename)
+        return {"valid": False, "errors": [f"py_compile: Syntax error: {error}"]}
+
+
+@dataclass(frozen=True)
+class PennyLaneCall:
+    """A PennyLane call found in the validated code.
+
+    `name` is the canonical dotted name of the called object after resolving import aliases,
+    ex: `pl.CNOT(...)` after `import pennylane as pl` -> "qml.CNOT".
+    `explicit` is False for calls that only resolve to PennyLane through `from pennylane import *`.
+    """
+
+    name: str
+    node: ast.Call
+    lineno: int
+    col_offset: int
+    explicit: bool = True
+
+
+class _PennyLaneCallCollector(ast.NodeVisitor):
+    # collects imports and dotted calls in one walk, calls are resolved once the whole module has been seen
+    def __init__(self, max_depth: int) -> None:
+        self.symbols = SymbolTable()
+        self.dotted_calls: list[tuple[list[str], ast.Call]] = []
+        self.imports: list[ast.Import | ast.ImportFrom] = []
+        self.max_depth = max_depth
+        self.depth = 0
+
+    def generic_visit(self, node: ast.AST) -> None:
+        # same as ast.NodeVisitor.generic_visit, stops before the walk overflows the recursion limit
+        self.depth += 1
+        if self.depth > self.max_depth:
+            raise LimitExceededError("max_depth", self.max_depth)
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+        self.depth -= 1
+
+    def visit_Import(self, node: ast.Import) -> None:
+        self.symbols.add_import(node)
+        self.imports.append(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self.symbols.add_import_from(node)
+        self.imports.append(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        parts = get_dotted_parts(node.func)
+        if parts is not None:
+            self.dotted_calls.append((parts, node))
+        self.generic_visit(node)
+
+    def resolve_calls(self) -> list[PennyLaneCall]:
+        calls = []
+        for parts, node in self.dotted_calls:
+            resolved = self.symbols.resolve(parts)
+            if resolved is not None:
+                name, explicit = resolved
+                calls.append(PennyLaneCall(name, node, node.lineno, node.col_offset, explicit))
+        return calls
+
+
+def collect_pennylane_calls(tree: ast.AST) -> list[PennyLaneCall]:
+    """Collect every PennyLane call of the tree, including nested ones and calls through import aliases,
+    in source order.
+
+    Raises:
+        LimitExceededError: If the tree is nested deeper than `VALIDATION_MAX_DEPTH`, or has more than
+            `VALIDATION_MAX_CALLS` PennyLane calls.
+    """
+    collector = _PennyLaneCallCollector(limits.VALIDATION_MAX_DEPTH)
+    collector.visit(tree)
+    calls = collector.resolve_calls()
+    check_call_count(len(calls))
+    return sorted(calls, key=lambda call: (call.lineno, call.col_offset))
+
+
+def parse_code(code: str) -> ast.Module:
+    """Parse the code, within the size and depth limits.
+
+    Raises:
+        SyntaxError: If the code is not valid Python.
+        LimitExceededError: If the code is too large, or too deeply nested for the parser.
+    """
+    check_code_size(code)
+    try:
+        return ast.parse(code)
+    except (RecursionError, MemoryError):
+        # ex: a chain of thousands of operators, the parser builds the tree recursively
+        raise LimitExceededError("max_depth", limits.VALIDATION_MAX_DEPTH)
+
+
+# a source line the way the parser splits lines, with its line ending
+_SOURCE_LINE = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+$")
+
+
+def _get_source_segments(code: str, nodes: list[ast.expr]) -> list[str]:
+    # same as ast.get_source_segment(), which splits the whole source again for every node
+    lines = [line.encode() for line in _SOURCE_LINE.findall(code)]
+    segments = []
+    for node in nodes:
+        first, last = node.lineno - 1, cast(int, node.end_lineno) - 1
+        if first == last:
+            segment = lines[first][node.col_offset : node.end_col_offset]
+        else:
+            middle = b"".join(lines[first + 1 : last])
+            segment = lines[first][node.col_offset :] + middle + lines[last][: node.end_col_offset]
+        segments.append(segment.decode())
+    return segments
 
 
 def _extract_pennylane_methods(code: str) -> list[str]:
-    functions = []
-    start_idx = code.find("qml.")  # Start by looking for "qml." pattern
-    while start_idx != -1:
-        # Track the position and initialize a stack to manage parentheses
-        end_idx = start_idx
-        stack = []
-
-        # Process each character after the "qml." pattern to balance parentheses
-        while end_idx < len(code):
-            char = code[end_idx]
-            if char == "(":
-                stack.append(char)  # Push opening parenthesis
-            elif char == ")":
-                if stack:
-                    stack.pop()  # Pop closing parenthesis
-                else:
-                    break
-                if not stack:  # If stack is empty, parentheses are balanced
-                    functions.append(code[start_idx : end_idx + 1])
-                    break
-            end_idx += 1
-
-        # Continue searching for the next "qml." pattern
-        start_idx = code.find("qml.", end_idx)
-
-    return list(set(functions))
-
-
-def get_reference(version: str) -> dict[str, dict[str, list[dict[str, str]]]]:
-    reference_path = FORMATTED_PENNYLANE_JSON_DIR / f"{version}.json"
-    if not os.path.exists(reference_path):
-        raise FileNotFoundError(f"Reference file not found: {reference_path}")
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    return _get_source_segments(code, [call.node for call in collect_pennylane_calls(tree)])
+
+
+def _load_reference_file(reference_path: Path) -> dict[str, dict[str, list[dict[str, str]]]]:
     with open(reference_path) as f:
         return json.load(f)
 
 
-def _extract_method_name(method_str: str) -> str:
-    tree = ast.parse(method_str)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Call):
-            if isinstance(node.func, ast.Attribute):
-                return f"{node.func.value.id}.{node.func.attr}"  # type: ignore
+def get_reference(version: str) -> Mapping[str, dict[str, Any]]:
+    """Return the formatted reference of the version.
 
-    return ""
+    The reference is served from the precompiled bundle when it has the version, otherwise the JSON file is
+    parsed once and then served from `REFERENCE_CACHE`. The returned mapping is shared between callers and
+    must not be modified.
+    """
+    bundle = get_reference_bundle()
+    reference = bundle.formatted(version) if bundle is not None else None
+    if reference is not None:
+        return reference
+    reference_path = FORMATTED_PENNYLANE_JSON_DIR / f"{version}.json"
+    return REFERENCE_CACHE.get(version, reference_path, _load_reference_file)
 
 
-def _is_optional_type(type_str: str) -> bool:
-    type_str = type_str.replace(" ", "")
+def get_reference_fingerprint(version: str) -> Optional[tuple[int, int]]:
+    """Return the mtime and size of the file the formatted reference of the version is served from,
+    changes when the file is updated."""
+    bundle = get_reference_bundle()
+    if bundle is not None and bundle.formatted(version) is not None:
+        return get_reference_bundle_fingerprint()
+    get_reference(version)
+    return REFERENCE_CACHE.fingerprint(version)
 
-    # pattern1: Optional[<type>]
-    if re.match(r"^Optional\[[^\[\]]+\]$", type_str):
-        return True
 
-    # pattern2: Union[..., None] or Union[None, ...]
-    if re.match(r"^Union\[.*None.*\]$", type_str):
-        return True
+def get_symbol_trie(version: str, reference: Mapping[str, Any]) -> DottedNameTrie:
+    return _SYMBOL_TRIES.get(version, reference, DottedNameTrie)
 
-    # pattern3: <type> | None
-    if "|" in type_str:
-        parts = type_str.split("|")
-        if "None" in parts:
-            return True
 
-    # patter4: <type> or None
-    if "or" in type_str:
-        parts = type_str.split("or")
-        if "None" in parts:
-            return True
+def get_arg_validators(version: str, reference: Mapping[str, Any]) -> ArgValidators:
+    return _ARG_VALIDATORS.get(version, reference, ArgValidators)
 
-    return False
 
+def get_suggestion_index(version: str, reference: Mapping[str, Any]) -> SuggestionIndex:
+    return _SUGGESTION_INDEXES.get(version, reference, SuggestionIndex)
 
-def _validate_args(method: str, expected_args: list[dict[str, str]]) -> list[str]:
-    errors = []
-    expected_args_names = [arg["name"] for arg in expected_args]
-    required_args = [arg for arg in expected_args if bool(arg["required"])]
-    tree = ast.parse(method)
-
-    for node in ast.walk(tree):
-        # check only qml.XXX method call
-        if (
-            isinstance(node, ast.Call)
-            and isinstance(node.func, ast.Attribute)
-            and isinstance(node.func.value, ast.Name)
-            and node.func.value.id == "qml"
-        ):
-            provided_args = {}
-
-            # handle positional arguments
-            for i, arg in enumerate(node.args):
-                if i < len(expected_args):
-                    provided_args[expected_args[i]["name"]] = arg
-
-            # handle keyword arguments
-            for keyword in node.keywords:
-                provided_args[keyword.arg] = keyword.value
-
-            # check unexpected arguments
-            for arg in provided_args.keys():
-                if arg not in expected_args_names:
-                    errors.append(f"Unexpected argument '{arg}'")
-
-            # check arguments existence and types
-            for expected_arg in required_args:
-                arg_name = expected_arg["name"]
-                arg_type = expected_arg["type"]
-                arg_description = expected_arg["description"]
-                if arg_name not in provided_args:
-                    errors.append(
-                        f"Missing required argument '{arg_name}'.\n{arg_name} ({arg_type}): {arg_description}"
-                    )
-
-            # only one method call is allowed
-            break
 
-    return errors
+def _resolve_version(version: Optional[str]) -> str:
+    return resolve_version(version, "formatted")
 
 
-def validate_pennylane_methods(code: str, version: Optional[str] = None) -> dict[str, bool | list[str]]:
-    if version is None:
-        version = get_latest_version()
-
-    version = f"v{version}" if not version.startswith("v") else version
+def _check_calls(calls: list[PennyLaneCall], version: str, op: str) -> list[tuple[PennyLaneCall, str]]:
+    # the calls with errors and their joined error messages, in the order of `calls`
+    start = time.perf_counter()
     reference = get_reference(version)
+    trie = get_symbol_trie(version, reference)
+    validators = get_arg_validators(version, reference)
+    start = record_stage(op, "reference_load", start)
 
     errors = []
-    pennylane_methods = _extract_pennylane_methods(code)
-    for method in pennylane_methods:
+    for call in calls:
         method_errors = []
-        method_name = _extract_method_name(method)
-        signature = reference.get(method_name)
-        if signature is None:
-            method_errors.append(f"Method '{method_name}' not found in PennyLane version '{version}'")
+        reference_name = resolve_reference_name(trie, call.name)
+        validator = validators.get(reference_name) if reference_name is not None else None
+        if validator is None:
+            # only explicit top-level names are known to be missing, members of submodules
+            # the reference does not describe and names from star imports are skipped
+            if not (call.explicit and is_top_level_name(call.name)):
+                continue
+            suggestions = get_suggestion_index(version, reference).suggest(call.name)
+            method_errors.append(
+                f"Method '{call.name}' not found in PennyLane version '{version}'{did_you_mean(suggestions)}"
+            )
+            VALIDATION_ERRORS.inc("method_not_found")
         else:
-            expected_args = signature["args"]
-            args_erros = _validate_args(method, expected_args)
-            method_errors.extend(args_erros)
+            method_errors.extend(validator.check(call.node))
 
         if method_errors:
-            method_errors_str = ", ".join(method_errors)
-            errors.append(f"Method '{method_name}': {method_errors_str}")
+            errors.append((call, ", ".join(method_errors)))
+
+    record_stage(op, "arg_check", start)
+    VALIDATED_CALLS.observe(len(calls), op)
+    return errors
 
+
+def format_call_error(name: str, lineno: int, col_offset: int, message: str) -> str:
+    return f"Method '{name}' (line {lineno}, col {col_offset}): {message}"
+
+
+def _validate_calls(calls: list[PennyLaneCall], version: str, op: str = "validate") -> list[str]:
+    return [
+        format_call_error(call.name, call.lineno, call.col_offset, message)
+        for call, message in _check_calls(calls, version, op)
+    ]
+
+
+def validate_pennylane_methods(code: str, version: Optional[str] = None) -> dict[str, bool | list[str]]:
+    version = _resolve_version(version)
+    try:
+        tree = parse_code(code)
+        calls = collect_pennylane_calls(tree)
+    except SyntaxError as e:
+        return {"valid": False, "errors": [f"SyntaxError: {e}"]}
+    except LimitExceededError as e:
+        return limit_exceeded_result(e)
+
+    errors = _validate_calls(calls, version)
     return {"valid": len(errors) == 0, "errors": errors}
 
 
 def validate_pennylane_code_statically(code: str, version: Optional[str] = None) -> dict[str, bool | list[str]]:
-    ast_errors = validate_by_ast(code)
-    py_compile_errors = validate_by_py_compile(code)
-    pennylane_errors = validate_pennylane_methods(code, version)
-
-    return {
-        "valid": ast_errors["valid"] and py_compile_errors["valid"] and pennylane_errors["valid"],
-        "errors": cast(list[str], ast_errors["errors"])
-        + cast(list[str], py_compile_errors["errors"])
-        + cast(list[str], pennylane_errors["errors"]),
-    }
+    """Validate the code in a single pass.
+
+    The code is parsed once. The same tree is compiled to catch the errors only the compiler reports, and walked
+    once to collect every `qml.*` call, which are then validated against the reference in source order.
+    Code that exceeds the size, depth or call count limits gets a "limit exceeded" result instead.
+    """
+    version = _resolve_version(version)
+
+    start = time.perf_counter()
+    try:
+        tree = parse_code(code)
+    except LimitExceededError as e:
+        VALIDATION_ERRORS.inc("limit_exceeded")
+        return limit_exceeded_result(e)
+    except SyntaxError as e:
+        py_compile_errors = cast(list[str], validate_by_py_compile(code)["errors"])
+        record_stage("validate", "ast", start)
+        VALIDATION_ERRORS.inc("syntax")
+        return {"valid": False, "errors": [f"SyntaxError: {e}"] + py_compile_errors}
+    start = record_stage("validate", "ast", start)
+
+    errors: list[str] = []
+    try:
+        compile(tree, COMPILE_FILENAME, "exec", dont_inherit=True)
+    except Exception:
+        # compile the source again so that the error shows the offending line like py_compile does
+        errors.extend(cast(list[str], validate_by_py_compile(code)["errors"]))
+        VALIDATION_ERRORS.inc("compile")
+    start = record_stage("validate", "py_compile", start)
+
+    try:
+        calls = collect_pennylane_calls(tree)
+    except LimitExceededError as e:
+        VALIDATION_ERRORS.inc("limit_exceeded")
+        return limit_exceeded_result(e)
+    record_stage("validate", "extraction", start)
+    errors.extend(_validate_calls(calls, version))
+    return {"valid": len(errors) == 0, "errors": errors}
@@ -0,0 +1,149 @@
+import heapq
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+from typing import Iterable
+
+from src.tools.symbols import CANONICAL_ROOT
+
+# number of suggestions given with an error
+MAX_SUGGESTIONS = 3
+# maximum number of names whose edit distance is computed, the ones sharing the most trigrams with the unknown name
+_CANDIDATES = 24
+# trigrams of more than this fraction of the names (ex: " op" in "qml.Op1", "qml.Op2", ...) tell few names apart,
+# they are only counted when the unknown name shares no other trigram with the names
+_COMMON_TRIGRAM_FRACTION = 0.1
+_ROOT_PREFIX = CANONICAL_ROOT + "."
+
+
+def max_edits(name: str) -> int:
+    """The number of edits a suggestion may be away from a name: 1 for short names, up to 3 for long ones."""
+    return max(1, min(3, len(name) // 4 + 1))
+
+
+def _match_masks(key: str) -> dict[str, int]:
+    # character -> bitmask of its positions in the key
+    masks: dict[str, int] = {}
+    for i, char in enumerate(key):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+def _distance(masks: dict[str, int], length: int, other: str) -> int:
+    # bit-parallel Levenshtein distance (Myers, 1999) between a key of `length` characters and another string:
+    # the column of the distance matrix is kept as bitmasks of its vertical +1/-1 differences
+    if length == 0:
+        return len(other)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    positive, negative = full, 0
+    distance = length
+    for char in other:
+        match = masks.get(char, 0)
+        x_vertical = match | negative
+        x_horizontal = (((match & positive) + positive) ^ positive) | match
+        h_positive = negative | ~(x_horizontal | positive) & full
+        h_negative = positive & x_horizontal
+        if h_positive & last:
+            distance += 1
+        elif h_negative & last:
+            distance -= 1
+        h_positive = (h_positive << 1 | 1) & full
+        h_negative = (h_negative << 1) & full
+        positive = h_negative | ~(x_vertical | h_positive) & full
+        negative = h_positive & x_vertical
+    return distance
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Return the number of insertions, deletions and substitutions of characters between the two strings."""
+    return _distance(_match_masks(a), len(a), b)
+
+
+def closest_names(name: str, candidates: Iterable[str], limit: int = MAX_SUGGESTIONS) -> list[str]:
+    """Return the candidates within `max_edits` of the name, closest first, ignoring case.
+
+    Compares the name with every candidate, for short lists such as the arguments of a method.
+    """
+    key = name.lower()
+    max_distance = max_edits(key)
+    masks = _match_masks(key)
+    scored = []
+    for candidate in candidates:
+        if abs(len(candidate) - len(key)) > max_distance:
+            continue
+        distance = _distance(masks, len(key), candidate.lower())
+        if distance <= max_distance:
+            scored.append((distance, candidate))
+    return [candidate for _, candidate in sorted(scored)[:limit]]
+
+
+def _key(name: str) -> str:
+    # the common root does not tell names apart, ex: "qml.CNOT" -> "cnot"
+    return (name[len(_ROOT_PREFIX) :] if name.startswith(_ROOT_PREFIX) else name).lower()
+
+
+def _trigrams(key: str) -> set[str]:
+    # padded, so that the first and last characters count as much as the others
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestionIndex:
+    """Trigram index of the method names of a reference, to suggest the names closest to an unknown one.
+
+    The names sharing the most trigrams with the unknown name are ranked by edit distance, so that a lookup
+    only computes a few distances however many names the reference has. Names sharing no trigram with it, other
+    than the trigrams common to many names, are not suggested, ex: "qml.CZ" for "qml.RZ".
+
+    Args:
+        names (Iterable[str]): The method names, ex: the keys of a formatted reference.
+    """
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self._names = sorted(names)
+        self._keys = [_key(name) for name in self._names]
+        # (trigram, length of the key) -> names, a lookup only reads the lengths within `max_edits` of the name
+        postings: dict[tuple[str, int], list[int]] = {}
+        frequencies: Counter[str] = Counter()
+        for i, key in enumerate(self._keys):
+            trigrams = _trigrams(key)
+            frequencies.update(trigrams)
+            for trigram in trigrams:
+                postings.setdefault((trigram, len(key)), []).append(i)
+        self._postings = postings
+        max_frequency = len(self._names) * _COMMON_TRIGRAM_FRACTION
+        self._common = frozenset(trigram for trigram, count in frequencies.items() if count > max_frequency)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _count_shared(self, trigrams: set[str], length: int, max_distance: int) -> Counter[int]:
+        # name -> number of the trigrams it shares, among the names whose length is within `max_distance`
+        postings = self._postings
+        lengths = range(max(0, length - max_distance), length + max_distance + 1)
+        return Counter(chain.from_iterable(postings.get((trigram, n), ()) for trigram in trigrams for n in lengths))
+
+    def suggest(self, name: str, limit: int = MAX_SUGGESTIONS) -> list[str]:
+        """Return up to `limit` names within `max_edits` of the name, closest first."""
+        key = _key(name)
+        max_distance = max_edits(key)
+        trigrams = _trigrams(key)
+        shared = self._count_shared(trigrams - self._common, len(key), max_distance)
+        if not shared:
+            shared = self._count_shared(trigrams, len(key), max_distance)
+        candidates = heapq.nlargest(_CANDIDATES, shared.items(), key=itemgetter(1))
+        masks = _match_masks(key)
+        scored = []
+        for i, count in candidates:
+            distance = _distance(masks, len(key), self._keys[i])
+            if distance <= max_distance:
+                scored.append((distance, -count, self._names[i]))
+        return [name for _, _, name in sorted(scored)[:limit]]
+
+
+def did_you_mean(suggestions: list[str]) -> str:
+    """The hint appended to an error, ex: ". Did you mean 'qml.CNOT'?", empty without suggestions."""
+    if not suggestions:
+        return ""
+    return ". Did you mean " + ", ".join(f"'{suggestion}'" for suggestion in suggestions) + "?"
@@ -0,0 +1,151 @@
+import ast
+from typing import Iterable, Optional, Sequence
+
+PENNYLANE_MODULE = "pennylane"
+# root of the canonical names used as keys of the reference docs
+CANONICAL_ROOT = "qml"
+
+# Submodules whose public classes and functions are re-exported at the top level of PennyLane,
+# so that `qml.ops.CNOT` is the same object as `qml.CNOT`.
+# Members of other submodules (ex: `qml.math.sum`) are not described by the reference and are not validated.
+REEXPORTING_MODULES = frozenset({"qml.ops", "qml.templates", "qml.measurements", "qml.transforms"})
+
+
+class DottedNameTrie:
+    """Prefix trie over the segments of dotted names, ex: "qml.ops.CNOT" -> ("qml", "ops", "CNOT")."""
+
+    _TERMINAL = ""
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self._root: dict = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        node = self._root
+        for part in name.split("."):
+            node = node.setdefault(part, {})
+        node[self._TERMINAL] = True
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        return self.longest_prefix(name.split(".")) == name.count(".") + 1
+
+    def longest_prefix(self, parts: Sequence[str]) -> int:
+        """Return the number of leading parts forming the longest known name, or 0 if no prefix is known."""
+        node = self._root
+        longest = 0
+        for i, part in enumerate(parts):
+            child = node.get(part)
+            if child is None:
+                break
+            node = child
+            if self._TERMINAL in node:
+                longest = i + 1
+        return longest
+
+
+def resolve_reference_name(trie: DottedNameTrie, name: str) -> Optional[str]:
+    """Resolve a canonical dotted name to the reference entry describing it.
+
+    Returns:
+        Optional[str]: The name of the reference entry, or None if the reference does not describe the name.
+            ex: "qml.CNOT" -> "qml.CNOT", "qml.ops.CNOT" -> "qml.CNOT", "qml.math.sum" -> None
+    """
+    parts = name.split(".")
+    if trie.longest_prefix(parts) == len(parts):
+        return name
+
+    module, _, attr = name.rpartition(".")
+    top_level_name = f"{CANONICAL_ROOT}.{attr}"
+    if any(module == m or module.startswith(m + ".") for m in REEXPORTING_MODULES) and top_level_name in trie:
+        return top_level_name
+
+    return None
+
+
+def is_top_level_name(name: str) -> bool:
+    """Whether the name is a member of the top-level module, the only ones known to be missing when the
+    reference does not describe them. ex: "qml.RX" -> True, "qml.ops.CNOT" / "qml.math.sum" -> False"""
+    return name.startswith(CANONICAL_ROOT + ".") and name.count(".") == 1
+
+
+def _canonical_module(module: str) -> Optional[str]:
+    # "pennylane" -> "qml", "pennylane.ops" -> "qml.ops", other modules -> None
+    if module == PENNYLANE_MODULE:
+        return CANONICAL_ROOT
+    if module.startswith(PENNYLANE_MODULE + "."):
+        return CANONICAL_ROOT + module[len(PENNYLANE_MODULE) :]
+    return None
+
+
+class SymbolTable:
+    """Maps local names bound by imports to canonical PennyLane names.
+
+    `qml` is bound to PennyLane by default, so that snippets without imports are still validated.
+    Scopes are not tracked, an import anywhere in the module binds the name for the whole module.
+    """
+
+    def __init__(self) -> None:
+        self.aliases: dict[str, str] = {CANONICAL_ROOT: CANONICAL_ROOT}
+        self.star_import = False
+
+    def add_import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            canonical = _canonical_module(alias.name)
+            if alias.asname is not None:
+                local_name = alias.asname
+            else:
+                # `import pennylane.ops` binds `pennylane`
+                local_name = alias.name.split(".")[0]
+                canonical = _canonical_module(local_name)
+
+            if canonical is None:
+                self.aliases.pop(local_name, None)
+            else:
+                self.aliases[local_name] = canonical
+
+    def add_import_from(self, node: ast.ImportFrom) -> None:
+        canonical_module = _canonical_module(node.module or "") if node.level == 0 else None
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_import = self.star_import or canonical_module is not None
+                continue
+
+            local_name = alias.asname or alias.name
+            if canonical_module is None:
+                self.aliases.pop(local_name, None)
+            else:
+                self.aliases[local_name] = f"{canonical_module}.{alias.name}"
+
+    def resolve(self, parts: Sequence[str]) -> Optional[tuple[str, bool]]:
+        """Resolve the parts of a dotted name used in the code to a canonical name.
+
+        Returns:
+            Optional[tuple[str, bool]]: The canonical name and whether it was bound explicitly,
+                or None if the name does not refer to PennyLane. Names that are only reachable through
+                `from pennylane import *` are not explicit, since they may as well be local definitions.
+        """
+        canonical_root = self.aliases.get(parts[0])
+        if canonical_root is not None:
+            return ".".join([canonical_root, *parts[1:]]), True
+        if self.star_import:
+            return ".".join([CANONICAL_ROOT, *parts]), False
+        return None
+
+
+def get_dotted_parts(node: ast.expr) -> Optional[list[str]]:
+    """Return the parts of a dotted name expression, ex: `qml.ops.CNOT` -> ["qml", "ops", "CNOT"].
+
+    Returns None if the expression is not a plain dotted name (ex: `f().x`, `a[0].x`).
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    parts.reverse()
+    return parts
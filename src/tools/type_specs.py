@@ -0,0 +1,274 @@
+import ast
+import functools
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, cast
+
+# kinds of the literal values the types are checked against, by type of the constant
+_CONSTANT_KINDS = {
+    bool: "bool",
+    int: "int",
+    float: "float",
+    complex: "complex",
+    str: "str",
+    bytes: "bytes",
+    type(None): "None",
+}
+_CONTAINER_KINDS = {ast.List: "list", ast.Tuple: "tuple", ast.Set: "set", ast.Dict: "dict"}
+_NUMBERS = frozenset({"bool", "int", "float"})
+
+# type name -> literal kinds it accepts. Python accepts a bool for an int and an int for a float or a complex.
+_ACCEPTED_KINDS: dict[str, frozenset[str]] = {
+    "bool": frozenset({"bool"}),
+    "int": frozenset({"bool", "int"}),
+    "float": _NUMBERS,
+    "complex": _NUMBERS | {"complex"},
+    "Number": _NUMBERS | {"complex"},
+    "Real": _NUMBERS,
+    "str": frozenset({"str"}),
+    "bytes": frozenset({"bytes"}),
+    "None": frozenset({"None"}),
+    "list": frozenset({"list"}),
+    "tuple": frozenset({"tuple"}),
+    "set": frozenset({"set"}),
+    "dict": frozenset({"dict"}),
+    "Sequence": frozenset({"list", "tuple", "str", "bytes"}),
+    "Iterable": frozenset({"list", "tuple", "set", "dict", "str", "bytes"}),
+    # no literal is callable
+    "Callable": frozenset(),
+}
+
+# spellings of the type names, ex: from `typing` or `collections.abc`
+_ALIASES = {
+    "NoneType": "None",
+    "List": "list",
+    "Tuple": "tuple",
+    "Set": "set",
+    "FrozenSet": "set",
+    "frozenset": "set",
+    "Dict": "dict",
+    "Mapping": "dict",
+    "MutableMapping": "dict",
+    "MutableSequence": "Sequence",
+    "Collection": "Iterable",
+    "Iterator": "Iterable",
+    "Integral": "int",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class TypeSpec:
+    """A parsed argument type.
+
+    `name` is a key of `_ACCEPTED_KINDS`, or "any" for the types literal values are not checked against
+    (ex: `Operator`, `Wires`, `np.ndarray`), "union" for the alternatives in `args`, or "literal" for the
+    values in `values`. The `args` of a container are the types of its items: one type for all the items,
+    `(key, value)` for a dict, and one type per item for a tuple unless the last one is `...`.
+
+    `kinds` are the literal kinds accepted at the top level. When `shallow`, there are no items or values to
+    check and a literal has the type if and only if its kind is in `kinds`.
+    """
+
+    name: str
+    args: tuple["TypeSpec", ...] = ()
+    values: tuple = ()
+    kinds: frozenset[str] = field(init=False, compare=False)
+    shallow: bool = field(init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        alternatives = self.args if self.name == "union" else (self,)
+        kinds: frozenset[str] = frozenset()
+        shallow = True
+        for spec in alternatives:
+            kinds |= _ACCEPTED_KINDS.get(spec.name, frozenset())
+            shallow = shallow and spec.name in _ACCEPTED_KINDS and not spec.args
+        object.__setattr__(self, "kinds", kinds)
+        object.__setattr__(self, "shallow", shallow)
+
+    @property
+    def checked(self) -> bool:
+        return self.name != "any"
+
+
+ANY = TypeSpec("any")
+# the `...` of `tuple[int, ...]`
+_ELLIPSIS = TypeSpec("...")
+
+# parsed specs shared across type strings and versions, ex: the `int` of `Optional[int]` and `list[int]`
+_INTERNED: dict[TypeSpec, TypeSpec] = {}
+_intern_lock = threading.Lock()
+
+
+def _intern(spec: TypeSpec) -> TypeSpec:
+    with _intern_lock:
+        return _INTERNED.setdefault(spec, spec)
+
+
+# modules whose names are spelled with their module, ex: "typing.Optional", "collections.abc.Sequence"
+_TYPING_MODULES = frozenset({"typing", "collections", "numbers", "builtins"})
+
+
+def _name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        # other dotted names are classes of other libraries, ex: `np.float64` is not checked as a `float`
+        root = node.value
+        while isinstance(root, ast.Attribute):
+            root = root.value
+        return node.attr if isinstance(root, ast.Name) and root.id in _TYPING_MODULES else None
+    if isinstance(node, ast.Constant) and node.value is None:
+        return "None"
+    return None
+
+
+def _union(alternatives: list[TypeSpec]) -> TypeSpec:
+    flat: list[TypeSpec] = []
+    for spec in alternatives:
+        if not spec.checked:
+            # one alternative accepts anything, so does the union
+            return ANY
+        for alternative in spec.args if spec.name == "union" else (spec,):
+            if alternative not in flat:
+                flat.append(alternative)
+    return flat[0] if len(flat) == 1 else _intern(TypeSpec("union", tuple(flat)))
+
+
+def _subscript_args(node: ast.Subscript) -> list[ast.expr]:
+    return list(node.slice.elts) if isinstance(node.slice, ast.Tuple) else [node.slice]
+
+
+def _build(node: ast.expr) -> TypeSpec:
+    # `int | None`, `int or None`
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _union([_build(node.left), _build(node.right)])
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.Or):
+        return _union([_build(value) for value in node.values])
+
+    if isinstance(node, ast.Subscript):
+        name = _name(node.value)
+        args = _subscript_args(node)
+        if name == "Optional" and len(args) == 1:
+            return _union([_build(args[0]), _intern(TypeSpec("None"))])
+        if name == "Union":
+            return _union([_build(arg) for arg in args])
+        if name == "Literal":
+            if all(isinstance(arg, ast.Constant) for arg in args):
+                return _intern(TypeSpec("literal", values=tuple(cast(ast.Constant, arg).value for arg in args)))
+            return ANY
+        if name == "Annotated":
+            return _build(args[0])
+        name = _ALIASES.get(name or "", name)
+        if name not in _ACCEPTED_KINDS:
+            return ANY
+        if name == "Callable":
+            # the argument and return types of a callable do not apply to its items
+            return _intern(TypeSpec(name))
+        items = tuple(
+            _ELLIPSIS if isinstance(arg, ast.Constant) and arg.value is Ellipsis else _build(arg) for arg in args
+        )
+        if _ELLIPSIS in items and not (name == "tuple" and len(items) == 2 and items[0] is not _ELLIPSIS):
+            # `...` only stands for the remaining items of a tuple
+            return ANY
+        if not any(item.checked for item in items if item is not _ELLIPSIS):
+            # ex: `list[Operator]`, only the container itself is checked
+            items = ()
+        return _intern(TypeSpec(name, items))
+
+    name = _name(node)
+    if name in ("Any", "object"):
+        return ANY
+    name = _ALIASES.get(name or "", name)
+    if name in _ACCEPTED_KINDS:
+        return _intern(TypeSpec(name))
+    # classes of PennyLane or other libraries, forward references, ...
+    return ANY
+
+
+@functools.lru_cache(maxsize=None)
+def parse_type_spec(type_str: str) -> TypeSpec:
+    """Parse a type of the formatted reference, ex: "Optional[int]", "Sequence[int] | Wires", "int or None".
+
+    Each distinct type string is parsed once for all versions. Types that cannot be parsed, and types literal
+    values cannot be checked against, give `ANY`.
+    """
+    type_str = type_str.strip()
+    # "int, optional": the default value is documented by `required`, not by the type
+    if type_str.endswith(", optional"):
+        type_str = type_str[: -len(", optional")]
+    try:
+        return _build(ast.parse(type_str, mode="eval").body)
+    except (SyntaxError, ValueError, RecursionError):
+        return ANY
+
+
+def literal_kind(node: ast.expr) -> Optional[str]:
+    """Return the kind of a literal value, ex: "int" for `-1`, "list" for `[0, x]`, or None if not a literal."""
+    node_type = type(node)
+    if node_type is ast.Constant:
+        return _CONSTANT_KINDS.get(type(cast(ast.Constant, node).value))
+    if node_type is ast.UnaryOp:
+        node = cast(ast.UnaryOp, node)
+        operand = node.operand
+        if isinstance(node.op, (ast.USub, ast.UAdd)) and isinstance(operand, ast.Constant):
+            if type(operand.value) in (int, float, complex):
+                return _CONSTANT_KINDS[type(operand.value)]
+        return None
+    return _CONTAINER_KINDS.get(node_type)
+
+
+def _items_accepted(spec: TypeSpec, kind: str, node: ast.expr) -> bool:
+    if kind == "dict":
+        node = cast(ast.Dict, node)
+        if len(spec.args) != 2:
+            return True
+        key_spec, value_spec = spec.args
+        # `None` keys are the `**` unpacking of another dict
+        return all(
+            key is None or (accepts(key_spec, key) and accepts(value_spec, value))
+            for key, value in zip(node.keys, node.values)
+        )
+    if kind not in ("list", "tuple", "set"):
+        # ex: the characters of a string given for a `Sequence[str]`
+        return True
+    items = cast(ast.List | ast.Tuple | ast.Set, node).elts
+    if spec.name == "tuple" and not (len(spec.args) == 2 and spec.args[1] is _ELLIPSIS):
+        # one type per item, unless some items are unpacked
+        if any(isinstance(item, ast.Starred) for item in items):
+            return True
+        return len(items) == len(spec.args) and all(accepts(s, item) for s, item in zip(spec.args, items))
+    # unpacked items are not literals, they are accepted
+    item_spec = spec.args[0]
+    if not item_spec.shallow:
+        return all(accepts(item_spec, item) for item in items)
+    for item in items:
+        kind = literal_kind(item)
+        if kind is not None and kind not in item_spec.kinds:
+            return False
+    return True
+
+
+def _accepts_kind(spec: TypeSpec, kind: str, node: ast.expr) -> bool:
+    name = spec.name
+    if name == "any":
+        return True
+    if name == "union":
+        return any(_accepts_kind(alternative, kind, node) for alternative in spec.args)
+    if name == "literal":
+        if kind in _CONTAINER_KINDS.values():
+            return False
+        value = ast.literal_eval(node)
+        return any(type(value) is type(expected) and value == expected for expected in spec.values)
+    if kind not in _ACCEPTED_KINDS[name]:
+        return False
+    return not spec.args or _items_accepted(spec, kind, node)
+
+
+def accepts(spec: TypeSpec, node: ast.expr) -> bool:
+    """Whether the value may have the type. Values that are not literals, ex: names or calls, are accepted."""
+    kind = literal_kind(node)
+    if kind is None:
+        return True
+    if spec.shallow:
+        return kind in spec.kinds
+    return _accepts_kind(spec, kind, node)
@@ -0,0 +1,32 @@
+import pytest
+
+from src.constants import SUPPORTED_PENNYLANE_VERSIONS
+from src.metrics import REGISTRY
+from src.tools import bundle, common, compatibility
+from src.tools.common import VersionCatalog
+from src.tools.incremental_validation import SESSIONS
+from src.tools.result_cache import RESULT_CACHE
+from src.tools.static_validation import REFERENCE_CACHE
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(tmp_path, monkeypatch):
+    # the caches are process-wide, do not let results computed against one test's reference leak into another
+    # no bundle unless a test builds one at this path
+    monkeypatch.setattr(bundle, "REFERENCE_BUNDLE_PATH", tmp_path / "reference.bundle")
+    # the compatibility index is built on first use, never next to the real references
+    monkeypatch.setattr(compatibility, "COMPATIBILITY_INDEX_PATH", tmp_path / "compatibility.json")
+    bundle.clear_reference_bundle()
+    REFERENCE_CACHE.clear()
+    RESULT_CACHE.clear()
+    SESSIONS.clear()
+    REGISTRY.clear()
+    common.refresh_version_catalog()
+    yield
+
+
+@pytest.fixture
+def all_versions_available(monkeypatch):
+    """Report every supported version as available, for tests that mock the reference itself."""
+    versions = tuple(SUPPORTED_PENNYLANE_VERSIONS)
+    monkeypatch.setattr(common, "get_version_catalog", lambda: VersionCatalog(raw=versions, formatted=versions))
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+
+from scripts.llm_pipeline import (
+    PipelineConfig,
+    RateLimiter,
+    StubChatModel,
+    checkpoint_path,
+    format_version,
+    format_versions,
+    load_checkpoint,
+)
+
+RAW_REFERENCE = {
+    "qml.RX": {"signature": "(phi, wires, id=None)", "docstring": "X rotation", "source": "class RX: ..."},
+    "qml.CNOT": {"signature": "(wires, *, id: str = None)", "docstring": "CNOT", "source": "class CNOT: ..."},
+    "qml.Hadamard": {"signature": "(wires)", "docstring": "Hadamard", "source": "class Hadamard: ..."},
+}
+CONFIG = PipelineConfig(model_version="gpt-4.1-2025-04-14", concurrency=2, max_retries=2, backoff_base=0.0)
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    (raw_dir / "v0.41.0.json").write_text(json.dumps(RAW_REFERENCE))
+    return raw_dir
+
+
+def test_format_version(raw_dir, tmp_path):
+    formatted_dir = tmp_path / "formatted"
+    model = StubChatModel()
+    report = asyncio.run(format_version(model, "v0.41.0", raw_dir, formatted_dir, CONFIG))
+
+    assert sorted(model.calls) == sorted(RAW_REFERENCE)
+    assert report.formatted == sorted(RAW_REFERENCE)
+    assert report.usage.input_tokens > 0 and report.usage.output_tokens > 0
+    assert report.cost > 0
+
+    formatted = json.loads((formatted_dir / "v0.41.0.json").read_text())
+    assert list(formatted) == list(RAW_REFERENCE)
+    assert formatted["qml.RX"]["args"] == [
+        {"name": "phi", "type": "Any", "required": True, "description": "The phi argument."},
+        {"name": "wires", "type": "Any", "required": True, "description": "The wires argument."},
+        {"name": "id", "type": "Any", "required": False, "description": "The id argument."},
+    ]
+    assert formatted["qml.CNOT"]["args"][1] == {
+        "name": "id",
+        "type": "str",
+        "required": False,
+        "description": "The id argument.",
+    }
+
+
+def test_format_version_retries_and_resumes(raw_dir, tmp_path):
+    formatted_dir = tmp_path / "formatted"
+    # RX fails more often than the retries allow, CNOT succeeds on its second retry
+    model = StubChatModel(failures={"qml.RX": 3, "qml.CNOT": 2})
+    report = asyncio.run(format_version(model, "v0.41.0", raw_dir, formatted_dir, CONFIG))
+    assert list(report.failed) == ["qml.RX"]
+    assert report.formatted == ["qml.CNOT", "qml.Hadamard"]
+    assert report.cost > 0
+    assert model.calls.count("qml.RX") == 3
+    assert model.calls.count("qml.CNOT") == 3
+    assert not (formatted_dir / "v0.41.0.json").exists()
+    assert set(load_checkpoint(checkpoint_path(formatted_dir, "v0.41.0"))) == {"qml.CNOT", "qml.Hadamard"}
+
+    # an interrupted write leaves a truncated line behind
+    with open(checkpoint_path(formatted_dir, "v0.41.0"), "a") as f:
+        f.write('{"name": "qml.RX", "ha')
+
+    model = StubChatModel()
+    report = asyncio.run(format_version(model, "v0.41.0", raw_dir, formatted_dir, CONFIG))
+    assert model.calls == ["qml.RX"]
+    assert report.resumed == ["qml.CNOT", "qml.Hadamard"]
+    assert set(json.loads((formatted_dir / "v0.41.0.json").read_text())) == set(RAW_REFERENCE)
+
+
+def test_format_versions_reuses_unchanged_methods(raw_dir, tmp_path):
+    formatted_dir = tmp_path / "formatted"
+    changed = {**RAW_REFERENCE, "qml.RX": {**RAW_REFERENCE["qml.RX"], "source": "class RX: changed"}}
+    (raw_dir / "v0.41.1.json").write_text(json.dumps(changed))
+
+    model = StubChatModel()
+    reports = asyncio.run(format_versions(model, ["v0.41.1", "v0.41.0"], raw_dir, formatted_dir, CONFIG))
+    assert [report.version for report in reports] == ["v0.41.0", "v0.41.1"]
+    assert reports[1].formatted == ["qml.RX"]
+    assert reports[1].reused == ["qml.CNOT", "qml.Hadamard"]
+    assert reports[1].cost < reports[0].cost
+    assert len(model.calls) == 4
+
+    # nothing changed since the last run
+    model = StubChatModel()
+    reports = asyncio.run(format_versions(model, ["v0.41.0", "v0.41.1"], raw_dir, formatted_dir, CONFIG))
+    assert model.calls == []
+    assert reports[1].resumed == sorted(RAW_REFERENCE)
+
+
+def test_format_versions_continues_after_failures(raw_dir, tmp_path):
+    formatted_dir = tmp_path / "formatted"
+    (raw_dir / "v0.41.1.json").write_text(json.dumps(RAW_REFERENCE))
+
+    model = StubChatModel(failures={"qml.RX": 3})
+    reports = asyncio.run(format_versions(model, ["v0.41.0", "v0.41.1"], raw_dir, formatted_dir, CONFIG))
+    assert list(reports[0].failed) == ["qml.RX"]
+    assert not (formatted_dir / "v0.41.0.json").exists()
+    # the next version is formatted, its own RX call succeeds
+    assert reports[1].failed == {}
+    assert reports[1].formatted == sorted(RAW_REFERENCE)
+    assert reports[1].cost > 0
+    assert (formatted_dir / "v0.41.1.json").exists()
+
+
+def test_rate_limiter_waits_for_tokens(monkeypatch):
+    now = [0.0]
+    sleeps = []
+    original_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+        await original_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    async def main():
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600, clock=lambda: now[0])
+        await limiter.acquire(300)
+        await limiter.acquire(300)
+        assert sleeps == []
+        # both buckets are empty: one request and 300 tokens are refilled in 30s
+        await limiter.acquire(300)
+        assert sleeps == [pytest.approx(30.0)]
+        # the request used 300 more tokens than reserved, the next one also waits for the debt
+        limiter.reconcile(300, 600)
+        await limiter.acquire(300)
+        assert sum(sleeps) == pytest.approx(30.0 + 60.0)
+
+    asyncio.run(main())
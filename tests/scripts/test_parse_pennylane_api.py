@@ -0,0 +1,68 @@
+import json
+import sys
+
+import pytest
+
+from scripts.parse_pennylane_api import parse_api, write_entries
+
+MODULES = {
+    "__init__.py": (
+        "from fakelane.ops import RX, CNOT\nfrom fakelane.templates import layer\n"
+        "from fakelane.aliases import Rotation\n__version__ = '0.1'\n"
+    ),
+    "ops/__init__.py": "from fakelane.ops.qubit import RX, CNOT\n",
+    "ops/qubit.py": (
+        'class RX:\n    """X rotation"""\n    def __init__(self, phi, wires): ...\n\n\n'
+        "class CNOT:\n    pass\n"
+    ),
+    "templates.py": "from fakelane.ops import RX\n\n\ndef layer(weights, wires=None):\n    return RX\n",
+    # an alias of a class defined in another module
+    "aliases.py": "from fakelane.ops.qubit import RX as Rotation\n",
+    "broken.py": "raise ImportError('optional dependency missing')\n",
+}
+
+
+@pytest.fixture
+def fake_package(tmp_path, monkeypatch):
+    for path, source in MODULES.items():
+        (tmp_path / "fakelane" / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "fakelane" / path).write_text(source)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "fakelane"
+    for name in [name for name in sys.modules if name.startswith("fakelane")]:
+        del sys.modules[name]
+
+
+def test_parse_api(fake_package, tmp_path):
+    out_path = tmp_path / "v0.1.json"
+    stats = write_entries(str(out_path), parse_api(fake_package, max_workers=2))
+
+    dump = json.loads(out_path.read_text())
+    assert sorted(dump) == ["qml.CNOT", "qml.RX", "qml.Rotation", "qml.layer"]
+    assert dump["qml.RX"]["signature"] == "(phi, wires)"
+    assert dump["qml.Rotation"] == dump["qml.RX"]
+    assert dump["qml.RX"]["docstring"] == "X rotation"
+    assert dump["qml.layer"]["source"].startswith("def layer(weights, wires=None):")
+    # every module exposing RX under a package-level name emits it, the duplicates are written once
+    assert stats["modules"]["fakelane.ops.qubit"]["entries"] == 2
+    assert stats["modules"]["fakelane.templates"]["entries"] == 2
+    assert stats["modules"]["fakelane.aliases"]["entries"] == 1
+    assert stats["modules"]["fakelane.broken"]["error"] == "ImportError: optional dependency missing"
+    assert stats["written"] == 4
+
+
+def test_parse_api_diff(fake_package, tmp_path):
+    previous = {
+        "qml.RX": {"signature": "(phi, wires)", "docstring": "X rotation", "source": "old source"},
+        "qml.CNOT": None,
+        "qml.Removed": {"signature": "()", "docstring": "", "source": None},
+    }
+    write_entries(str(tmp_path / "full.json"), parse_api(fake_package, max_workers=1))
+    previous["qml.CNOT"] = json.loads((tmp_path / "full.json").read_text())["qml.CNOT"]
+
+    out_path = tmp_path / "diff.json"
+    stats = write_entries(str(out_path), parse_api(fake_package, max_workers=1), previous)
+    dump = json.loads(out_path.read_text())
+    assert sorted(dump) == ["qml.RX", "qml.Removed", "qml.Rotation", "qml.layer"]
+    assert dump["qml.Removed"] is None
+    assert (stats["written"], stats["unchanged"], stats["removed"]) == (3, 1, 1)
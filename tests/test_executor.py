@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from src.executor import BoundedExecutor, DeadlineExceededError, KillableWorkerPool, ToolOverloadedError
+
+
+def test_bounded_executor_runs_off_event_loop():
+    executor = BoundedExecutor(max_workers=2, max_queue=0)
+
+    async def main():
+        return await executor.run(threading.get_ident)
+
+    try:
+        assert asyncio.run(main()) != threading.get_ident()
+    finally:
+        executor.shutdown()
+
+
+def test_bounded_executor_rejects_when_queue_is_full():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 2
+
+        with pytest.raises(ToolOverloadedError):
+            await executor.run(release.wait)
+
+        # the event loop itself is not blocked while the workers are busy
+        await asyncio.sleep(0)
+        release.set()
+        assert await running is True
+        assert await queued is True
+        assert executor.in_flight == 0
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_bounded_executor_counts_cancelled_calls_until_they_complete():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+
+        # the cancelled call still occupies the worker
+        assert executor.in_flight == 1
+        with pytest.raises(ToolOverloadedError):
+            await executor.run(release.wait)
+        release.set()
+        while executor.in_flight:
+            await asyncio.sleep(0.01)
+        assert await executor.run(threading.get_ident) != threading.get_ident()
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_bounded_executor_runs_in_process_on_process_kind():
+    executor = BoundedExecutor(max_workers=1, max_queue=0, kind="process")
+
+    async def main():
+        return await executor.run(os.getpid, in_process=True)
+
+    try:
+        assert asyncio.run(main()) == os.getpid()
+    finally:
+        executor.shutdown()
+
+
+def test_bounded_executor_unknown_kind():
+    with pytest.raises(ValueError):
+        BoundedExecutor(max_workers=1, max_queue=1, kind="fiber")
+
+
+def _echo(value):
+    return os.getpid(), value
+
+
+def _fail(message):
+    raise KeyError(message)
+
+
+def _slow_start():
+    time.sleep(1)
+
+
+def test_killable_worker_pool_deadline_starts_in_the_worker():
+    # the worker starts and runs its initializer for longer than the deadline of the call
+    pool = KillableWorkerPool(max_workers=1, initializer=_slow_start)
+    try:
+        future = pool.submit(0.5, _echo, "a")
+        assert future.result(timeout=30)[1] == "a"
+    finally:
+        pool.shutdown()
+
+
+def test_killable_worker_pool_reuses_workers():
+    pool = KillableWorkerPool(max_workers=1)
+    try:
+        pid, value = pool.run(30, _echo, "a")
+        assert value == "a"
+        assert pid != os.getpid()
+        assert pool.run(30, _echo, "b") == (pid, "b")
+        with pytest.raises(KeyError):
+            pool.run(30, _fail, "boom")
+        # an error raised by the call does not cost the worker
+        assert pool.run(30, _echo, "c") == (pid, "c")
+    finally:
+        pool.shutdown()
+
+
+def test_killable_worker_pool_kills_calls_past_deadline():
+    pool = KillableWorkerPool(max_workers=1)
+    try:
+        pid, _ = pool.run(30, _echo, None)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            pool.run(0.2, time.sleep, 30)
+        assert time.monotonic() - start < 10
+        # the stuck worker was killed and replaced
+        new_pid, _ = pool.run(30, _echo, None)
+        assert new_pid != pid
+    finally:
+        pool.shutdown()
@@ -0,0 +1,120 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from src import metrics, server
+from src.metrics import Counter, Histogram, MetricsRegistry
+from src.tools.static_validation import validate_pennylane_code_statically
+
+REFERENCE = {
+    "qml.RX": {"args": [{"name": "phi", "required": True}, {"name": "wires", "required": True}]},
+}
+
+
+def test_counter_and_histogram_exposition():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests.", ("tool",)))
+    histogram = registry.register(Histogram("duration_seconds", "Duration.", ("stage",), buckets=(0.1, 1.0)))
+    counter.inc("validate")
+    counter.inc("validate", amount=2)
+    counter.inc('a"b')
+    histogram.observe(0.05, "ast")
+    histogram.observe(0.1, "ast")
+    histogram.observe(5.0, "ast")
+
+    assert counter.value("validate") == 3
+    assert histogram.count("ast") == 3
+    assert histogram.sum("ast") == pytest.approx(5.15)
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{tool="a\\"b"} 1',
+        'requests_total{tool="validate"} 3',
+        "# HELP duration_seconds Duration.",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{stage="ast",le="0.1"} 2',
+        'duration_seconds_bucket{stage="ast",le="1"} 2',
+        'duration_seconds_bucket{stage="ast",le="+Inf"} 3',
+        'duration_seconds_sum{stage="ast"} 5.15',
+        'duration_seconds_count{stage="ast"} 3',
+    ]
+
+    with pytest.raises(ValueError):
+        registry.register(Counter("requests_total", "Requests."))
+
+
+def test_snapshot_merge():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests.", ("tool",)))
+    histogram = registry.register(Histogram("duration_seconds", "Duration.", ("stage",), buckets=(0.1, 1.0)))
+    counter.inc("validate")
+    histogram.observe(0.05, "ast")
+    snapshot = registry.snapshot()
+    assert snapshot == {"requests_total": {("validate",): 1.0}, "duration_seconds": {("ast",): [1, 0, 0, 0.05]}}
+
+    histogram.observe(5.0, "ast")
+    registry.merge(snapshot)
+    registry.merge({"duration_seconds": {("parse",): [0, 1, 0, 0.5]}, "unknown_total": {(): 1.0}})
+    assert counter.value("validate") == 2
+    assert histogram.count("ast") == 3
+    assert histogram.sum("ast") == pytest.approx(5.1)
+    assert histogram.count("parse") == 1
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_run_recording_metrics():
+    metrics.STAGE_DURATION.observe(1.0, "validate", "ast")
+    result, recorded = metrics.run_recording_metrics(validate_pennylane_code_statically, "def f(\n", "v0.41.0")
+    assert result["valid"] is False
+    # the metrics of the worker are reset before the call
+    assert recorded["qcv_stage_duration_seconds"][("validate", "ast")][-1] < 1.0
+    assert recorded["qcv_validation_errors_total"] == {("syntax",): 1.0}
+
+
+def test_version_label():
+    assert metrics.version_label(None) == "default"
+    assert metrics.version_label("v0.41.1") == "v0.41.1"
+    assert metrics.version_label("0.41.1") == "v0.41.1"
+    assert metrics.version_label("v9.9.9-anything") == "other"
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference", return_value=REFERENCE)
+def test_validation_stages_are_timed(mock_get_ref):
+    validate_pennylane_code_statically("qml.RX(wires=0)\nqml.RZ(0.1, wires=0)\nqml.RX(0.1, 0, x=1)", "v0.41.0")
+    for stage in ("ast", "py_compile", "extraction", "reference_load", "arg_check"):
+        assert metrics.STAGE_DURATION.count("validate", stage) == 1
+    assert metrics.VALIDATED_CALLS.sum("validate") == 3
+    assert metrics.VALIDATION_ERRORS.value("missing_argument") == 1
+    assert metrics.VALIDATION_ERRORS.value("method_not_found") == 1
+    assert metrics.VALIDATION_ERRORS.value("unexpected_argument") == 1
+
+    validate_pennylane_code_statically("def f(\n", "v0.41.0")
+    assert metrics.STAGE_DURATION.count("validate", "ast") == 2
+    assert metrics.STAGE_DURATION.count("validate", "py_compile") == 1
+    assert metrics.VALIDATION_ERRORS.value("syntax") == 1
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference", return_value=REFERENCE)
+def test_tool_calls_are_counted(mock_get_ref):
+    result = asyncio.run(server.validate_pennylane_method_by_static("qml.RX(0.1, wires=0)", "v0.41.0"))
+    assert result["valid"] is True
+    asyncio.run(server.validate_pennylane_method_by_static("qml.RX(0.1, wires=0)", "v0.41.0"))
+    with pytest.raises(ValueError):
+        asyncio.run(server.validate_pennylane_method_by_static("qml.RX(0.1, wires=0)", "v0.1.0"))
+
+    assert metrics.TOOL_REQUESTS.value("validate", "v0.41.0") == 2
+    assert metrics.TOOL_REQUESTS.value("validate", "other") == 1
+    assert metrics.TOOL_FAILURES.value("validate", "ValueError") == 1
+    assert metrics.TOOL_DURATION.count("validate") == 3
+    assert metrics.TOOL_INPUT_SIZE.sum("validate") == 3 * len("qml.RX(0.1, wires=0)")
+
+    response = asyncio.run(server.metrics_endpoint(mock.Mock()))
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = bytes(response.body).decode()
+    assert 'qcv_tool_requests_total{tool="validate",version="v0.41.0"} 2' in text
+    # the second call is served from the result cache
+    assert 'qcv_cache_requests_total{cache="result",result="hits"} 1' in text
+    assert 'qcv_stage_duration_seconds_count{op="validate",stage="arg_check"} 1' in text
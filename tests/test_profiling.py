@@ -0,0 +1,102 @@
+import json
+import os
+import pstats
+import time
+
+import pytest
+
+from scripts.aggregate_profiles import aggregate, select_dumps
+from src import profiling
+from src.profiling import ProfiledCall, input_hash, profiled
+from src.tools import limits
+from src.tools.limits import run_with_deadline
+
+
+def _work(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def _slow_work(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def _count_squares(code: str) -> int:
+    return _work(int(code))
+
+
+def _isolated_work(n: int) -> int:
+    return run_with_deadline(_count_squares, str(n))
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "profiles"
+    monkeypatch.setattr(profiling, "PROFILE_DIR", directory)
+    monkeypatch.setattr(profiling, "PROFILE_MAX_DUMPS", 3)
+    return directory
+
+
+def test_profiling_off_returns_function_itself(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_SECONDS", 0.0)
+    assert profiled("validate", _work) is _work
+
+
+def test_sampled_calls_are_dumped_and_rotated(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_SECONDS", 0.0)
+    call = profiled("validate", _work)
+    assert isinstance(call, ProfiledCall)
+    for n in range(5):
+        assert call(n) == _work(n)
+
+    dumps = sorted(profile_dir.glob("*.prof"))
+    assert len(dumps) == 3
+    assert len(list(profile_dir.glob("*.json"))) == 3
+    meta = json.loads(dumps[-1].with_suffix(".json").read_text())
+    assert meta["tool"] == "validate"
+    assert meta["reason"] == "sampled"
+    assert meta["input_hash"] == input_hash((4,))
+    assert input_hash((4,)) in dumps[-1].name
+
+
+def test_only_slow_calls_are_dumped(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_SECONDS", 0.05)
+    call = profiled("request_reference", _slow_work)
+    call(0.0)
+    assert not profile_dir.exists()
+    call(0.06)
+    (dump,) = profile_dir.glob("*.prof")
+    assert json.loads(dump.with_suffix(".json").read_text())["reason"] == "slow"
+
+
+def test_isolated_calls_are_profiled_in_the_worker(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(limits, "VALIDATION_ISOLATION_MIN_CHARS", 0)
+    monkeypatch.setattr(limits, "VALIDATION_TIMEOUT", 30.0)
+    try:
+        assert profiled("validate", _isolated_work)(1000) == _work(1000)
+    finally:
+        limits.shutdown_deadline_pool()
+
+    # a single dump, written by the worker, that shows the work rather than the wait for the worker
+    (dump,) = profile_dir.glob("*.prof")
+    meta = json.loads(dump.with_suffix(".json").read_text())
+    assert meta["pid"] != os.getpid()
+    assert meta["input_hash"] == input_hash((1000,))
+    assert "_count_squares" in pstats.Stats(str(dump)).get_stats_profile().func_profiles
+
+
+def test_aggregate_profiles(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    profiled("validate", _work)(1000)
+    profiled("compatibility", _work)(10)
+
+    assert len(select_dumps(profile_dir)) == 2
+    dumps = select_dumps(profile_dir, tool="validate")
+    assert len(dumps) == 1
+    assert select_dumps(profile_dir, reason="slow") == []
+    report = aggregate(select_dumps(profile_dir), sort="tottime", limit=5)
+    assert "_work" in report
@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.sync import MANIFEST_FILENAME, LocalDirectoryBackend, sync_references
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    source = tmp_path / "bucket"
+    for name in ["pennylane/raw/v0.41.0.json", "pennylane/raw/v0.41.1.json", "pennylane/formatted/v0.41.1.json"]:
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_text(json.dumps({"name": name}))
+    return source
+
+
+class FlakyBackend(LocalDirectoryBackend):
+    def __init__(self, root: Path, failing: set[str]) -> None:
+        super().__init__(root)
+        self.failing = failing
+        self.downloaded: list[str] = []
+
+    def download(self, name: str, destination: Path) -> None:
+        if name in self.failing:
+            destination.write_text("partial")
+            raise ConnectionError("connection reset")
+        self.downloaded.append(name)
+        super().download(name, destination)
+
+
+def test_sync_references_skips_unchanged_files(source_dir, tmp_path):
+    download_dir = tmp_path / "refdocs"
+    report = sync_references(LocalDirectoryBackend(source_dir), download_dir, max_workers=4)
+    assert report.downloaded == [
+        "pennylane/formatted/v0.41.1.json",
+        "pennylane/raw/v0.41.0.json",
+        "pennylane/raw/v0.41.1.json",
+    ]
+    assert (download_dir / "pennylane/raw/v0.41.1.json").read_text() == (
+        source_dir / "pennylane/raw/v0.41.1.json"
+    ).read_text()
+
+    (source_dir / "pennylane/raw/v0.41.1.json").write_text(json.dumps({"name": "updated"}))
+    report = sync_references(LocalDirectoryBackend(source_dir), download_dir, max_workers=4)
+    assert report.downloaded == ["pennylane/raw/v0.41.1.json"]
+    assert len(report.skipped) == 2
+    assert json.loads((download_dir / "pennylane/raw/v0.41.1.json").read_text()) == {"name": "updated"}
+
+
+def test_sync_references_resumes_after_failure(source_dir, tmp_path):
+    download_dir = tmp_path / "refdocs"
+    flaky = FlakyBackend(source_dir, failing={"pennylane/raw/v0.41.1.json"})
+    with pytest.raises(RuntimeError, match="pennylane/raw/v0.41.1.json"):
+        sync_references(flaky, download_dir, max_workers=2)
+
+    assert not (download_dir / "pennylane/raw/v0.41.1.json").exists()
+    assert not list(download_dir.rglob("*.partial"))
+    manifest = json.loads((download_dir / MANIFEST_FILENAME).read_text())
+    assert sorted(manifest) == ["pennylane/formatted/v0.41.1.json", "pennylane/raw/v0.41.0.json"]
+
+    resumed = FlakyBackend(source_dir, failing=set())
+    report = sync_references(resumed, download_dir, max_workers=2)
+    assert resumed.downloaded == ["pennylane/raw/v0.41.1.json"]
+    assert report.downloaded == ["pennylane/raw/v0.41.1.json"]
+    assert len(report.skipped) == 2
+
+
+def test_sync_references_redownloads_modified_local_file(source_dir, tmp_path):
+    download_dir = tmp_path / "refdocs"
+    sync_references(LocalDirectoryBackend(source_dir), download_dir)
+    (download_dir / "pennylane/raw/v0.41.0.json").write_text("truncated")
+
+    report = sync_references(LocalDirectoryBackend(source_dir), download_dir)
+    assert report.downloaded == ["pennylane/raw/v0.41.0.json"]
@@ -0,0 +1,98 @@
+import ast
+
+import pytest
+
+from src.tools import arg_validator
+from src.tools.arg_validator import ArgValidator, ArgValidators, variadic_kind
+
+RX_ARGS = [
+    {"name": "phi", "required": True, "type": "float", "description": "The rotation angle"},
+    {"name": "wires", "required": True, "type": "int", "description": "The wire the operation acts on"},
+    {"name": "id", "required": False, "type": "str", "description": "The id"},
+]
+
+
+def _parse_call(code: str) -> ast.Call:
+    return ast.parse(code).body[0].value
+
+
+@pytest.mark.parametrize(
+    "name,expected", [("wires", None), ("*args", "*"), ("*", "*"), ("**kwargs", "**"), ("**", "**")]
+)
+def test_variadic_kind(name, expected):
+    assert variadic_kind(name) == expected
+
+
+def test_arg_validator_from_args():
+    validator = ArgValidator.from_args(
+        RX_ARGS + [{"name": "*ops", "required": False}, {"name": "shots", "required": True}]
+    )
+    assert validator.positional == ("phi", "wires", "id")
+    assert validator.names == {"phi", "wires", "id", "shots"}
+    assert validator.required == ("phi", "wires", "shots")
+    assert validator.required_names == {"phi", "wires", "shots"}
+    assert validator.var_positional is True
+    assert validator.var_keyword is False
+    assert validator.missing_messages["phi"] == "Missing required argument 'phi'.\nphi (float): The rotation angle"
+
+
+@pytest.mark.parametrize(
+    "code,expected_errors",
+    [
+        ("qml.RX(0.5, 0, 'rx')", []),
+        ("qml.RX(0.5, wires=0, foo=1, bar=2)", ["Unexpected argument 'foo'", "Unexpected argument 'bar'"]),
+        (
+            "qml.RX(id='rx')",
+            [
+                "Missing required argument 'phi'.\nphi (float): The rotation angle",
+                "Missing required argument 'wires'.\nwires (int): The wire the operation acts on",
+            ],
+        ),
+        (
+            "qml.RX(0.5, wire=0)",
+            [
+                "Unexpected argument 'wire'. Did you mean 'wires'?",
+                "Missing required argument 'wires'.\nwires (int): The wire the operation acts on",
+            ],
+        ),
+        ("qml.RX(*params)", []),
+        ("qml.RX(0.5, **kwargs)", []),
+    ],
+)
+def test_arg_validator_check(code, expected_errors):
+    assert ArgValidator.from_args(RX_ARGS).check(_parse_call(code)) == expected_errors
+
+
+def test_arg_validator_check_variadic_arguments():
+    validator = ArgValidator.from_args(
+        [{"name": "*ops", "required": False}, {"name": "id", "required": True}, {"name": "**kwargs", "required": True}]
+    )
+    assert validator.check(_parse_call("qml.prod(a, b, c, id='p', foo=1)")) == []
+    # `id` comes after `*ops`, it can only be given as a keyword
+    assert validator.check(_parse_call("qml.prod(a, b)")) == [
+        "Missing required argument 'id'.\nid (): ",
+    ]
+
+
+def test_arg_validator_check_literal_types():
+    validator = ArgValidator.from_args(RX_ARGS + [{"name": "wire_order", "required": False, "type": "Operator"}])
+    assert set(validator.types) == {"phi", "wires", "id"}
+    assert validator.check(_parse_call("qml.RX('0.5', wires=[0], id=rx_id, wire_order=0)")) == [
+        "Invalid type for argument 'phi': expected float, got str",
+        "Invalid type for argument 'wires': expected int, got list",
+    ]
+
+
+def test_arg_validator_type_checks_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(arg_validator, "VALIDATION_CHECK_TYPES", False)
+    validator = ArgValidator.from_args(RX_ARGS)
+    assert validator.types == {}
+    assert validator.check(_parse_call("qml.RX('0.5', wires=[0])")) == []
+
+
+def test_arg_validators_compiles_each_method_once():
+    validators = ArgValidators({"qml.RX": {"args": RX_ARGS}})
+    validator = validators.get("qml.RX")
+    assert validator is not None
+    assert validators.get("qml.RX") is validator
+    assert validators.get("qml.CNOT") is None
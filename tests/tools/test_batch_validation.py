@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import cast
+from unittest import mock
+
+import pytest
+
+from src import metrics
+from src.tools import batch_validation, limits
+from src.tools.batch_validation import BatchValidationItem, validate_pennylane_code_batch
+from src.tools.result_cache import validate_pennylane_code_cached
+
+REFERENCE = {
+    "qml.RX": {"args": [{"name": "phi", "required": True}, {"name": "wires", "required": True}]},
+}
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference")
+def test_validate_pennylane_code_batch(mock_get_ref):
+    mock_get_ref.return_value = REFERENCE
+    items = [
+        BatchValidationItem(id="valid", code="qml.RX(0.5, wires=0)", version="v0.41.1"),
+        BatchValidationItem(id="missing-arg", code="qml.RX(wires=0)", version="v0.41.1"),
+        BatchValidationItem(id="syntax-error", code="def f(\n", version="v0.41.1"),
+    ]
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = validate_pennylane_code_batch(items, executor=executor)
+
+    assert list(results) == ["valid", "missing-arg", "syntax-error"]
+    assert results["valid"] == {"valid": True, "errors": []}
+    assert results["missing-arg"]["valid"] is False
+    assert "Missing required argument 'phi'" in cast(list[str], results["missing-arg"]["errors"])[0]
+    assert cast(list[str], results["syntax-error"]["errors"])[0].startswith("SyntaxError")
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference")
+def test_validate_pennylane_code_batch_isolates_failing_items(mock_get_ref):
+    mock_get_ref.return_value = REFERENCE
+    validate = validate_pennylane_code_cached
+
+    def validate_or_raise(code, version=None):
+        if code == "raise":
+            raise RuntimeError("worker crashed")
+        return validate(code, version)
+
+    items = [
+        BatchValidationItem(id="before", code="qml.RX(0.5, wires=0)", version="v0.41.1"),
+        BatchValidationItem(id="raising", code="raise", version="v0.41.1"),
+        BatchValidationItem(id="invalid", code="qml.RX(wires=0)", version="v0.41.1"),
+        BatchValidationItem(id="after", code="qml.RX(0.1, wires=1)", version="v0.41.1"),
+    ]
+    with mock.patch("src.tools.batch_validation.validate_pennylane_code_cached", validate_or_raise):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = validate_pennylane_code_batch(items, executor=executor)
+
+    assert list(results) == ["before", "raising", "invalid", "after"]
+    assert results["raising"] == {"valid": False, "errors": ["RuntimeError: worker crashed"]}
+    assert results["invalid"]["valid"] is False
+    assert "Missing required argument 'phi'" in cast(list[str], results["invalid"]["errors"])[0]
+    assert results["before"] == {"valid": True, "errors": []}
+    assert results["after"] == {"valid": True, "errors": []}
+
+
+def _sleep_or_validate(code, version=None):
+    # runs in the worker processes, imported from this module. "sleep <seconds> <pid file>" sleeps
+    if code.startswith("sleep"):
+        _, seconds, pid_path = code.split()
+        Path(pid_path).write_text(str(os.getpid()))
+        time.sleep(float(seconds))
+    metrics.record_stage("validate", "ast", time.perf_counter())
+    return {"valid": True, "errors": []}
+
+
+def test_validate_pennylane_code_batch_item_deadline(monkeypatch):
+    monkeypatch.setattr(limits, "VALIDATION_TIMEOUT", 0.2)
+    release = threading.Event()
+
+    def hang_or_validate(code, version=None):
+        if code == "hang":
+            release.wait()
+        return {"valid": True, "errors": []}
+
+    items = [BatchValidationItem(id=code, code=code) for code in ("a = 1", "hang", "b = 2")]
+    with mock.patch("src.tools.batch_validation.validate_pennylane_code_cached", hang_or_validate):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = validate_pennylane_code_batch(items, executor=executor)
+            release.set()
+
+    assert results["hang"]["limit_exceeded"] == {"limit": "timeout_seconds", "max": 0.2, "value": None}
+    assert results["a = 1"] == results["b = 2"] == {"valid": True, "errors": []}
+
+
+@pytest.fixture
+def small_batch_pool(monkeypatch):
+    """A shared batch pool of one worker running `_sleep_or_validate`, started before the deadline is short."""
+    batch_validation.shutdown_batch_pool()
+    monkeypatch.setattr(batch_validation, "BATCH_VALIDATION_MAX_WORKERS", 1)
+    monkeypatch.setattr(batch_validation, "validate_pennylane_code_cached", _sleep_or_validate)
+    items = [BatchValidationItem(id=str(i), code=f"a = {i}") for i in range(4)]
+    assert all(result["valid"] for result in validate_pennylane_code_batch(items).values())
+    # the stages timed in the worker processes are recorded in this one
+    assert metrics.STAGE_DURATION.count("validate", "ast") == 4
+    yield items
+    batch_validation.shutdown_batch_pool()
+
+
+def test_validate_pennylane_code_batch_kills_expired_items(small_batch_pool, monkeypatch, tmp_path):
+    monkeypatch.setattr(limits, "VALIDATION_TIMEOUT", 1.0)
+    pid_path = tmp_path / "pid"
+    items = list(small_batch_pool)
+    items.insert(1, BatchValidationItem(id="sleep", code=f"sleep 60 {pid_path}"))
+    start = time.monotonic()
+    results = validate_pennylane_code_batch(items)
+    assert time.monotonic() - start < 30
+    assert list(results) == ["0", "sleep", "1", "2", "3"]
+    assert results["sleep"]["limit_exceeded"]["limit"] == "timeout_seconds"
+    assert all(results[item.id] == {"valid": True, "errors": []} for item in items if item.id != "sleep")
+    # the worker running the expired item was killed, the next items ran on a new one
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_path.read_text()), 0)
+
+
+def test_validate_pennylane_code_batch_deadline_starts_with_the_item(small_batch_pool, monkeypatch, tmp_path):
+    # the items wait for the only worker, longer than the deadline, but each one completes within it
+    monkeypatch.setattr(limits, "VALIDATION_TIMEOUT", 1.0)
+    items = [BatchValidationItem(id=str(i), code=f"sleep 0.4 {tmp_path / str(i)}") for i in range(4)]
+    start = time.monotonic()
+    results = validate_pennylane_code_batch(items)
+    assert time.monotonic() - start >= 1.6
+    assert all(result == {"valid": True, "errors": []} for result in results.values())
+
+
+def test_validate_pennylane_code_batch_process_pool():
+    # runs in the shared spawn-based process pool, errors are reported per item
+    items = [
+        BatchValidationItem(id="syntax-error", code="def f(\n", version="v0.41.1"),
+        BatchValidationItem(id="unsupported", code="qml.RX(0.5, wires=0)", version="v0.0.0"),
+    ]
+    results = validate_pennylane_code_batch(items)
+
+    assert results["syntax-error"]["valid"] is False
+    assert results["unsupported"]["valid"] is False
+    assert cast(list[str], results["unsupported"]["errors"])[0].startswith("ValueError: Unsupported PennyLane version")
+
+
+def test_validate_pennylane_code_batch_duplicate_ids():
+    items = [BatchValidationItem(id="a", code="a = 1"), BatchValidationItem(id="a", code="b = 1")]
+    with pytest.raises(ValueError):
+        validate_pennylane_code_batch(items)
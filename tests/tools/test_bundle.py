@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+
+import pytest
+
+from src.tools import bundle, common, static_validation
+from src.tools.bundle import (
+    ReferenceBundle,
+    build_reference_bundle,
+    get_reference_bundle,
+    is_reference_bundle_stale,
+    read_bundle_versions,
+)
+from src.tools.request_reference import request_pennylane_reference
+from src.tools.static_validation import get_reference, get_reference_fingerprint, validate_pennylane_code_statically
+
+RAW_REFERENCE = {
+    "qml.CNOT": {
+        "signature": "(wires, id=None)",
+        "docstring": "The controlled-NOT operator",
+        "source": "class CNOT: ...",
+    },
+}
+FORMATTED_REFERENCE = {
+    "qml.CNOT": {
+        "args": [
+            {"name": "wires", "type": "Sequence[int]", "required": True, "description": "The wires"},
+            {"name": "id", "type": "Optional[str]", "required": False, "description": "The id"},
+        ],
+        "description": "The controlled-NOT operator.",
+    },
+    "qml.RX": {
+        "args": [
+            {"name": "phi", "type": "float", "required": True, "description": "The angle"},
+            {"name": "wires", "type": "Sequence[int]", "required": True, "description": "The wires"},
+        ],
+        "description": "The single qubit X rotation.",
+    },
+}
+
+
+@pytest.fixture
+def reference_dirs(tmp_path):
+    raw_dir = tmp_path / "raw"
+    formatted_dir = tmp_path / "formatted"
+    raw_dir.mkdir()
+    formatted_dir.mkdir()
+    (raw_dir / "v0.41.1.json").write_text(json.dumps(RAW_REFERENCE))
+    (formatted_dir / "v0.41.0.json").write_text(json.dumps(FORMATTED_REFERENCE))
+    (formatted_dir / "v0.41.1.json").write_text(json.dumps(FORMATTED_REFERENCE))
+    return raw_dir, formatted_dir
+
+
+@pytest.fixture
+def bundle_only(reference_dirs, tmp_path, monkeypatch):
+    """Build the bundle and point the JSON directories at empty ones, so that only the bundle can serve references."""
+    raw_dir, formatted_dir = reference_dirs
+    build_reference_bundle(["v0.41.0", "v0.41.1"], raw_dir, formatted_dir, bundle.REFERENCE_BUNDLE_PATH)
+    empty_dir = tmp_path / "empty"
+    for name in ("RAW_PENNYLANE_JSON_DIR", "FORMATTED_PENNYLANE_JSON_DIR", "INDEXED_PENNYLANE_DIR"):
+        monkeypatch.setattr(common, name, empty_dir)
+    common.refresh_version_catalog()
+    return bundle.REFERENCE_BUNDLE_PATH
+
+
+def test_build_reference_bundle(reference_dirs, tmp_path):
+    raw_dir, formatted_dir = reference_dirs
+    path = build_reference_bundle(["v0.40.0", "v0.41.0", "v0.41.1"], raw_dir, formatted_dir, tmp_path / "ref.bundle")
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ["ref.bundle"]
+    assert read_bundle_versions(path) == {
+        "v0.41.0": {"raw": False, "formatted": True},
+        "v0.41.1": {"raw": True, "formatted": True},
+    }
+
+    reference_bundle = ReferenceBundle(path)
+    try:
+        assert reference_bundle.formatted("v0.40.0") is None
+        reference = reference_bundle.formatted("v0.41.1")
+        assert sorted(reference) == ["qml.CNOT", "qml.RX"]
+        assert "qml.RY" not in reference
+        entry = reference["qml.CNOT"]
+        assert entry["args"] == FORMATTED_REFERENCE["qml.CNOT"]["args"]
+        assert entry["description"] == FORMATTED_REFERENCE["qml.CNOT"]["description"]
+        assert reference["qml.CNOT"] is entry
+        # names repeated across entries and versions share one string object
+        assert entry["args"][0]["name"] is reference_bundle.formatted("v0.41.0")["qml.RX"]["args"][1]["name"]
+
+        assert reference_bundle.raw_entry("v0.41.1", "qml.CNOT") == RAW_REFERENCE["qml.CNOT"]
+        assert reference_bundle.raw_entry("v0.41.1", "qml.CNOT", slices=True) == {
+            **RAW_REFERENCE["qml.CNOT"],
+            "docstring_slices": ((0, 27),),
+            "source_slices": ((0, 15),),
+        }
+        assert reference_bundle.raw_entry("v0.41.1", "qml.RX") is None
+        assert reference_bundle.raw_entry("v0.41.0", "qml.CNOT") is None
+    finally:
+        reference_bundle.close()
+
+
+def test_reference_bundle_rejects_other_files(tmp_path):
+    path = tmp_path / "ref.bundle"
+    path.write_bytes(b"not a bundle at all, but long enough")
+    with pytest.raises(ValueError):
+        ReferenceBundle(path)
+
+
+def test_reference_bundle_staleness(reference_dirs, tmp_path):
+    raw_dir, formatted_dir = reference_dirs
+    versions = ["v0.41.0", "v0.41.1"]
+    path = tmp_path / "reference.bundle"
+    assert is_reference_bundle_stale(versions, raw_dir, formatted_dir, path)
+
+    build_reference_bundle(versions, raw_dir, formatted_dir, path)
+    assert not is_reference_bundle_stale(versions, raw_dir, formatted_dir, path)
+
+    # a changed dump, a new dump and a corrupt bundle all make the bundle stale
+    raw_path = raw_dir / "v0.41.1.json"
+    os.utime(raw_path, ns=(raw_path.stat().st_atime_ns, raw_path.stat().st_mtime_ns + 1))
+    assert is_reference_bundle_stale(versions, raw_dir, formatted_dir, path)
+    build_reference_bundle(versions, raw_dir, formatted_dir, path)
+    (raw_dir / "v0.41.0.json").write_text(json.dumps(RAW_REFERENCE))
+    assert is_reference_bundle_stale(versions, raw_dir, formatted_dir, path)
+    build_reference_bundle(versions, raw_dir, formatted_dir, path)
+    assert not is_reference_bundle_stale(versions, raw_dir, formatted_dir, path)
+    path.write_bytes(b"not a bundle")
+    assert is_reference_bundle_stale(versions, raw_dir, formatted_dir, path)
+
+
+@pytest.mark.parametrize("content", [b"", b"not a bundle at all, but long enough", "truncated"])
+def test_unreadable_bundle_falls_back_to_json(reference_dirs, monkeypatch, caplog, content):
+    raw_dir, formatted_dir = reference_dirs
+    path = build_reference_bundle(["v0.41.1"], raw_dir, formatted_dir, bundle.REFERENCE_BUNDLE_PATH)
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) - 10] if content == "truncated" else content)
+    monkeypatch.setattr(common, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    monkeypatch.setattr(static_validation, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    common.refresh_version_catalog()
+
+    with caplog.at_level(logging.WARNING, logger=bundle.__name__):
+        result = validate_pennylane_code_statically("import pennylane as qml\nqml.RX(0.5)", "v0.41.1")
+        assert get_reference_bundle() is None
+    assert not isinstance(get_reference("v0.41.1"), bundle.BundleReference)
+    assert result["errors"][0].startswith("Method 'qml.RX' (line 2, col 0): Missing required argument 'wires'")
+    # reported once per file
+    assert len(caplog.records) == 1
+    assert str(path) in caplog.records[0].getMessage()
+
+    build_reference_bundle(["v0.41.1"], raw_dir, formatted_dir, path)
+    assert isinstance(get_reference("v0.41.1"), bundle.BundleReference)
+
+
+def test_replaced_bundle_is_closed(bundle_only, reference_dirs, monkeypatch):
+    raw_dir, formatted_dir = reference_dirs
+    monkeypatch.setattr(bundle._BUNDLE_CACHE, "check_interval", 0.0)
+    first = get_reference_bundle()
+    build_reference_bundle(["v0.41.1"], raw_dir, formatted_dir, bundle_only)
+    stat = os.stat(bundle_only)
+    os.utime(bundle_only, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = get_reference_bundle()
+    assert second is not first
+    assert first._buffer.closed
+    bundle.clear_reference_bundle()
+    assert second._buffer.closed
+
+
+def test_validation_served_from_bundle(bundle_only):
+    assert common.get_version_catalog().formatted == ("v0.41.0", "v0.41.1")
+    assert common.get_version_catalog().raw == ("v0.41.1",)
+    assert isinstance(get_reference("v0.41.1"), bundle.BundleReference)
+
+    result = validate_pennylane_code_statically("import pennylane as qml\nqml.RX(0.5)\nqml.CNOT(wires=[0, 1])")
+    assert result["valid"] is False
+    assert len(result["errors"]) == 1
+    assert result["errors"][0].startswith("Method 'qml.RX' (line 2, col 0): Missing required argument 'wires'")
+
+    doc = request_pennylane_reference("qml.CNOT", "v0.41.1")
+    assert "class CNOT: ..." in doc
+    doc = request_pennylane_reference("qml.CNOT", "v0.41.1", sections=["description", "signature"])
+    assert doc == "# qml.CNOT\n\n# Signature\n(wires, id=None)\n\n# Description\nThe controlled-NOT operator.\n"
+    with pytest.raises(ValueError):
+        request_pennylane_reference("qml.RY", "v0.41.1")
+
+
+def test_bundle_rebuild_changes_fingerprint(bundle_only, reference_dirs):
+    raw_dir, formatted_dir = reference_dirs
+    fingerprint = get_reference_fingerprint("v0.41.1")
+    assert fingerprint is not None
+
+    build_reference_bundle(["v0.41.1"], raw_dir, formatted_dir, bundle_only)
+    stat = os.stat(bundle_only)
+    os.utime(bundle_only, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    bundle.clear_reference_bundle()
+    assert get_reference_fingerprint("v0.41.1") != fingerprint
+
+
+def test_bundle_disabled(bundle_only, monkeypatch):
+    monkeypatch.setattr(bundle, "USE_REFERENCE_BUNDLE", False)
+    common.refresh_version_catalog()
+    assert get_reference_bundle() is None
+    assert common.get_version_catalog().formatted == ()
+
+
+def test_bundle_stores_identical_entries_once(reference_dirs, tmp_path):
+    _, formatted_dir = reference_dirs
+    changed = {**FORMATTED_REFERENCE, "qml.RX": {**FORMATTED_REFERENCE["qml.RX"], "description": "Changed."}}
+    (formatted_dir / "v0.40.0.json").write_text(json.dumps(changed))
+    empty_dir = tmp_path / "empty"
+
+    one = build_reference_bundle(["v0.41.0"], empty_dir, formatted_dir, tmp_path / "one.bundle")
+    three = build_reference_bundle(
+        ["v0.40.0", "v0.41.0", "v0.41.1"], empty_dir, formatted_dir, tmp_path / "three.bundle"
+    )
+    # three copies of the entries would triple the size, v0.41.1 only adds its index and v0.40.0 one entry
+    assert three.stat().st_size < 2 * one.stat().st_size
+
+    reference_bundle = ReferenceBundle(three)
+    try:
+        v40, v41, v411 = (reference_bundle.formatted(v) for v in ("v0.40.0", "v0.41.0", "v0.41.1"))
+        assert v41["qml.RX"] is v411["qml.RX"]
+        assert v40["qml.CNOT"] is v41["qml.CNOT"]
+        assert v40["qml.RX"] is not v41["qml.RX"]
+        assert v40["qml.RX"]["description"] == "Changed."
+    finally:
+        reference_bundle.close()
@@ -0,0 +1,115 @@
+import json
+import os
+
+import pytest
+
+from src.tools.cache import DerivedCache, FileCache
+
+
+def _write_json(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _counting_loader(calls):
+    def loader(path):
+        calls.append(path)
+        with open(path) as f:
+            return json.load(f)
+
+    return loader
+
+
+def test_file_cache_hit_does_not_reload(tmp_path):
+    path = tmp_path / "v0.41.1.json"
+    _write_json(path, {"qml.RX": {"args": []}})
+    calls = []
+    cache = FileCache(max_entries=2, check_interval=60.0)
+
+    first = cache.get("v0.41.1", path, _counting_loader(calls))
+    second = cache.get("v0.41.1", path, _counting_loader(calls))
+
+    assert first is second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_file_cache_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "v0.41.1.json"
+    _write_json(path, {"qml.RX": {}}, mtime_ns=1_000_000_000)
+    calls = []
+    cache = FileCache(max_entries=2, check_interval=0.0)
+
+    assert cache.get("v0.41.1", path, _counting_loader(calls)) == {"qml.RX": {}}
+    _write_json(path, {"qml.RX": {}, "qml.RY": {}}, mtime_ns=2_000_000_000)
+    assert cache.get("v0.41.1", path, _counting_loader(calls)) == {"qml.RX": {}, "qml.RY": {}}
+    assert len(calls) == 2
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path):
+    paths = {}
+    for version in ["v0.39.0", "v0.40.0", "v0.41.0"]:
+        paths[version] = tmp_path / f"{version}.json"
+        _write_json(paths[version], {"version": version})
+    calls = []
+    cache = FileCache(max_entries=2, check_interval=60.0)
+
+    cache.get("v0.39.0", paths["v0.39.0"], _counting_loader(calls))
+    cache.get("v0.40.0", paths["v0.40.0"], _counting_loader(calls))
+    cache.get("v0.39.0", paths["v0.39.0"], _counting_loader(calls))
+    cache.get("v0.41.0", paths["v0.41.0"], _counting_loader(calls))  # evicts v0.40.0
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    cache.get("v0.39.0", paths["v0.39.0"], _counting_loader(calls))
+    assert len(calls) == 3
+    cache.get("v0.40.0", paths["v0.40.0"], _counting_loader(calls))
+    assert len(calls) == 4
+
+
+def test_file_cache_calls_on_evict_with_dropped_values(tmp_path):
+    paths = {}
+    for version in ["v0.40.0", "v0.41.0"]:
+        paths[version] = tmp_path / f"{version}.json"
+        _write_json(paths[version], {"version": version}, mtime_ns=1_000_000_000)
+    dropped = []
+    cache = FileCache(max_entries=1, check_interval=0.0, on_evict=dropped.append)
+
+    first = cache.get("v0.40.0", paths["v0.40.0"], _counting_loader([]))
+    _write_json(paths["v0.40.0"], {"version": "v0.40.0", "reloaded": True}, mtime_ns=2_000_000_000)
+    reloaded = cache.get("v0.40.0", paths["v0.40.0"], _counting_loader([]))
+    assert dropped == [first]
+    other = cache.get("v0.41.0", paths["v0.41.0"], _counting_loader([]))
+    assert dropped[1] is reloaded
+    cache.invalidate("v0.41.0")
+    assert dropped[2] is other
+    last = cache.get("v0.40.0", paths["v0.40.0"], _counting_loader([]))
+    cache.clear()
+    assert dropped[3] is last
+
+
+def test_file_cache_missing_file(tmp_path):
+    cache = FileCache(max_entries=1)
+    with pytest.raises(FileNotFoundError):
+        cache.get("v0.0.0", tmp_path / "v0.0.0.json", _counting_loader([]))
+
+
+def test_derived_cache_rebuilds_when_source_changes():
+    calls = []
+
+    def builder(source):
+        calls.append(source)
+        return sorted(source)
+
+    cache = DerivedCache()
+    source = {"qml.RY": {}, "qml.RX": {}}
+    assert cache.get("v0.41.1", source, builder) == ["qml.RX", "qml.RY"]
+    assert cache.get("v0.41.1", source, builder) == ["qml.RX", "qml.RY"]
+    assert len(calls) == 1
+
+    reloaded = {"qml.RZ": {}}
+    assert cache.get("v0.41.1", reloaded, builder) == ["qml.RZ"]
+    assert len(calls) == 2
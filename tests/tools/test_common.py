@@ -0,0 +1,53 @@
+import pytest
+
+from src.tools import common
+from src.tools.common import get_latest_version, get_version_catalog, resolve_version
+
+
+@pytest.fixture
+def reference_dirs(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    formatted_dir = tmp_path / "formatted"
+    raw_dir.mkdir()
+    formatted_dir.mkdir()
+    for version in ["v0.39.0", "v0.40.0", "v0.41.0", "v9.9.9"]:
+        (raw_dir / f"{version}.json").write_text("{}")
+    (formatted_dir / "v0.40.0.json").write_text("{}")
+
+    monkeypatch.setattr(common, "RAW_PENNYLANE_JSON_DIR", raw_dir)
+    monkeypatch.setattr(common, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    monkeypatch.setattr(common, "INDEXED_PENNYLANE_DIR", tmp_path / "index")
+    monkeypatch.setattr(common, "REFERENCE_CACHE_CHECK_INTERVAL", 0.0)
+    common.refresh_version_catalog()
+    return raw_dir, formatted_dir
+
+
+def test_get_version_catalog(reference_dirs):
+    catalog = get_version_catalog()
+    assert catalog.raw == ("v0.39.0", "v0.40.0", "v0.41.0")
+    assert catalog.formatted == ("v0.40.0",)
+    assert catalog.latest("raw") == "v0.41.0"
+    assert catalog.latest("formatted") == "v0.40.0"
+    assert catalog.availability()["v0.40.0"] == {"raw": True, "formatted": True}
+    assert catalog.availability()["v0.41.0"] == {"raw": True, "formatted": False}
+    assert get_latest_version() == "v0.41.0"
+
+
+def test_get_version_catalog_refreshes_on_directory_change(reference_dirs):
+    _, formatted_dir = reference_dirs
+    catalog = get_version_catalog()
+    assert get_version_catalog() is catalog
+
+    (formatted_dir / "v0.41.0.json").write_text("{}")
+    assert get_version_catalog().formatted == ("v0.40.0", "v0.41.0")
+
+
+def test_resolve_version(reference_dirs):
+    assert resolve_version(None, "raw") == "v0.41.0"
+    assert resolve_version(None, "formatted") == "v0.40.0"
+    assert resolve_version("0.39.0", "raw") == "v0.39.0"
+
+    with pytest.raises(ValueError, match="Unsupported PennyLane version 'v9.9.9'"):
+        resolve_version("v9.9.9", "raw")
+    with pytest.raises(ValueError, match="formatted reference of PennyLane version 'v0.41.0' is not available"):
+        resolve_version("v0.41.0", "formatted")
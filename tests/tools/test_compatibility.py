@@ -0,0 +1,144 @@
+import json
+import re
+
+import pytest
+
+from src.tools import common, compatibility, static_validation
+from src.tools.compatibility import check_pennylane_compatibility, get_compatibility_index
+from src.tools.static_validation import validate_pennylane_code_statically
+
+RX_ARGS = [{"name": "phi", "required": True}, {"name": "wires", "required": True}]
+REFERENCES = {
+    "v0.39.0": {"qml.RX": {"args": RX_ARGS}},
+    "v0.40.0": {"qml.RX": {"args": RX_ARGS}, "qml.CNOT": {"args": [{"name": "wires", "required": True}]}},
+    "v0.41.0": {
+        "qml.RX": {"args": RX_ARGS + [{"name": "id", "required": False}]},
+        "qml.CNOT": {"args": [{"name": "wires", "required": True}]},
+        "qml.Snapshot": {"args": [{"name": "tag", "required": False}, {"name": "**kwargs", "required": False}]},
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def reference_dir(tmp_path, monkeypatch):
+    formatted_dir = tmp_path / "formatted"
+    formatted_dir.mkdir()
+    for version, reference in REFERENCES.items():
+        (formatted_dir / f"{version}.json").write_text(json.dumps(reference))
+    monkeypatch.setattr(compatibility, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    monkeypatch.setattr(common, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    monkeypatch.setattr(static_validation, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    common.refresh_version_catalog()
+    return formatted_dir
+
+
+def test_get_compatibility_index(tmp_path):
+    index = get_compatibility_index()
+    assert (tmp_path / "compatibility.json").exists()
+    assert index.versions == ["v0.39.0", "v0.40.0", "v0.41.0"]
+    assert index.methods["qml.RX"].versions == 0b111
+    assert index.methods["qml.CNOT"].versions == 0b110
+    assert index.methods["qml.RX"].args["id"] == 0b100
+    assert index.methods["qml.RX"].required["phi"] == 0b111
+    assert get_compatibility_index().to_dict() == index.to_dict()
+
+
+def test_check_pennylane_compatibility():
+    result = check_pennylane_compatibility("qml.RX(0.5, wires=0)\nqml.CNOT(wires=[0, 1])")
+    assert result["compatible_versions"] == ["v0.40.0", "v0.41.0"]
+    assert result["compatible_range"] == ["v0.40.0", "v0.41.0"]
+    assert result["common_errors"] == []
+    assert result["version_errors"] == {
+        "v0.39.0": ["Method 'qml.CNOT' (line 2, col 0): Method 'qml.CNOT' not found"],
+    }
+
+
+def test_check_pennylane_compatibility_argument_errors():
+    result = check_pennylane_compatibility("qml.RX(wires=0, id='rx')")
+    assert result["compatible_versions"] == []
+    assert result["compatible_range"] is None
+    assert result["common_errors"] == ["Method 'qml.RX' (line 1, col 0): Missing required argument 'phi'"]
+    assert result["version_errors"] == {
+        "v0.39.0": ["Method 'qml.RX' (line 1, col 0): Unexpected argument 'id'"],
+        "v0.40.0": ["Method 'qml.RX' (line 1, col 0): Unexpected argument 'id'"],
+    }
+
+
+def test_check_pennylane_compatibility_accepts_any_keyword_with_kwargs():
+    result = check_pennylane_compatibility("qml.Snapshot(tag='state', shots=10)")
+    assert result["compatible_versions"] == ["v0.41.0"]
+    assert result["common_errors"] == []
+
+
+def test_check_pennylane_compatibility_type_errors(reference_dir):
+    # phi is documented as a float, then as an int, v0.39.0 does not document its type
+    for version, phi_type in (("v0.40.0", "float"), ("v0.41.0", "int")):
+        rx_args = [{"name": "phi", "type": phi_type, "required": True}, {"name": "wires", "required": True}]
+        (reference_dir / f"{version}.json").write_text(json.dumps({"qml.RX": {"args": rx_args}}))
+    common.refresh_version_catalog()
+
+    result = check_pennylane_compatibility("qml.RX(0.5, wires=0)\nqml.RX(phi='x', wires=0)")
+    assert result["compatible_versions"] == ["v0.39.0"]
+    assert result["version_errors"] == {
+        "v0.40.0": ["Method 'qml.RX' (line 2, col 0): Invalid type for argument 'phi': expected float, got str"],
+        "v0.41.0": [
+            "Method 'qml.RX' (line 1, col 0): Invalid type for argument 'phi': expected int, got float",
+            "Method 'qml.RX' (line 2, col 0): Invalid type for argument 'phi': expected int, got str",
+        ],
+    }
+
+
+def _static_errors(version: str, code: str) -> set[str]:
+    # one error per message, without what only static validation adds: the version of a missing method, the
+    # description of a missing argument and suggestions
+    errors = set()
+    for error in validate_pennylane_code_statically(code, version)["errors"]:
+        prefix, _, messages = error.partition("): ")
+        for message in re.split(r", (?=Unexpected argument|Missing required argument|Invalid type)", messages):
+            message = re.sub(r"( in PennyLane version '[^']*')?(\.\n.*|\. Did you mean .*)?$", "", message, flags=re.S)
+            errors.add(f"{prefix}): {message}")
+    return errors
+
+
+def test_check_pennylane_compatibility_reports_the_static_validation_errors(reference_dir):
+    rx_args = [
+        {"name": "phi", "type": "float", "required": True, "description": "The angle"},
+        {"name": "wires", "type": "int", "required": True, "description": "The wire, ex: 0"},
+        {"name": "*args", "required": False},
+        {"name": "id", "required": False},
+    ]
+    (reference_dir / "v0.41.0.json").write_text(json.dumps({"qml.RX": {"args": rx_args}}))
+    common.refresh_version_catalog()
+    code = "\n".join(
+        [
+            "import pennylane as qml",
+            "qml.RX(0.5, 0)",
+            "qml.RX('x', wires=0, shots=1)",
+            "qml.RX(0.5, 0, 1, id='rx')",
+            "qml.RX(*angles, wires='a')",
+            "qml.CNOT(wires=[0, 1])",
+            "qml.Snapshot(tag='state', shots=10)",
+            "qml.Unknown(0)",
+            "qml.ops.Unknown(0)",
+        ]
+    )
+
+    result = check_pennylane_compatibility(code)
+    for version in REFERENCES:
+        compatibility_errors = set(result["common_errors"]) | set(result["version_errors"].get(version, []))
+        assert compatibility_errors == _static_errors(version, code), version
+
+
+def test_get_compatibility_index_rebuilds_older_layouts(tmp_path):
+    index = get_compatibility_index()
+    data = index.to_dict()
+    del data["format"]
+    (tmp_path / "compatibility.json").write_text(json.dumps(data))
+    assert get_compatibility_index().to_dict() == index.to_dict()
+
+
+def test_check_pennylane_compatibility_syntax_error():
+    result = check_pennylane_compatibility("def f(\n")
+    assert result["compatible_versions"] == []
+    assert result["common_errors"][0].startswith("SyntaxError")
+    assert result["version_errors"] == {}
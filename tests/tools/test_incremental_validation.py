@@ -0,0 +1,173 @@
+import ast
+import pickle
+from unittest import mock
+
+import pytest
+
+from src.tools import limits
+from src.tools.incremental_validation import SessionStore, validate_pennylane_code_incremental
+from src.tools.static_validation import validate_pennylane_code_statically
+
+REFERENCE = {
+    "qml.RX": {"args": [{"name": "phi", "required": True}, {"name": "wires", "required": True}]},
+    "qml.CNOT": {"args": [{"name": "wires", "required": True}]},
+}
+
+HEADER = "import pennylane as qml\n\n"
+CIRCUIT_A = "def circuit_a(x):\n    qml.RX(x)\n    return qml.CNOT(wires=[0, 1])\n\n"
+CIRCUIT_B = "@qml.qnode(dev)\ndef circuit_b():\n    qml.Hadamard(wires=0)\n\n"
+FOOTER = "qml.RX(0.1, wires=0); qml.CNOT()\n"
+
+
+@pytest.fixture(autouse=True)
+def reference():
+    with mock.patch("src.tools.static_validation.get_reference", return_value=REFERENCE):
+        yield
+
+
+def _names(result):
+    return [part["name"] for part in result["recomputed"]]
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_reuses_unchanged_definitions():
+    code = HEADER + CIRCUIT_A + CIRCUIT_B + FOOTER
+    result = validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+    assert result["errors"] == validate_pennylane_code_statically(code, "v0.41.0")["errors"]
+    assert len(result["errors"]) == 4
+    assert _names(result) == [None, "circuit_a", "circuit_b", None]
+    assert result["recomputed"][2]["lines"] == [7, 9]
+    assert result["reused"] == 0
+
+    # the same document again
+    again = validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+    assert again["errors"] == result["errors"]
+    assert again["recomputed"] == []
+    assert again["reused"] == 4
+
+    # circuit_a grows by two lines, circuit_b and the last line move down
+    changed_a = "def circuit_a(x):\n    qml.RX(x, wires=0)\n\n\n    return qml.CNOT(wires=[0, 1])\n\n"
+    code = HEADER + changed_a + CIRCUIT_B + FOOTER
+    result = validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+    assert _names(result) == ["circuit_a"]
+    assert result["reused"] == 3
+    assert result["errors"] == validate_pennylane_code_statically(code, "v0.41.0")["errors"]
+    assert result["errors"][-1].startswith("Method 'qml.CNOT' (line 13, col 22): Missing required argument 'wires'")
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_recomputes_on_import_or_version_change():
+    code = HEADER + CIRCUIT_A + FOOTER
+    validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+
+    # the calls of every definition may resolve differently
+    code = "import pennylane as qml\nimport numpy as qml\n" + CIRCUIT_A + FOOTER
+    result = validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+    assert _names(result) == [None, None, "circuit_a", None]
+    assert result["valid"] is True
+
+    result = validate_pennylane_code_incremental(code, "doc", "v0.40.0")
+    assert result["reused"] == 0
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_sessions_are_independent():
+    code = HEADER + CIRCUIT_A
+    validate_pennylane_code_incremental(code, "doc-1", "v0.41.0")
+    assert validate_pennylane_code_incremental(code, "doc-2", "v0.41.0")["reused"] == 0
+    assert validate_pennylane_code_incremental(code, "doc-1", "v0.41.0")["reused"] == 2
+    assert validate_pennylane_code_incremental(code + FOOTER, "doc-1", "v0.41.0")["reused"] == 2
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_counts_duplicated_definitions_once():
+    code = HEADER + CIRCUIT_A + CIRCUIT_A + FOOTER
+    result = validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+    assert result["errors"] == validate_pennylane_code_statically(code, "v0.41.0")["errors"]
+    assert result["definitions"] == 4
+    assert _names(result) == [None, "circuit_a", None]
+    assert result["reused"] == 0
+
+    assert validate_pennylane_code_incremental(code, "doc", "v0.41.0")["reused"] == 3
+    result = validate_pennylane_code_incremental(code + "\n" + FOOTER, "doc", "v0.41.0")
+    assert result["recomputed"] == []
+    assert result["reused"] == 3
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_syntax_error():
+    result = validate_pennylane_code_incremental("def f(\n", "doc", "v0.41.0")
+    assert result["valid"] is False
+    assert result["errors"][0].startswith("SyntaxError")
+    assert result["recomputed"] == []
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_runs_with_deadline(monkeypatch):
+    monkeypatch.setattr(limits, "VALIDATION_ISOLATION_MIN_CHARS", 0)
+    monkeypatch.setattr(limits, "VALIDATION_TIMEOUT", 1.0)
+
+    def run_pickled(timeout, func, *args):
+        # the arguments and the result go to the worker and back
+        return pickle.loads(pickle.dumps(func(*pickle.loads(pickle.dumps(args)))))
+
+    code = HEADER + CIRCUIT_A + CIRCUIT_B
+    with mock.patch.object(limits, "get_deadline_pool") as get_pool:
+        get_pool.return_value.run.side_effect = run_pickled
+        assert validate_pennylane_code_incremental(code, "doc", "v0.41.0")["reused"] == 0
+
+        get_pool.return_value.run.side_effect = limits.DeadlineExceededError
+        result = validate_pennylane_code_incremental(code + FOOTER, "doc", "v0.41.0")
+        assert result["limit_exceeded"] == {"limit": "timeout_seconds", "max": 1.0, "value": None}
+
+        # the session still holds the results of the last validated document
+        get_pool.return_value.run.side_effect = run_pickled
+        result = validate_pennylane_code_incremental(code + FOOTER, "doc", "v0.41.0")
+        assert _names(result) == [None]
+        assert result["reused"] == 3
+        assert result["errors"] == validate_pennylane_code_statically(code + FOOTER, "v0.41.0")["errors"]
+
+
+@pytest.mark.usefixtures("all_versions_available")
+def test_incremental_validation_sends_only_the_changed_definitions_to_the_worker(monkeypatch):
+    monkeypatch.setattr(limits, "VALIDATION_ISOLATION_MIN_CHARS", 0)
+    sent = []
+
+    def run_pickled(timeout, func, *args):
+        sent.append((args, func(*args)))
+        return pickle.loads(pickle.dumps(sent[-1][1]))
+
+    circuits = [CIRCUIT_A.replace("circuit_a", f"circuit_{i}") for i in range(500)]
+    code = HEADER + "".join(circuits)
+    with mock.patch.object(limits, "get_deadline_pool") as get_pool:
+        get_pool.return_value.run.side_effect = run_pickled
+        validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+        circuits[250] = circuits[250].replace("qml.RX(x)", "qml.RX(x, wires=0)")
+        code = HEADER + "".join(circuits)
+        result = validate_pennylane_code_incremental(code, "doc", "v0.41.0")
+
+    assert _names(result) == ["circuit_250"]
+    assert result["errors"] == validate_pennylane_code_statically(code, "v0.41.0")["errors"]
+    (_, _, _, imports, cached), (changes, _) = sent[-1]
+    # the known definitions are sent as their imports and the call counts of their results
+    assert all(isinstance(node, ast.Import) for nodes in imports.values() for node in nodes)
+    assert len(cached) == 501
+    assert len(pickle.dumps((imports, cached))) < len(code)
+    # only the edited definition comes back
+    assert list(changes.imports) == [changes.parts[251][1][0]]
+    assert len(changes.errors) == 1
+
+
+def test_session_store_evicts_and_expires():
+    store = SessionStore(max_sessions=2, ttl=60)
+    first = store.get("a")
+    store.get("b")
+    assert store.get("a") is first
+    store.get("c")
+    assert len(store) == 2
+    # "b" was the least recently used
+    assert store.get("a") is first
+
+    expiring = SessionStore(max_sessions=2, ttl=0)
+    session = expiring.get("a")
+    assert expiring.get("a") is not session
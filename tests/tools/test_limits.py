@@ -0,0 +1,110 @@
+import pickle
+import time
+from unittest import mock
+
+import pytest
+
+from src import metrics
+from src.tools import limits
+from src.tools.compatibility import check_pennylane_compatibility
+from src.tools.limits import LimitExceededError, run_with_deadline
+from src.tools.result_cache import RESULT_CACHE, validate_pennylane_code_cached
+from src.tools.static_validation import validate_pennylane_code_statically, validate_pennylane_methods
+
+REFERENCE = {"qml.RX": {"args": [{"name": "phi", "required": True}, {"name": "wires", "required": True}]}}
+
+
+def _sleep(code: str, seconds: float) -> str:
+    time.sleep(seconds)
+    return code
+
+
+def _record_stage(code: str) -> str:
+    metrics.record_stage("validate", "ast", time.perf_counter())
+    return code
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    """Run every validation in a killable worker, with a short deadline."""
+    monkeypatch.setattr(limits, "VALIDATION_ISOLATION_MIN_CHARS", 0)
+    monkeypatch.setattr(limits, "VALIDATION_TIMEOUT", 1.0)
+    yield
+    limits.shutdown_deadline_pool()
+
+
+def test_limit_exceeded_error_pickles():
+    error = pickle.loads(pickle.dumps(LimitExceededError("max_calls", 10, 11)))
+    assert error.details == {"limit": "max_calls", "max": 10, "value": 11}
+    assert str(error) == "Limit exceeded: the code has too many PennyLane calls (11 > 10)"
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference", return_value=REFERENCE)
+def test_code_size_and_call_count_limits(mock_get_ref, monkeypatch):
+    code = "import pennylane as qml\n" + "qml.RX(0.1, wires=0)\n" * 5
+    assert validate_pennylane_code_statically(code, "v0.41.0")["valid"] is True
+
+    monkeypatch.setattr(limits, "VALIDATION_MAX_CALLS", 4)
+    result = validate_pennylane_code_statically(code, "v0.41.0")
+    assert result["valid"] is False
+    assert result["limit_exceeded"] == {"limit": "max_calls", "max": 4, "value": 5}
+
+    monkeypatch.setattr(limits, "VALIDATION_MAX_CODE_CHARS", 50)
+    result = validate_pennylane_methods(code, "v0.41.0")
+    assert result["limit_exceeded"] == {"limit": "max_code_chars", "max": 50, "value": len(code)}
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference", return_value=REFERENCE)
+@pytest.mark.parametrize(
+    "code",
+    [
+        # deeper than the limit, the walk of the tree stops before the recursion limit
+        "f = " + "lambda: " * 450 + "0",
+        # the parser itself runs out of recursion building the tree
+        "x = " + "+".join(["qml.RX(0.1, wires=0)"] * 5000),
+        "x = " + "-" * 5000 + "1",
+    ],
+)
+def test_depth_limit(mock_get_ref, code):
+    result = validate_pennylane_code_statically(code, "v0.41.0")
+    assert result["valid"] is False
+    assert result["limit_exceeded"]["limit"] == "max_depth"
+    assert result["errors"] == ["Limit exceeded: the code is nested too deeply (max: 400)"]
+
+
+def test_compatibility_limit_exceeded(monkeypatch):
+    monkeypatch.setattr(limits, "VALIDATION_MAX_CODE_CHARS", 5)
+    with mock.patch("src.tools.compatibility.get_compatibility_index"):
+        result = check_pennylane_compatibility("qml.RX(0.1, wires=0)")
+    assert result["compatible_versions"] == []
+    assert result["common_errors"] == ["Limit exceeded: the code has too many characters (20 > 5)"]
+    assert result["limit_exceeded"]["limit"] == "max_code_chars"
+
+
+@pytest.mark.usefixtures("isolated")
+def test_run_with_deadline():
+    assert run_with_deadline(_sleep, "done", 0.0) == "done"
+    start = time.monotonic()
+    with pytest.raises(LimitExceededError) as e:
+        run_with_deadline(_sleep, "stuck", 60.0)
+    assert e.value.limit == "timeout_seconds"
+    assert time.monotonic() - start < 30
+
+
+@pytest.mark.usefixtures("isolated")
+def test_run_with_deadline_records_worker_metrics():
+    assert run_with_deadline(_record_stage, "done") == "done"
+    assert metrics.STAGE_DURATION.count("validate", "ast") == 1
+
+
+@pytest.mark.usefixtures("all_versions_available", "isolated")
+@mock.patch("src.tools.static_validation.get_reference", return_value=REFERENCE)
+def test_timed_out_validation_is_not_cached(mock_get_ref):
+    with mock.patch.object(limits, "get_deadline_pool") as get_pool:
+        get_pool.return_value.run.side_effect = limits.DeadlineExceededError
+        result = validate_pennylane_code_cached("qml.RX(0.1, wires=0)", "v0.41.0")
+    assert result["valid"] is False
+    assert result["limit_exceeded"] == {"limit": "timeout_seconds", "max": 1.0, "value": None}
+    assert RESULT_CACHE.stats()["size"] == 0
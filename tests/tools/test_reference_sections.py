@@ -0,0 +1,137 @@
+import pytest
+
+from src.tools.reference_sections import (
+    DEFAULT_SECTIONS,
+    SECTIONS,
+    normalize_sections,
+    parse_cursor,
+    render_reference,
+    text_slices,
+)
+
+
+def _texts(text, slices):
+    starts = [start for start, _ in slices] + [len(text)]
+    return [text[starts[i] : starts[i + 1]] for i in range(len(slices))]
+
+
+def test_text_slices_cover_the_text():
+    text = "".join(f"line {i} {'é' * (i % 40)}\n" + ("\n" if i % 9 == 0 else "") for i in range(200))
+    slices = text_slices(text, 256)
+    texts = _texts(text, slices)
+    assert "".join(texts) == text
+    assert [len(t.encode()) for t in texts] == [size for _, size in slices]
+    assert all(size <= 256 for _, size in slices)
+    assert all(t.endswith("\n") for t in texts)
+
+
+def test_text_slices_end_between_paragraphs():
+    paragraph = "word " * 10 + "\n"
+    text = paragraph * 3 + "\n" + paragraph * 2
+    # the slice ends after the blank line rather than after the fourth line
+    assert _texts(text, text_slices(text, len(paragraph) * 4 + 1)) == [paragraph * 3 + "\n", paragraph * 2]
+    # unless it would keep less than half of the slice
+    text = paragraph + "\n" + paragraph * 6
+    assert _texts(text, text_slices(text, len(paragraph) * 4 + 1))[0] == paragraph + "\n" + paragraph * 3
+
+
+def test_text_slices_cut_long_lines():
+    text = "x" * 1000 + "\nend\n"
+    slices = text_slices(text, 300)
+    assert "".join(_texts(text, slices)) == text
+    assert [size for _, size in slices] == [300, 300, 300, 105]
+    assert text_slices("") == ()
+    assert text_slices(None) == ()
+
+
+def test_normalize_sections():
+    assert normalize_sections(None) == DEFAULT_SECTIONS
+    assert normalize_sections(["source", "signature"]) == ("signature", "source")
+    assert normalize_sections(list(reversed(SECTIONS))) == SECTIONS
+    with pytest.raises(ValueError):
+        normalize_sections(["signature", "examples"])
+
+
+def test_parse_cursor():
+    assert parse_cursor("source:3", DEFAULT_SECTIONS) == ("source", 3)
+    for cursor in ("source", "source:-1", "args:0", "source:x"):
+        with pytest.raises(ValueError):
+            parse_cursor(cursor, DEFAULT_SECTIONS)
+
+
+RAW = {
+    "signature": "(wires, id=None)",
+    "docstring": "The controlled-NOT operator.\n\nIt flips the target qubit.",
+    "source": "".join(f"    line_{i} = {i}\n" for i in range(300)),
+}
+FORMATTED = {
+    "args": [
+        {"name": "wires", "type": "Sequence[int]", "required": True, "description": "The wires"},
+        {"name": "id", "type": "Optional[str]", "required": False, "description": "The id"},
+    ],
+    "description": "The controlled-NOT operator.",
+}
+
+
+def test_render_reference_sections():
+    doc = render_reference("qml.CNOT", RAW, FORMATTED, ("signature", "args"))
+    assert doc == (
+        "# qml.CNOT\n\n# Signature\n(wires, id=None)\n\n# Arguments\n"
+        "- wires (Sequence[int], required): The wires\n- id (Optional[str]): The id\n"
+    )
+    # the sections of the formatted entry are left out without one
+    assert render_reference("qml.CNOT", RAW, None, ("signature", "description")) == (
+        "# qml.CNOT\n\n# Signature\n(wires, id=None)\n"
+    )
+    doc = render_reference("qml.CNOT", RAW, FORMATTED, SECTIONS)
+    assert doc.index("# Description") < doc.index("# Docstring") < doc.index("# Source Code")
+    assert doc.endswith(RAW["source"])
+
+
+def test_render_reference_pages_through_budget():
+    max_bytes = 2500
+    doc = render_reference("qml.CNOT", RAW, FORMATTED, DEFAULT_SECTIONS, max_bytes)
+    assert len(doc.encode()) <= max_bytes
+    assert "# Docstring\nThe controlled-NOT operator.\n\nIt flips the target qubit.\n" in doc
+    assert doc.endswith("Request again with cursor='source:2' to continue.]\n")
+
+    # the pages hold the whole source code, cut at line ends
+    source = doc[doc.index("# Source Code\n") + len("# Source Code\n") : doc.index("\n[Truncated")]
+    cursor = "source:2"
+    while cursor:
+        page = render_reference("qml.CNOT", RAW, FORMATTED, DEFAULT_SECTIONS, max_bytes, cursor)
+        assert page.startswith("# qml.CNOT\n\n# Source Code (continued)\n")
+        assert "# Signature" not in page
+        assert len(page.encode()) <= max_bytes
+        end = page.find("\n[Truncated")
+        source += page[len("# qml.CNOT\n\n# Source Code (continued)\n") : end if end >= 0 else None]
+        cursor = page[page.index("cursor='") + 8 : page.index("' to")] if end >= 0 else None
+    assert source == RAW["source"]
+
+
+def test_render_reference_uses_precomputed_slices():
+    # the first slice is returned even when it does not fit the budget
+    raw = {**RAW, "source_slices": ((0, 15), (15, len(RAW["source"]) - 15))}
+    doc = render_reference("qml.CNOT", raw, None, ("source",), 40)
+    assert doc == (
+        "# qml.CNOT\n\n# Source Code\n    line_0 = 0\n"
+        f"\n[Truncated: {len(RAW['source']) - 15} more bytes of the source code. "
+        "Request again with cursor='source:1' to continue.]\n"
+    )
+
+
+def test_render_reference_counts_the_cursor_in_the_budget():
+    raw = {**RAW, "source_slices": text_slices(RAW["source"], 256)}
+    for max_bytes in range(400, 3000, 53):
+        source, cursor = "", None
+        while True:
+            page = render_reference("qml.CNOT", raw, FORMATTED, SECTIONS, max_bytes, cursor)
+            assert len(page.encode()) <= max_bytes
+            end = page.find("\n[Truncated")
+            for heading in ("# Source Code\n", "# Source Code (continued)\n"):
+                if heading in page:
+                    source += page[page.index(heading) + len(heading) : end if end >= 0 else None]
+            if end < 0:
+                break
+            cursor = page[page.index("cursor='") + 8 : page.index("' to")]
+        assert source == RAW["source"]
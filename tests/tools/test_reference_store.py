@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from src.tools import common, reference_store
+from src.tools.reference_sections import text_slices
+from src.tools.reference_store import (
+    ReferenceStore,
+    build_reference_index,
+    get_reference_store,
+    is_reference_index_stale,
+    search_terms,
+)
+from src.tools.request_reference import request_pennylane_reference
+from src.tools.search_reference import search_pennylane_reference
+
+RAW_REFERENCE = {
+    "qml.CNOT": {
+        "signature": "(wires, id=None)",
+        "docstring": "The controlled-NOT operator",
+        "source": "class CNOT: ...",
+    },
+    "qml.RX": {"signature": "(phi, wires, id=None)", "docstring": "The single qubit X rotation", "source": None},
+    "qml.AmplitudeEmbedding": {
+        "signature": "(features, wires)",
+        "docstring": "Encodes 2^n features into the amplitude vector of n qubits.\n\nMore details.",
+        "source": None,
+    },
+    "qml.gradients.param_shift": {
+        "signature": "(tape)",
+        "docstring": "Transform a circuit to compute the parameter-shift gradient of its expectation values.",
+        "source": None,
+    },
+}
+FORMATTED_REFERENCE = {
+    "qml.CNOT": {
+        "args": [{"name": "wires", "type": "Sequence[int]", "required": True, "description": "The wires"}],
+        "description": "The controlled-NOT operator.",
+    },
+}
+
+
+@pytest.fixture
+def reference_dirs(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    formatted_dir = tmp_path / "formatted"
+    index_dir = tmp_path / "index"
+    raw_dir.mkdir()
+    formatted_dir.mkdir()
+    (raw_dir / "v0.41.1.json").write_text(json.dumps(RAW_REFERENCE))
+    (formatted_dir / "v0.41.1.json").write_text(json.dumps(FORMATTED_REFERENCE))
+
+    monkeypatch.setattr(reference_store, "RAW_PENNYLANE_JSON_DIR", raw_dir)
+    monkeypatch.setattr(reference_store, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    monkeypatch.setattr(reference_store, "INDEXED_PENNYLANE_DIR", index_dir)
+    monkeypatch.setattr(common, "RAW_PENNYLANE_JSON_DIR", raw_dir)
+    monkeypatch.setattr(common, "FORMATTED_PENNYLANE_JSON_DIR", formatted_dir)
+    monkeypatch.setattr(common, "INDEXED_PENNYLANE_DIR", index_dir)
+    common.refresh_version_catalog()
+    reference_store.close_reference_stores()
+    yield raw_dir, formatted_dir, index_dir
+    reference_store.close_reference_stores()
+
+
+def test_build_reference_index(reference_dirs):
+    raw_dir, formatted_dir, index_dir = reference_dirs
+    index_path = build_reference_index("v0.41.1", raw_dir, formatted_dir, index_dir)
+    assert index_path == index_dir / "v0.41.1.sqlite"
+    assert [p.name for p in index_dir.iterdir()] == ["v0.41.1.sqlite"]
+
+    store = ReferenceStore(index_path)
+    try:
+        assert list(store.names()) == ["qml.AmplitudeEmbedding", "qml.CNOT", "qml.RX", "qml.gradients.param_shift"]
+        assert "qml.RX" in store
+        assert "qml.RY" not in store
+        assert store.get_raw("qml.RX") == RAW_REFERENCE["qml.RX"]
+        assert store.get_raw("qml.RY") is None
+        assert store.get_formatted("qml.CNOT") == FORMATTED_REFERENCE["qml.CNOT"]
+        assert store.get_formatted("qml.RX") is None
+    finally:
+        store.close()
+
+
+def test_get_reference_store_builds_missing_index(reference_dirs):
+    _, _, index_dir = reference_dirs
+    store = get_reference_store("v0.41.1")
+    assert (index_dir / "v0.41.1.sqlite").exists()
+    assert get_reference_store("v0.41.1") is store
+
+
+def test_get_reference_store_missing_version(reference_dirs):
+    with pytest.raises(FileNotFoundError):
+        get_reference_store("v0.0.0")
+
+
+def test_request_pennylane_reference(reference_dirs):
+    doc = request_pennylane_reference("qml.CNOT", "0.41.1")
+    assert "# qml.CNOT" in doc
+    assert "(wires, id=None)" in doc
+    assert "class CNOT: ..." in doc
+
+    with pytest.raises(ValueError):
+        request_pennylane_reference("qml.RY", "v0.41.1")
+
+
+def test_get_raw_with_slices(reference_dirs):
+    store = get_reference_store("v0.41.1")
+    entry = store.get_raw("qml.AmplitudeEmbedding", slices=True)
+    assert entry["docstring"] == RAW_REFERENCE["qml.AmplitudeEmbedding"]["docstring"]
+    assert entry["docstring_slices"] == text_slices(entry["docstring"])
+    assert entry["source_slices"] == ()
+
+
+def test_request_pennylane_reference_sections(reference_dirs):
+    doc = request_pennylane_reference("qml.CNOT", "v0.41.1", sections=["args", "signature"])
+    assert doc == (
+        "# qml.CNOT\n\n# Signature\n(wires, id=None)\n\n# Arguments\n- wires (Sequence[int], required): The wires\n"
+    )
+    doc = request_pennylane_reference("qml.CNOT", "v0.41.1", sections=["description", "source"], max_bytes=0)
+    assert doc == "# qml.CNOT\n\n# Description\nThe controlled-NOT operator.\n\n# Source Code\nclass CNOT: ...\n"
+
+    with pytest.raises(ValueError):
+        request_pennylane_reference("qml.CNOT", "v0.41.1", sections=["examples"])
+    with pytest.raises(ValueError):
+        request_pennylane_reference("qml.CNOT", "v0.41.1", max_bytes=-1)
+    with pytest.raises(ValueError):
+        request_pennylane_reference("qml.CNOT", "v0.41.1", cursor="args:0")
+
+
+def test_search_terms():
+    assert search_terms("AmplitudeEmbedding features") == ["amplitudeembedding", "amplitude", "embedding", "features"]
+    assert search_terms("param_shift, NOT") == ["param", "shift", "not"]
+    with pytest.raises(ValueError):
+        search_terms(" ?! ")
+
+
+def test_search(reference_dirs):
+    store = get_reference_store("v0.41.1")
+    # the name weighs more than the docstring, the stem of "gradients" matches "gradient"
+    total, results = store.search("gradients")
+    assert total == 1
+    assert results[0]["name"] == "qml.gradients.param_shift"
+    assert results[0]["summary"].startswith("Transform a circuit")
+    # the formatted description and the arguments are searched
+    total, results = store.search("controlled")
+    assert [result["name"] for result in results] == ["qml.CNOT"]
+    assert results[0]["summary"] == "The controlled-NOT operator."
+    # the camel case parts of the names are searched
+    assert store.search("embedding")[1][0]["name"] == "qml.AmplitudeEmbedding"
+    # the summary is the first paragraph of the docstring without a formatted description
+    assert store.search("amplitude")[1][0]["summary"] == "Encodes 2^n features into the amplitude vector of n qubits."
+    assert store.search("unrelated") == (0, [])
+
+
+def test_search_ranks_and_pages(reference_dirs):
+    store = get_reference_store("v0.41.1")
+    # "qubit" is in half of the methods, it is still searched along with a word found in one method only
+    total, results = store.search("qubit rotation")
+    assert total == 2
+    assert results[0]["name"] == "qml.RX"
+    assert results[0]["score"] > results[1]["score"]
+
+    total, first = store.search("qubit rotation", 0, 1)
+    _, second = store.search("qubit rotation", 1, 1)
+    assert total == 2
+    assert first + second == results
+
+
+def test_search_leaves_out_common_words(reference_dirs):
+    store = get_reference_store("v0.41.1")
+    # "the" is in all the methods, only "shift" is searched
+    total, results = store.search("the shift")
+    assert total == 1
+    assert results[0]["name"] == "qml.gradients.param_shift"
+    # all the words are common, they are all searched
+    assert store.search("the")[0] == 4
+
+
+def test_get_reference_store_rebuilds_older_index_format(reference_dirs):
+    _, _, index_dir = reference_dirs
+    build_reference_index("v0.41.1", *reference_dirs[:2], index_dir)
+    conn = sqlite3.connect(index_dir / "v0.41.1.sqlite")
+    conn.execute("DELETE FROM meta WHERE key = 'format'")
+    conn.execute("DROP TABLE search")
+    conn.commit()
+    conn.close()
+
+    store = get_reference_store("v0.41.1")
+    assert store.searchable
+    assert store.search("cnot")[0] == 1
+
+
+def test_is_reference_index_stale(reference_dirs):
+    raw_dir, formatted_dir, index_dir = reference_dirs
+    assert is_reference_index_stale("v0.41.1")
+    build_reference_index("v0.41.1", raw_dir, formatted_dir, index_dir)
+    assert not is_reference_index_stale("v0.41.1")
+
+    # a dump changed after the build
+    index_mtime = (index_dir / "v0.41.1.sqlite").stat().st_mtime
+    os.utime(formatted_dir / "v0.41.1.json", (index_mtime + 1, index_mtime + 1))
+    assert is_reference_index_stale("v0.41.1")
+
+
+def test_search_pennylane_reference(reference_dirs):
+    result = search_pennylane_reference("qubit rotation", "0.41.1", limit=1)
+    assert result["version"] == "v0.41.1"
+    assert result["total"] == 2
+    assert [r["name"] for r in result["results"]] == ["qml.RX"]
+    assert result["next_offset"] == 1
+
+    result = search_pennylane_reference("qubit rotation", "v0.41.1", offset=1, limit=1)
+    assert [r["name"] for r in result["results"]] == ["qml.AmplitudeEmbedding"]
+    assert result["next_offset"] is None
+
+    with pytest.raises(ValueError):
+        search_pennylane_reference("qubit", "v0.41.1", limit=0)
+    with pytest.raises(ValueError):
+        search_pennylane_reference("qubit", "v0.41.1", offset=-1)
+    with pytest.raises(ValueError):
+        search_pennylane_reference("()", "v0.41.1")
@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from src.tools.result_cache import RESULT_CACHE, ResultCache, validate_pennylane_code_cached
+
+
+def test_result_cache_hit_returns_copy():
+    cache = ResultCache(max_entries=2, ttl=60.0)
+    compute = mock.Mock(return_value={"valid": False, "errors": ["error"]})
+
+    first = cache.get_or_compute("key", compute)
+    first["errors"].append("modified by caller")
+    second = cache.get_or_compute("key", compute)
+
+    assert second == {"valid": False, "errors": ["error"]}
+    assert compute.call_count == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_result_cache_ttl_and_eviction():
+    cache = ResultCache(max_entries=1, ttl=0.01)
+    cache.get_or_compute("a", lambda: 1)
+    time.sleep(0.02)
+    assert cache.get_or_compute("a", lambda: 2) == 2
+    assert cache.stats()["expirations"] == 1
+
+    cache.get_or_compute("b", lambda: 3)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 1
+
+
+def test_result_cache_coalesces_concurrent_requests():
+    cache = ResultCache(max_entries=8, ttl=60.0)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return {"valid": True, "errors": []}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get_or_compute, "key", compute) for _ in range(8)]
+        while cache.stats()["coalesced"] < 7:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result == {"valid": True, "errors": []} for result in results)
+    assert cache.stats()["misses"] == 1
+
+
+def test_result_cache_does_not_cache_errors():
+    cache = ResultCache(max_entries=8, ttl=60.0)
+    with pytest.raises(FileNotFoundError):
+        cache.get_or_compute("key", mock.Mock(side_effect=FileNotFoundError))
+    assert cache.get_or_compute("key", lambda: 1) == 1
+
+
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.result_cache.validate_pennylane_code_statically")
+@mock.patch("src.tools.static_validation.get_reference")
+def test_validate_pennylane_code_cached(mock_get_ref, mock_validate):
+    mock_get_ref.return_value = {}
+    mock_validate.return_value = {"valid": True, "errors": []}
+
+    validate_pennylane_code_cached("qml.RX(0.5, wires=0)\r\n", "0.41.1")
+    validate_pennylane_code_cached("qml.RX(0.5, wires=0)\n", "v0.41.1")
+    validate_pennylane_code_cached("qml.RX(0.5, wires=0)\n", "v0.41.0")
+
+    assert mock_validate.call_args_list == [
+        mock.call("qml.RX(0.5, wires=0)\n", "v0.41.1"),
+        mock.call("qml.RX(0.5, wires=0)\n", "v0.41.0"),
+    ]
+    assert RESULT_CACHE.stats()["hits"] == 1
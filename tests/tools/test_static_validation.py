@@ -1,19 +1,26 @@
+import ast
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast
 from unittest import mock
 
 import pytest
 
+from src.tools.arg_validator import ArgValidator
 from src.tools.static_validation import (
-    TMP_CODE_PATH,
-    _extract_method_name,
+    COMPILE_FILENAME,
     _extract_pennylane_methods,
-    _is_optional_type,
-    _validate_args,
+    collect_pennylane_calls,
     validate_by_ast,
     validate_by_py_compile,
     validate_pennylane_code_statically,
     validate_pennylane_methods,
 )
+from src.tools.type_specs import accepts, parse_type_spec
+
+
+def _parse_call(code: str) -> ast.Call:
+    return cast(ast.Call, cast(ast.Expr, ast.parse(code).body[0]).value)
 
 
 @pytest.mark.parametrize(
@@ -43,8 +50,9 @@ def test_validate_by_ast(code, should_pass):
         ("def f(\n", False),
     ],
 )
-def test_validate_by_py_compile(code, should_pass, tmp_path):
-    result = validate_by_py_compile(code, tmp_path / TMP_CODE_PATH)
+def test_validate_by_py_compile(code, should_pass, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result = validate_by_py_compile(code)
     assert isinstance(result["errors"], list)
     if should_pass:
         assert result["valid"] is True
@@ -53,7 +61,31 @@ def test_validate_by_py_compile(code, should_pass, tmp_path):
         assert result["valid"] is False
         assert result["errors"]
 
-    assert not (tmp_path / TMP_CODE_PATH).exists()
+    assert os.listdir(tmp_path) == []
+
+
+def test_validate_by_py_compile_error_message():
+    result = validate_by_py_compile("x = 1\ndef f(\n")
+    assert result["errors"] == [
+        f'py_compile: Syntax error:   File "{COMPILE_FILENAME}", line 2\n'
+        "    def f(\n"
+        "         ^\n"
+        "SyntaxError: '(' was never closed\n"
+    ]
+
+
+def test_validate_by_py_compile_concurrent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    codes = [f"def f{i}():\n    return {i}\n" if i % 2 == 0 else f"def f{i}(\n" for i in range(500)]
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(validate_by_py_compile, codes))
+
+    for i, result in enumerate(results):
+        assert result["valid"] is (i % 2 == 0)
+        if i % 2 == 1:
+            assert f"def f{i}(" in cast(list[str], result["errors"])[0]
+    assert os.listdir(tmp_path) == []
 
 
 @pytest.mark.parametrize(
@@ -63,24 +95,48 @@ def test_validate_by_py_compile(code, should_pass, tmp_path):
         ("qml.RX(0.5, wires=0) + qml.RY(1.0, wires=1)", ["qml.RX(0.5, wires=0)", "qml.RY(1.0, wires=1)"]),
         ("import pennylane as qml\nqml.device('default.qubit', wires=2)", ["qml.device('default.qubit', wires=2)"]),
         ("a = 1", []),
+        # multi-line calls, non-ASCII text before the call and \r\n / \r line endings
+        ("x = 'é'; qml.RX(\r\n  0.5,\r  wires=0)\n", ["qml.RX(\r\n  0.5,\r  wires=0)"]),
     ],
 )
 def test_extract_pennylane_methods(code, expected):
     result = _extract_pennylane_methods(code)
-    assert set(result) == set(expected)
+    assert result == expected
+
+
+def test_collect_pennylane_calls_source_order():
+    code = (
+        "import pennylane as qml\n"
+        "@qml.qnode(dev)\n"
+        "def circuit():\n"
+        "    qml.RX(0.5, wires=0)\n"
+        "    return qml.expval(qml.PauliZ(0))  # qml.RY(0.1, wires=0)\n"
+    )
+    calls = collect_pennylane_calls(ast.parse(code))
+    assert [(call.name, call.lineno, call.col_offset) for call in calls] == [
+        ("qml.qnode", 2, 1),
+        ("qml.RX", 4, 4),
+        ("qml.expval", 5, 11),
+        ("qml.PauliZ", 5, 22),
+    ]
 
 
 @pytest.mark.parametrize(
-    "method_code_str,expected",
+    "code,expected",
     [
-        ("qml.RX(0.5, wires=0)", "qml.RX"),
-        ("qml.RY(1.0, wires=1)", "qml.RY"),
-        ("qml.device('default.qubit', wires=2)", "qml.device"),
-        ("a = 1", ""),
+        ("import pennylane as pl\npl.RX(0.5, wires=0)", [("qml.RX", True)]),
+        ("import pennylane\npennylane.RX(0.5, wires=0)", [("qml.RX", True)]),
+        ("from pennylane import CNOT as C\nC(wires=[0, 1])", [("qml.CNOT", True)]),
+        ("from pennylane.ops import CNOT\nCNOT(wires=[0, 1])", [("qml.ops.CNOT", True)]),
+        ("qml.math.sum(x)\nqml.ops.CNOT(wires=[0, 1])", [("qml.math.sum", True), ("qml.ops.CNOT", True)]),
+        ("from pennylane import *\nCNOT(wires=[0, 1])", [("qml.CNOT", False)]),
+        ("import numpy as qml\nqml.sum(x)", []),
+        ("s = 'qml.RX(0.5)'  # qml.RY(0.5)\nnp.sum(x)", []),
     ],
 )
-def test_extract_method_name(method_code_str, expected):
-    assert _extract_method_name(method_code_str) == expected
+def test_collect_pennylane_calls_resolves_imports(code, expected):
+    calls = collect_pennylane_calls(ast.parse(code))
+    assert [(call.name, call.explicit) for call in calls] == expected
 
 
 @pytest.mark.parametrize(
@@ -94,8 +150,8 @@ def test_extract_method_name(method_code_str, expected):
         ("str", False),
     ],
 )
-def test_is_optional_type(type_str, expected):
-    assert _is_optional_type(type_str) == expected
+def test_optional_types_accept_none(type_str, expected):
+    assert accepts(parse_type_spec(type_str), ast.parse("None", mode="eval").body) == expected
 
 
 @pytest.mark.parametrize(
@@ -146,14 +202,23 @@ def test_is_optional_type(type_str, expected):
             ],
             ["Unexpected argument 'foo'"],
         ),
+        (
+            "qml.RX(**kwargs)",
+            [
+                {"name": "phi", "required": True, "type": "float", "description": "The rotation angle"},
+                {"name": "wires", "required": True, "type": "int", "description": "The wire the operation acts on"},
+            ],
+            [],
+        ),
     ],
 )
 def test_validate_args(method, expected_args, expected_errors):
-    errors = _validate_args(method, expected_args)
+    errors = ArgValidator.from_args(expected_args).check(_parse_call(method))
     assert set(errors) == set(expected_errors)
 
 
 # validate_pennylane_methods
+@pytest.mark.usefixtures("all_versions_available")
 @mock.patch("src.tools.static_validation.get_reference")
 def test_validate_pennylane_methods(mock_get_ref):
     mock_get_ref.return_value = {
@@ -183,21 +248,56 @@ def test_validate_pennylane_methods(mock_get_ref):
     assert any("Missing required argument 'phi'" in e for e in cast(list[str], result2["errors"]))
 
 
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference")
+def test_validate_pennylane_methods_resolves_imports(mock_get_ref):
+    mock_get_ref.return_value = {
+        "qml.CNOT": {"args": [{"name": "wires", "required": True}]},
+        "qml.sum": {"args": [{"name": "summands", "required": True}]},
+    }
+    code = (
+        "import pennylane as pl\n"
+        "from pennylane import CNOT as C\n"
+        "from pennylane import *\n"
+        "pl.CNOT(wires=[0, 1])\n"
+        "C()\n"
+        "pl.ops.CNOT(foo=1, wires=[0, 1])\n"
+        "pl.math.sum(x)\n"
+        "pl.Unknown(0)\n"
+        "local_function(0)\n"
+    )
+    result = validate_pennylane_methods(code, version="v0.41.0")
+    assert result["errors"] == [
+        "Method 'qml.CNOT' (line 5, col 0): Missing required argument 'wires'.\nwires (): ",
+        "Method 'qml.ops.CNOT' (line 6, col 0): Unexpected argument 'foo'",
+        "Method 'qml.Unknown' (line 8, col 0): Method 'qml.Unknown' not found in PennyLane version 'v0.41.0'",
+    ]
+
+
 # validate_pennylane_code_statically
-@mock.patch("src.tools.static_validation.validate_by_ast")
-@mock.patch("src.tools.static_validation.validate_by_py_compile")
-@mock.patch("src.tools.static_validation.validate_pennylane_methods")
-def test_validate_pennylane_code_statically(mock_pl, mock_py, mock_ast):
-    mock_ast.return_value = {"valid": True, "errors": []}
-    mock_py.return_value = {"valid": True, "errors": []}
-    mock_pl.return_value = {"valid": True, "errors": []}
-    result = validate_pennylane_code_statically("qml.RX(0.5, wires=0)")
+@pytest.mark.usefixtures("all_versions_available")
+@mock.patch("src.tools.static_validation.get_reference")
+def test_validate_pennylane_code_statically(mock_get_ref):
+    mock_get_ref.return_value = {
+        "qml.RX": {"args": [{"name": "phi", "required": True}, {"name": "wires", "required": True}]},
+    }
+    result = validate_pennylane_code_statically("qml.RX(0.5, wires=0)", version="v0.41.0")
     assert result["valid"] is True
     assert result["errors"] == []
 
-    mock_ast.return_value = {"valid": False, "errors": ["SyntaxError"]}
-    mock_py.return_value = {"valid": True, "errors": []}
-    mock_pl.return_value = {"valid": True, "errors": []}
-    result2 = validate_pennylane_code_statically("def f(\n")
+    result2 = validate_pennylane_code_statically("def f(\n", version="v0.41.0")
     assert result2["valid"] is False
-    assert any("SyntaxError" in e for e in cast(list[str], result2["errors"]))
+    errors2 = cast(list[str], result2["errors"])
+    assert errors2[0].startswith("SyntaxError")
+    assert errors2[1] == validate_by_py_compile("def f(\n")["errors"][0]
+
+    result3 = validate_pennylane_code_statically("qml.RX(wires=0)\nreturn 1\nqml.RZ(0.1, wires=0)", version="v0.41.0")
+    assert result3["valid"] is False
+    errors3 = cast(list[str], result3["errors"])
+    assert len(errors3) == 3
+    assert "'return' outside function" in errors3[0]
+    assert errors3[1].startswith("Method 'qml.RX' (line 1, col 0): Missing required argument 'phi'")
+    assert errors3[2] == (
+        "Method 'qml.RZ' (line 3, col 0): Method 'qml.RZ' not found in PennyLane version 'v0.41.0'. "
+        "Did you mean 'qml.RX'?"
+    )
@@ -0,0 +1,51 @@
+import pytest
+
+from src.tools.suggestions import SuggestionIndex, closest_names, did_you_mean, edit_distance
+
+NAMES = ["qml.CNOT", "qml.CZ", "qml.Hadamard", "qml.RX", "qml.RY", "qml.ops.op_math.Adjoint", "qml.qnode"]
+
+
+@pytest.mark.parametrize(
+    "a,b,expected",
+    [
+        ("", "", 0),
+        ("", "abc", 3),
+        ("wires", "wires", 0),
+        ("wire", "wires", 1),
+        ("hadamrd", "hadamard", 1),
+        ("ab", "ba", 2),
+    ],
+)
+def test_edit_distance(a, b, expected):
+    assert edit_distance(a, b) == expected
+    assert edit_distance(b, a) == expected
+
+
+def test_closest_names():
+    assert closest_names("wire", ["wires", "id", "wire_order"]) == ["wires"]
+    assert closest_names("Wires", ["wires"]) == ["wires"]
+    assert closest_names("theta", ["phi", "wires"]) == []
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("qml.CNOTT", ["qml.CNOT"]),
+        ("qml.cnot", ["qml.CNOT"]),
+        ("qml.Hadamrd", ["qml.Hadamard"]),
+        ("qml.RZ", ["qml.RX", "qml.RY"]),
+        ("qml.ops.op_math.Adjiont", ["qml.ops.op_math.Adjoint"]),
+        ("qml.QuantumTape", []),
+    ],
+)
+def test_suggestion_index(name, expected):
+    assert SuggestionIndex(NAMES).suggest(name) == expected
+
+
+def test_suggestion_index_limit():
+    assert SuggestionIndex(NAMES).suggest("qml.RZ", limit=1) == ["qml.RX"]
+
+
+def test_did_you_mean():
+    assert did_you_mean([]) == ""
+    assert did_you_mean(["qml.RX", "qml.RY"]) == ". Did you mean 'qml.RX', 'qml.RY'?"
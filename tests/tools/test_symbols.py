@@ -0,0 +1,33 @@
+import pytest
+
+from src.tools.symbols import DottedNameTrie, resolve_reference_name
+
+REFERENCE_NAMES = ["qml.CNOT", "qml.RX", "qml.sum", "qml.numpy.array"]
+
+
+def test_dotted_name_trie():
+    trie = DottedNameTrie(REFERENCE_NAMES)
+    assert "qml.CNOT" in trie
+    assert "qml.numpy.array" in trie
+    assert "qml" not in trie
+    assert "qml.numpy" not in trie
+    assert "qml.CNOTX" not in trie
+    assert trie.longest_prefix(["qml", "RX", "compute_matrix"]) == 2
+    assert trie.longest_prefix(["qml", "numpy", "array"]) == 3
+    assert trie.longest_prefix(["np", "array"]) == 0
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("qml.CNOT", "qml.CNOT"),
+        ("qml.ops.CNOT", "qml.CNOT"),
+        ("qml.ops.op_math.CNOT", "qml.CNOT"),
+        ("qml.numpy.array", "qml.numpy.array"),
+        ("qml.math.sum", None),
+        ("qml.RX.compute_matrix", None),
+        ("qml.Unknown", None),
+    ],
+)
+def test_resolve_reference_name(name, expected):
+    assert resolve_reference_name(DottedNameTrie(REFERENCE_NAMES), name) == expected
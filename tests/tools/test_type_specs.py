@@ -0,0 +1,69 @@
+import ast
+
+import pytest
+
+from src.tools.type_specs import ANY, TypeSpec, accepts, literal_kind, parse_type_spec
+
+
+def _value(code: str) -> ast.expr:
+    return ast.parse(code, mode="eval").body
+
+
+@pytest.mark.parametrize(
+    "type_str,expected",
+    [
+        ("int", TypeSpec("int")),
+        ("Optional[int]", TypeSpec("union", (TypeSpec("int"), TypeSpec("None")))),
+        ("int or None", TypeSpec("union", (TypeSpec("int"), TypeSpec("None")))),
+        ("typing.List[int]", TypeSpec("list", (TypeSpec("int"),))),
+        ("Tuple[int, ...]", TypeSpec("tuple", (TypeSpec("int"), TypeSpec("...")))),
+        ("Literal['a', 1]", TypeSpec("literal", values=("a", 1))),
+        ("float, optional", TypeSpec("float")),
+        ("list[Operator]", TypeSpec("list")),
+        ("Sequence[int] | Wires", ANY),
+        ("np.float64", ANY),
+        ("Operator", ANY),
+        ("list of int", ANY),
+    ],
+)
+def test_parse_type_spec(type_str, expected):
+    assert parse_type_spec(type_str) == expected
+
+
+def test_parse_type_spec_interns_specs():
+    assert parse_type_spec("Optional[int]").args[0] is parse_type_spec("int")
+    assert parse_type_spec("List[int]") is parse_type_spec("list[int]")
+
+
+@pytest.mark.parametrize(
+    "code,expected", [("1", "int"), ("-1.5", "float"), ("True", "bool"), ("None", "None"), ("[x]", "list"), ("x", None)]
+)
+def test_literal_kind(code, expected):
+    assert literal_kind(_value(code)) == expected
+
+
+@pytest.mark.parametrize(
+    "type_str,code,expected",
+    [
+        ("float", "1", True),
+        ("int", "0.5", False),
+        ("int", "params[0]", True),
+        ("Optional[str]", "None", True),
+        ("Optional[str]", "1", False),
+        ("Sequence[int]", "[0, 1]", True),
+        ("Sequence[int]", "(0, 'a')", False),
+        ("Sequence[int]", "[0, *rest]", True),
+        ("list[int]", "(0, 1)", False),
+        ("Tuple[int, str]", "(0, 'a')", True),
+        ("Tuple[int, str]", "(0, 'a', 1)", False),
+        ("Tuple[int, ...]", "(0, 1, 2)", True),
+        ("Dict[str, float]", "{'a': 0.5, **rest}", True),
+        ("Dict[str, float]", "{'a': 'b'}", False),
+        ("Literal['fill', 'drop']", "'fill'", True),
+        ("Literal['fill', 'drop']", "'keep'", False),
+        ("Callable", "0", False),
+        ("Union[int, Sequence[int]]", "[0, 1]", True),
+    ],
+)
+def test_accepts(type_str, code, expected):
+    assert accepts(parse_type_spec(type_str), _value(code)) is expected